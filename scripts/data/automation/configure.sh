@@ -220,6 +220,8 @@ S3_SUBFOLDER="${S3_SUBFOLDER:-}"
 RACHEL_SUBFOLDER="${RACHEL_SUBFOLDER:-}"
 SCHEDULE_TYPE="${SCHEDULE_TYPE:-daily}"
 RUN_INTERVAL="${RUN_INTERVAL:-86400}"
+PROCESSOR_WORKERS="${PROCESSOR_WORKERS:-0}"
+INCREMENTAL_LOGS="${INCREMENTAL_LOGS:-1}"
 KOLIBRI_FACILITY_ID="${KOLIBRI_FACILITY_ID:-}"
 MODULEGAZE_ENABLED="${MODULEGAZE_ENABLED:-1}"
 MODULEGAZE_API_BASE_URL="${MODULEGAZE_API_BASE_URL:-http://127.0.0.1:3002}"
@@ -398,6 +400,8 @@ S3_SUBFOLDER="$S3_SUBFOLDER"
 RACHEL_SUBFOLDER="$RACHEL_SUBFOLDER"
 SCHEDULE_TYPE="$SCHEDULE_TYPE"
 RUN_INTERVAL="$RUN_INTERVAL"
+PROCESSOR_WORKERS="$PROCESSOR_WORKERS"
+INCREMENTAL_LOGS="$INCREMENTAL_LOGS"
 KOLIBRI_FACILITY_ID="$KOLIBRI_FACILITY_ID"
 MODULEGAZE_ENABLED="$MODULEGAZE_ENABLED"
 MODULEGAZE_API_BASE_URL="$MODULEGAZE_API_BASE_URL"
@@ -1,11 +1,26 @@
 #!/usr/bin/env python3
 
+import bisect
+import contextlib
 import csv
+import itertools
 import os
+import re
 import sys
 from datetime import datetime
 
-from time_window import build_filename, compute_window
+from time_window import build_filename, compute_window, windows_between
+
+# partitions.py lives with the processors that write the day shards
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "process", "processors"))
+from partitions import load_index, window_lines  # noqa: E402
+
+# The processors write Access Date/Time in these shapes; for valid values of
+# this shape, string order is time order, so rows compare without strptime
+ISO_DATE = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}")
+ISO_TIME = re.compile(r"([01][0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9]")
+# Distinct dates/times remembered per run; a summary holds a few hundred dates and at most 86400 times
+KNOWN_VALUES_LIMIT = 100000
 
 
 def column_index(header, column_name, fallback=None):
@@ -16,99 +31,223 @@ def column_index(header, column_name, fallback=None):
         return fallback
 
 
-def process_time_based_csv(folder, location, schedule_type, run_interval_seconds=None, suffix="access_logs"):
+def is_iso_date(value):
+    if not ISO_DATE.fullmatch(value):
+        return False
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        return False
+    return True
+
+
+def parse_row_time(row_date_str, row_time_str):
+    """
+    strptime fallback for values the processors would not write, e.g. 9:05:07.
+    An unreadable time compares at midnight; an unreadable date raises ValueError.
+    """
+    if row_time_str:
+        try:
+            return datetime.strptime(f"{row_date_str} {row_time_str}", "%Y-%m-%d %H:%M:%S"), True
+        except ValueError:
+            pass
+    return datetime.strptime(row_date_str, "%Y-%m-%d"), not row_time_str
+
+
+def process_time_based_csv(
+    folder,
+    location,
+    schedule_type,
+    run_interval_seconds=None,
+    suffix="access_logs",
+    windows=None,
+):
     """
     Filters summary.csv for the last completed interval and prints the final filename on success.
+    The filenames written are also returned, for callers that import this module.
+    With windows (consecutive time_window.Window values, oldest first), summary.csv
+    is split into one file per window in the same single pass, and every
+    filename that received rows is printed, one per line.
+    When the processors left day shards next to summary.csv, only the days and
+    hours that overlap the windows are read.
+
+    Rows are compared as "YYYY-MM-DD HH:MM:SS" strings against the window bounds
+    formatted once; anything else goes through strptime as before. Rows without
+    a usable Access Date are counted and skipped.
     """
     input_path = os.path.join(folder, "summary.csv")
-    temp_output_path = os.path.join(folder, "temp_filtered.csv")
 
     if not os.path.exists(input_path):
         sys.stderr.write(f"Error: summary.csv not found in {folder}\n")
         sys.exit(1)
 
-    try:
-        window = compute_window(schedule_type, run_interval_seconds=run_interval_seconds)
-    except ValueError as exc:
-        sys.stderr.write(f"{exc}\n")
-        sys.exit(1)
+    if not windows:
+        try:
+            windows = [compute_window(schedule_type, run_interval_seconds=run_interval_seconds)]
+        except ValueError as exc:
+            sys.stderr.write(f"{exc}\n")
+            sys.exit(1)
 
-    start_time = window.start
-    end_time = window.end
-    output_filename = build_filename(location, schedule_type, suffix, window=window)
+    start_time = windows[0].start
+    end_time = windows[-1].end
+    output_filenames = [build_filename(location, schedule_type, suffix, window=window) for window in windows]
+    temp_output_paths = [os.path.join(folder, f"temp_filtered_{position}.csv") for position in range(len(windows))]
 
-    sys.stderr.write(f"Filtering logs for: {window.label}\n")
+    if len(windows) == 1:
+        sys.stderr.write(f"Filtering logs for: {windows[0].label}\n")
+    else:
+        sys.stderr.write(f"Filtering logs for {len(windows)} windows from {start_time} to {end_time}\n")
 
-    final_output_path = os.path.join(folder, output_filename)
-    rows_written = 0
+    rows_written = [0] * len(windows)
+    index = load_index(input_path)
 
     try:
-        with open(input_path, "r", newline="", encoding="utf-8") as infile, open(
-            temp_output_path, "w", newline="", encoding="utf-8"
-        ) as outfile:
-            reader = csv.reader((line.replace("\0", "") for line in infile))
-            writer = csv.writer(outfile)
+        with open(input_path, "r", newline="", encoding="utf-8") as infile, contextlib.ExitStack() as outputs:
+            lines = infile
+            if index is not None:
+                sys.stderr.write("Reading the matching day shards from summary/\n")
+                lines = itertools.chain([infile.readline()], window_lines(index, start_time, end_time))
+            reader = csv.reader((line.replace("\0", "") for line in lines))
 
             try:
                 header = next(reader)
-                writer.writerow(header)
                 date_index = column_index(header, "Access Date", 1)
                 time_index = column_index(header, "Access Time")
             except StopIteration:
                 sys.exit(0)
 
+            writers = [None] * len(windows)
+
+            def open_output(position):
+                outfile = outputs.enter_context(open(temp_output_paths[position], "w", newline="", encoding="utf-8"))
+                writer = writers[position] = csv.writer(outfile)
+                writer.writerow(header)
+                return writer
+
+            window_starts = [window.start for window in windows]
+            start_keys = [window.start.isoformat(sep=" ") for window in windows]
+            end_keys = [window.end.isoformat(sep=" ") for window in windows]
+            known_dates = {}
+            known_times = {}
+            malformed_rows = 0
+            midnight_rows = 0
+
             for row in reader:
                 try:
                     row_date_str = row[date_index]
-                    if time_index is not None and len(row) > time_index and row[time_index]:
-                        try:
-                            row_time_str = row[time_index]
-                            date_time_obj = datetime.strptime(
-                                f"{row_date_str} {row_time_str}", "%Y-%m-%d %H:%M:%S"
-                            )
-                        except (ValueError, IndexError):
-                            date_time_obj = datetime.strptime(row_date_str, "%Y-%m-%d")
-                    else:
-                        date_time_obj = datetime.strptime(row_date_str, "%Y-%m-%d")
-
-                    if start_time <= date_time_obj <= end_time:
-                        writer.writerow(row)
-                        rows_written += 1
-                except (ValueError, IndexError):
+                except IndexError:
+                    malformed_rows += 1
                     continue
+                row_time_str = row[time_index] if time_index is not None and len(row) > time_index else ""
+
+                date_ok = known_dates.get(row_date_str)
+                if date_ok is None:
+                    date_ok = is_iso_date(row_date_str)
+                    if len(known_dates) < KNOWN_VALUES_LIMIT:
+                        known_dates[row_date_str] = date_ok
+                if row_time_str:
+                    time_ok = known_times.get(row_time_str)
+                    if time_ok is None:
+                        time_ok = ISO_TIME.fullmatch(row_time_str) is not None
+                        if len(known_times) < KNOWN_VALUES_LIMIT:
+                            known_times[row_time_str] = time_ok
+                    key = f"{row_date_str} {row_time_str}"
+                else:
+                    time_ok = True
+                    key = f"{row_date_str} 00:00:00"
+
+                # The window whose start is the last one at or before the row
+                if date_ok and time_ok:
+                    position = bisect.bisect_right(start_keys, key) - 1
+                    if position < 0 or key > end_keys[position]:
+                        continue
+                else:
+                    try:
+                        date_time_obj, time_read = parse_row_time(row_date_str, row_time_str)
+                    except ValueError:
+                        malformed_rows += 1
+                        continue
+                    if not time_read:
+                        midnight_rows += 1
+                    position = bisect.bisect_right(window_starts, date_time_obj) - 1
+                    if position < 0 or date_time_obj > windows[position].end:
+                        continue
+
+                (writers[position] or open_output(position)).writerow(row)
+                rows_written[position] += 1
     except Exception as exc:
         sys.stderr.write(f"An error occurred during CSV processing: {exc}\n")
         sys.exit(1)
 
-    if rows_written > 0:
-        os.rename(temp_output_path, final_output_path)
-        sys.stderr.write(f"Found {rows_written} log entries for uploading\n")
+    if malformed_rows:
+        sys.stderr.write(f"Skipped {malformed_rows} row(s) without a readable Access Date\n")
+    if midnight_rows:
+        sys.stderr.write(f"Compared {midnight_rows} row(s) with an unreadable Access Time at midnight\n")
+
+    written = []
+    for position, output_filename in enumerate(output_filenames):
+        if not rows_written[position]:
+            continue
+        written.append(output_filename)
+        os.rename(temp_output_paths[position], os.path.join(folder, output_filename))
+        if len(windows) == 1:
+            sys.stderr.write(f"Found {rows_written[position]} log entries for uploading\n")
+        else:
+            sys.stderr.write(f"Found {rows_written[position]} log entries for uploading in {output_filename}\n")
         print(output_filename)
-    else:
-        os.remove(temp_output_path)
+
+    if not any(rows_written):
         sys.stderr.write("No log entries found for this period\n")
+    return written
 
 
 if __name__ == "__main__":
-    if len(sys.argv) not in (4, 5, 6):
+    # --window-start/--window-end: split into every schedule window between these bounds (time_window.py --backfill)
+    args = sys.argv[1:]
+    bounds = {}
+    for flag in ("--window-start", "--window-end"):
+        if flag in args:
+            position = args.index(flag)
+            bounds[flag] = args[position + 1] if position + 1 < len(args) else ""
+            del args[position:position + 2]
+
+    if len(args) not in (3, 4, 5) or len(bounds) == 1:
         sys.stderr.write(
-            "Usage: python filter_time_based.py <folder_path> <device_location> <schedule_type> [run_interval_seconds] [suffix]\n"
+            "Usage: python filter_time_based.py <folder_path> <device_location> <schedule_type> [run_interval_seconds] [suffix]"
+            " [--window-start YYYY-MM-DDTHH:MM:SS --window-end YYYY-MM-DDTHH:MM:SS]\n"
         )
         sys.exit(1)
 
     run_interval_seconds = None
-    if len(sys.argv) >= 5 and sys.argv[4]:
+    if len(args) >= 4 and args[3]:
         try:
-            run_interval_seconds = int(sys.argv[4])
+            run_interval_seconds = int(args[3])
         except ValueError:
             sys.stderr.write("Error: run_interval_seconds must be an integer.\n")
             sys.exit(1)
 
-    suffix = sys.argv[5] if len(sys.argv) == 6 and sys.argv[5] else "access_logs"
+    windows = None
+    if bounds:
+        try:
+            windows = windows_between(
+                args[2],
+                datetime.strptime(bounds["--window-start"], "%Y-%m-%dT%H:%M:%S"),
+                datetime.strptime(bounds["--window-end"], "%Y-%m-%dT%H:%M:%S"),
+                run_interval_seconds=run_interval_seconds,
+            )
+        except ValueError as exc:
+            sys.stderr.write(f"{exc}\n")
+            sys.exit(1)
+        if not windows:
+            sys.stderr.write("Error: no schedule window fits between --window-start and --window-end.\n")
+            sys.exit(1)
+
+    suffix = args[4] if len(args) == 5 and args[4] else "access_logs"
     process_time_based_csv(
-        sys.argv[1],
-        sys.argv[2],
-        sys.argv[3],
+        args[0],
+        args[1],
+        args[2],
         run_interval_seconds=run_interval_seconds,
         suffix=suffix,
+        windows=windows,
     )
@@ -1,5 +1,5 @@
 #!/bin/bash
-# Flush queued CSV uploads for RACHEL, Kolibri, and ModuleGaze destinations.
+# Flush queued CSV uploads for RACHEL, Kolibri, ModuleGaze, and OC4D assessments in one batch, UPLOAD_CONCURRENCY at a time.
 set -euo pipefail
 
 ts() { date '+%Y-%m-%d %H:%M:%S'; }
@@ -37,11 +37,17 @@ QUEUE_DIR="$PROJECT_ROOT/00_DATA/00_UPLOAD_QUEUE"
 prepare_queue_dirs "$QUEUE_DIR"
 export CDN_AUTO_PROCESSED_ROOT="$PROJECT_ROOT/00_DATA/00_PROCESSED"
 
-if ! compgen -G "$QUEUE_DIR/*.csv" >/dev/null \
-  && ! compgen -G "$QUEUE_DIR/RACHEL/*.csv" >/dev/null \
-  && ! compgen -G "$QUEUE_DIR/Kolibri/*.csv" >/dev/null \
-  && ! compgen -G "$QUEUE_DIR/ModuleGaze/*.csv" >/dev/null \
-  && ! compgen -G "$QUEUE_DIR/OC4DAssessments/*.csv" >/dev/null; then
+queue_has_files() {
+  local dir
+  for dir in "$QUEUE_DIR" "$QUEUE_DIR/RACHEL" "$QUEUE_DIR/Kolibri" "$QUEUE_DIR/ModuleGaze" "$QUEUE_DIR/OC4DAssessments"; do
+    if compgen -G "$dir/*.csv" >/dev/null || compgen -G "$dir/*.csv.gz" >/dev/null; then
+      return 0
+    fi
+  done
+  return 1
+}
+
+if ! queue_has_files; then
   log "Queue empty at $QUEUE_DIR"
   exit 0
 fi
@@ -0,0 +1,688 @@
+#!/usr/bin/env python3
+"""
+Scheduled pipeline run: RACHEL, ModuleGaze, OC4D assessments and Kolibri in one
+Python process. runner.sh loads config/automation.conf into the environment and
+execs this script.
+
+The processors, time_window.py, filter_time_based.py, the checkpoint commit and
+assessment.py are imported and called directly, so the interpreter, user_agents
+and the other processor modules are loaded once per run and the OC4D manifest is
+read once. Uploads, queueing and run-folder cleanup still go through the shell
+helpers in scripts/data/lib, which the manual upload tools share; each stage's
+files go up as one batch (upload_folder_batch / upload_oc4d_batch), so a stage
+starts one uploader rather than one per file.
+"""
+
+import contextlib
+import fnmatch
+import glob
+import gzip
+import io
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import urllib.error
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+import filter_time_based
+import time_window
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+LIB_DIR = os.path.join(PROJECT_ROOT, "scripts", "data", "lib")
+PROCESSORS_DIR = os.path.join(PROJECT_ROOT, "scripts", "data", "process", "processors")
+sys.path.insert(0, PROCESSORS_DIR)
+
+DATA_DIR = os.path.join(PROJECT_ROOT, "00_DATA")
+PROCESSED_ROOT = os.path.join(DATA_DIR, "00_PROCESSED")
+QUEUE_DIR = os.path.join(DATA_DIR, "00_UPLOAD_QUEUE")
+KOLIBRI_EXPORT_DIR = os.path.join(DATA_DIR, "00_KOLIBRI_EXPORTS")
+ASSESSMENTS_ROOT = os.path.join(DATA_DIR, "00_OC4D_ASSESSMENTS")
+
+SCHEDULE_TYPES = ("hourly", "daily", "weekly", "monthly", "yearly", "custom")
+
+# Processor script per SERVER_VERSION and the log_dialects.py dialect it runs
+RACHEL_DIALECTS = {
+    "log.py": "apache-v4",
+    "logv2.py": "oc4d-v5",
+    "castle.py": "cape-coast",
+    "dhub.py": "dhub",
+    "log-v6.py": "oc4d-v6",
+}
+
+# Sources every helper file and runs "$@"; log matches the timestamps printed here
+HELPER_SCRIPT = """
+log() { echo "[$(date '+%Y-%m-%d %H:%M:%S')] $*"; }
+source "$1/s3_helpers.sh"
+source "$1/kolibri_helpers.sh"
+source "$1/oc4d_assessment_helpers.sh"
+shift
+"$@"
+"""
+
+
+def log(message):
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+
+def setting(name, default=""):
+    """runner.sh's ${NAME:-default}; the value is exported for the shell helpers and processors."""
+    value = os.environ.get(name) or default
+    os.environ[name] = value
+    return value
+
+
+def helper(function, *args):
+    """Run one function from the scripts/data/lib helpers; True when it exits 0."""
+    sys.stdout.flush()
+    return subprocess.run(["bash", "-c", HELPER_SCRIPT, "helpers", LIB_DIR, function, *args]).returncode == 0
+
+
+def upload_batch(function, jobs, *args):
+    """Run a batch upload helper (upload_folder_batch, upload_oc4d_batch) over jobs, tuples of its
+    tab-separated job fields; returns the set of jobs that uploaded."""
+    uploaded = set()
+    if not jobs:
+        return uploaded
+    with tempfile.TemporaryDirectory(prefix="cdn_auto_upload.") as tmp:
+        jobs_path = os.path.join(tmp, "jobs.tsv")
+        results_path = os.path.join(tmp, "results.tsv")
+        with open(jobs_path, "w", encoding="utf-8") as handle:
+            handle.writelines("\t".join(job) + "\n" for job in jobs)
+        helper(function, jobs_path, results_path, *args)
+        if os.path.isfile(results_path):
+            with open(results_path, encoding="utf-8") as handle:
+                for line in handle:
+                    status, *fields = line.rstrip("\n").split("\t")
+                    if status == "ok":
+                        uploaded.add(tuple(fields))
+    return uploaded
+
+
+def human_size(size):
+    for unit in ("B", "K", "M"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}G"
+
+
+def has_internet():
+    try:
+        socket.getaddrinfo("s3.amazonaws.com", 443)
+    except OSError:
+        return False
+    try:
+        urllib.request.urlopen(urllib.request.Request("https://s3.amazonaws.com", method="HEAD"), timeout=5).close()
+    except urllib.error.HTTPError:
+        # Any HTTP answer means S3 is reachable
+        pass
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def copy_matching(log_dir, destination, matches):
+    """Copy every file under log_dir accepted by matches(name), keeping modification times like cp -p;
+    returns {copied file name: source inode}."""
+    inodes = {}
+    for root, _, files in os.walk(log_dir):
+        for name in files:
+            if matches(name):
+                source = os.path.join(root, name)
+                inodes[name] = os.stat(source).st_ino
+                shutil.copy2(source, destination)
+    return inodes
+
+
+def rachel_sources(server_version):
+    """(log dir, file name matcher) for SERVER_VERSION, or None when it is unknown."""
+    if server_version in ("v1", "server v4", "v4"):
+        return "/var/log/apache2", lambda name: fnmatch.fnmatchcase(name, "access.log*")
+    if server_version in ("v2", "server v5", "v5"):
+        return "/var/log/oc4d", lambda name: (
+            (fnmatch.fnmatchcase(name, "oc4d-*.log") and not fnmatch.fnmatchcase(name, "oc4d-exceptions-*.log"))
+            or (
+                fnmatch.fnmatchcase(name, "capecoastcastle-*.log")
+                and not fnmatch.fnmatchcase(name, "capecoastcastle-exceptions-*.log")
+            )
+            or fnmatch.fnmatchcase(name, "*.gz")
+        )
+    if server_version in ("v3", "dhub", "d-hub"):
+        return "/var/log/dhub", lambda name: fnmatch.fnmatchcase(name, "*.log")
+    if server_version in ("server v6", "v6"):
+        return "/var/log/oc4d", lambda name: (
+            fnmatch.fnmatchcase(name, "oc4d-*.log") and not fnmatch.fnmatchcase(name, "oc4d-exceptions-*.log")
+        )
+    return None
+
+
+def rachel_processor(server_version, python_script):
+    if server_version in ("v1", "v4"):
+        return "log.py"
+    if server_version in ("v2", "v5", "server v5"):
+        return "castle.py" if python_script == "cape_coast_d" else "logv2.py"
+    if server_version in ("v3", "dhub", "d-hub"):
+        return "dhub.py"
+    if server_version in ("server v6", "v6"):
+        return "log-v6.py"
+    return None
+
+
+def call_processor(entry_point, *args):
+    """Run a processor entry point in-process; False when it exits non-zero or raises."""
+    try:
+        entry_point(*args)
+    except SystemExit as exc:
+        return not exc.code
+    except Exception as exc:
+        log(f"[error] {exc.__class__.__name__}: {exc}")
+        return False
+    finally:
+        sys.stdout.flush()
+    return True
+
+
+class Run:
+    """Config and state shared by the stages of one scheduled run."""
+
+    def __init__(self):
+        self.server_version = setting("SERVER_VERSION", "v2")
+        self.device_location = setting("DEVICE_LOCATION", "device")
+        self.python_script = setting("PYTHON_SCRIPT", "oc4d")
+        setting("S3_BUCKET", "s3://example-bucket")
+        self.schedule_type = setting("SCHEDULE_TYPE", "daily")
+        self.run_interval = setting("RUN_INTERVAL", "86400")
+        self.processor_workers = setting("PROCESSOR_WORKERS", "0")
+        self.incremental_logs = setting("INCREMENTAL_LOGS", "1")
+        self.compress_uploads = setting("COMPRESS_UPLOADS", "0")
+        self.kolibri_facility_id = setting("KOLIBRI_FACILITY_ID")
+        self.modulegaze_enabled = setting("MODULEGAZE_ENABLED", "1")
+        setting("MODULEGAZE_API_BASE_URL", "http://127.0.0.1:3002")
+        setting("MODULEGAZE_MODULE_MAP_FILE", os.path.join(PROJECT_ROOT, "config", "oc4d", "module-map.csv"))
+        self.oc4d_assessments_enabled = setting("OC4D_ASSESSMENTS_ENABLED", "0")
+        setting("OC4D_API_BASE_URL", "http://127.0.0.1:3000")
+        setting("OC4D_BUCKET", "oc4d-raw-reports")
+        setting("OC4D_PARENT_ORG", "Home-Schooling")
+        self.oc4d_upload_mode = setting("OC4D_UPLOAD_MODE", "direct_s3")
+        setting("OC4D_STUDENT_MAP_FILE", os.path.join(PROJECT_ROOT, "config", "oc4d", "student-map.csv"))
+        setting("OC4D_ASSESSMENT_MAP_FILE", os.path.join(PROJECT_ROOT, "config", "oc4d", "assessment-map.csv"))
+        self.oc4d_state_file = setting("OC4D_STATE_FILE", os.path.join(ASSESSMENTS_ROOT, "uploaded-state.json"))
+        setting("OC4D_UNASSIGNED_STUDENT_ID", "unassigned")
+        setting("OC4D_STUDENT_PREFIX_SYNC", "1")
+
+        try:
+            self.interval_seconds = int(self.run_interval) if self.run_interval else None
+        except ValueError:
+            self.interval_seconds = None
+        self.today_ymd = datetime.now().strftime("%Y_%m_%d")
+        self.online = False
+        # Exports gzipped this run and their sizes before and after
+        self.compressed = []
+
+    def stream_window(self, suffix, tag):
+        """time_window.py --backfill values for suffix, or None when the window cannot be computed."""
+        try:
+            return time_window.window_values(
+                self.schedule_type,
+                self.device_location,
+                suffix,
+                run_interval_seconds=self.interval_seconds,
+                backfill=True,
+            )
+        except (OSError, ValueError) as exc:
+            log(f"{tag}[warn] Could not compute the time window ({exc}). Falling back to filtering summary.csv.")
+            return None
+
+    def record_window_end(self, suffix, window):
+        # Remember the newest window built for a stream so the next run backfills only what it missed
+        try:
+            time_window.record_window_end(
+                suffix,
+                self.schedule_type,
+                datetime.strptime(window["WINDOW_END_DATE"], time_window.STATE_TIME_FORMAT),
+                run_interval_seconds=self.interval_seconds,
+            )
+        except (OSError, ValueError) as exc:
+            log(f"[warn] Could not record the last {suffix} window ({exc}). The next run may rebuild windows already uploaded.")
+
+    def filter_summary(self, processed_dir, suffix, window=None):
+        """
+        filter_time_based.py in-process: split summary.csv into every window of a
+        backfill, or filter it for the last completed window. Returns the paths
+        written, or None when filtering failed.
+        """
+        windows = None
+        if window is not None:
+            windows = time_window.windows_between(
+                self.schedule_type,
+                datetime.strptime(window["WINDOW_START_DATE"], time_window.STATE_TIME_FORMAT),
+                datetime.strptime(window["WINDOW_END_DATE"], time_window.STATE_TIME_FORMAT),
+                run_interval_seconds=self.interval_seconds,
+            )
+        try:
+            # The filenames it prints are returned as well
+            with contextlib.redirect_stdout(io.StringIO()):
+                names = filter_time_based.process_time_based_csv(
+                    processed_dir,
+                    self.device_location,
+                    self.schedule_type,
+                    self.interval_seconds,
+                    suffix,
+                    windows=windows,
+                )
+        except SystemExit as exc:
+            if exc.code:
+                return None
+            names = []
+        except Exception as exc:
+            log(f"[error] {exc.__class__.__name__}: {exc}")
+            return None
+        paths = [os.path.join(processed_dir, name) for name in names or []]
+        return [path for path in paths if os.path.isfile(path)]
+
+    def window_outputs(self, processed_dir, suffix, window, window_csv, tag, before_record=None):
+        """Final CSVs for a processed run folder, or None when the filter step failed."""
+        if window is not None:
+            if window_csv:
+                log(f"{tag}[filter] Schedule '{self.schedule_type}': {window['WINDOW_LABEL']} (applied while parsing)")
+                final_csvs = [window_csv] if os.path.isfile(window_csv) else []
+            else:
+                log(f"{tag}[filter] Schedule '{self.schedule_type}': backfilling {window['WINDOW_LABEL']}")
+                final_csvs = self.filter_summary(processed_dir, suffix, window)
+                if final_csvs is None:
+                    log(f"{tag}[warn] Backfill split failed.")
+                    return None
+            if before_record:
+                before_record()
+            self.record_window_end(suffix, window)
+            return final_csvs
+
+        summary = os.path.join(processed_dir, "summary.csv")
+        if not os.path.isfile(summary) or not os.path.getsize(summary):
+            log(f"{tag}[info] No new data in summary.csv.")
+            return []
+        if self.schedule_type not in SCHEDULE_TYPES:
+            log(f"{tag}[warn] Unknown SCHEDULE_TYPE '{self.schedule_type}' in config.")
+            return None
+        log(f"{tag}[filter] Schedule '{self.schedule_type}'")
+        final_csvs = self.filter_summary(processed_dir, suffix)
+        if final_csvs is None:
+            log(f"{tag}[warn] Time-window filter failed.")
+        return final_csvs
+
+    def compress_export(self, path, tag=""):
+        """With COMPRESS_UPLOADS=1, replace a CSV export with <name>.csv.gz and return the new path.
+
+        The gzip header carries no timestamp, so the same export always compresses to the same bytes.
+        """
+        if self.compress_uploads != "1" or not path.endswith(".csv") or not os.path.isfile(path):
+            return path
+        compressed = f"{path}.gz"
+        partial = f"{compressed}.partial"
+        try:
+            with open(path, "rb") as source, open(partial, "wb") as raw:
+                with gzip.GzipFile(os.path.basename(path), "wb", 6, raw, mtime=0) as target:
+                    shutil.copyfileobj(source, target, 1024 * 1024)
+            os.replace(partial, compressed)
+        except OSError as exc:
+            log(f"{tag}[compress][warn] Could not compress {os.path.basename(path)} ({exc}); uploading it as is.")
+            with contextlib.suppress(OSError):
+                os.remove(partial)
+            return path
+        before, after = os.path.getsize(path), os.path.getsize(compressed)
+        os.remove(path)
+        self.compressed.append((before, after))
+        log(f"{tag}[compress] {os.path.basename(compressed)}: {human_size(before)} -> {human_size(after)}")
+        return compressed
+
+    def report_compression(self):
+        if not self.compressed:
+            return
+        before = sum(size for size, _ in self.compressed)
+        after = sum(size for _, size in self.compressed)
+        saved = before - after
+        percent = saved * 100 // before if before else 0
+        log(
+            f"[compress] {len(self.compressed)} file(s): {human_size(before)} -> {human_size(after)}, "
+            f"saved {human_size(saved)} ({percent}%)"
+        )
+
+    def upload_or_queue(self, final_csvs, folder_name, run_name, tag):
+        """Upload the files in one batch when online, queueing any that fail (or all of them
+        offline); True when nothing was queued."""
+        final_csvs = [self.compress_export(final_csv, tag) for final_csv in final_csvs]
+        uploaded = set()
+        if self.online:
+            uploaded = upload_batch("upload_folder_batch", [(final_csv,) for final_csv in final_csvs], folder_name)
+        queued = False
+        for final_csv in final_csvs:
+            if (final_csv,) in uploaded:
+                continue
+            if self.online:
+                log(f"{tag}[warn] Upload failed; queueing new {folder_name} file.")
+            helper("queue_one", final_csv, QUEUE_DIR, folder_name, run_name)
+            queued = True
+        return not queued
+
+    def process_rachel_logs(self):
+        """Collect, process and filter the RACHEL logs; returns the final CSVs to upload."""
+        run_name = f"{self.device_location}_logs_{self.today_ymd}"
+        collect_dir = os.path.join(DATA_DIR, run_name)
+        processed_dir = os.path.join(PROCESSED_ROOT, run_name)
+
+        log(f"[collect] {collect_dir}  (server={self.server_version}, device={self.device_location})")
+        os.makedirs(collect_dir, exist_ok=True)
+        sources = rachel_sources(self.server_version)
+        if sources is None:
+            log(f"[rachel][warn] Unknown SERVER_VERSION '{self.server_version}'. Skipping RACHEL.")
+            return []
+        log_dir, matches = sources
+        if not os.path.isdir(log_dir):
+            log(f"[rachel][warn] {log_dir} not found. Skipping RACHEL.")
+            return []
+        try:
+            inodes = copy_matching(log_dir, collect_dir, matches)
+        except OSError as exc:
+            log(f"[rachel][warn] RACHEL collection failed from {log_dir}: {exc}")
+            return []
+        if self.incremental_logs == "1":
+            import log_checkpoints
+            try:
+                # Checkpoints follow the original logs, not these copies
+                log_checkpoints.record_sources(collect_dir, inodes)
+            except OSError as exc:
+                log(f"[rachel][warn] Could not record log sources ({exc}). Logs will be parsed from the start.")
+
+        processor = rachel_processor(self.server_version, self.python_script)
+        if processor is None:
+            log(f"[rachel][warn] No processor selected for SERVER_VERSION='{self.server_version}'. Skipping RACHEL.")
+            return []
+
+        # The processor drops lines outside the schedule window and writes the final CSV itself.
+        # After missed runs it keeps every missed window in summary.csv, which is then split per window.
+        args = [run_name, "--summary-only", "--workers", self.processor_workers]
+        window_csv = None
+        window = self.stream_window("access_logs", "[rachel]")
+        if window is not None:
+            args += ["--window-start", window["WINDOW_START_DATE"], "--window-end", window["WINDOW_END_DATE"]]
+            if window["WINDOW_COUNT"] == "1":
+                args += ["--window-output", window["WINDOW_FILENAME"]]
+                window_csv = os.path.join(processed_dir, window["WINDOW_FILENAME"])
+            if self.incremental_logs == "1":
+                # Checkpoints only advance to the end of the window this run uploads
+                args += ["--checkpoints", "--checkpoint-until", window["WINDOW_END_DATE"]]
+
+        log(
+            f"[process] scripts/data/process/processors/{processor}  "
+            f"(folder={run_name}, workers={self.processor_workers}, incremental={self.incremental_logs})"
+        )
+        try:
+            import log_dialects
+        except ImportError as exc:
+            log(f"[rachel][warn] Could not load the RACHEL processors: {exc}. Continuing with other data stages.")
+            return []
+        if not call_processor(log_dialects.run, RACHEL_DIALECTS[processor], args):
+            log("[rachel][warn] RACHEL processor failed. Continuing with other data stages.")
+            return []
+        helper("cleanup_raw_run_folder", DATA_DIR, run_name)
+
+        def commit_checkpoints():
+            pending = os.path.join(processed_dir, "checkpoints.pending.json")
+            if not os.path.isfile(pending):
+                return
+            import log_checkpoints
+            try:
+                committed = log_checkpoints.commit_pending(pending)
+            except (OSError, ValueError) as exc:
+                log(f"[rachel][warn] Could not commit log checkpoints ({exc}). The next run will re-parse these logs.")
+                return
+            log(f"[rachel] Committed checkpoints for {committed} log file(s).")
+
+        final_csvs = self.window_outputs(processed_dir, "access_logs", window, window_csv, "[rachel]", commit_checkpoints)
+        if final_csvs is None:
+            log("[rachel][warn] Continuing with other data stages.")
+            return []
+        if not final_csvs:
+            log("[info] No new entries matched the time period. Skipping RACHEL upload for this run.")
+            helper("cleanup_processed_run_folder", PROCESSED_ROOT, run_name)
+            return []
+        for final_csv in final_csvs:
+            log(f"[upload] Prepared {os.path.basename(final_csv)} ({human_size(os.path.getsize(final_csv))})")
+        return final_csvs
+
+    def upload_rachel(self, final_csvs):
+        run_name = f"{self.device_location}_logs_{self.today_ymd}"
+        if final_csvs and self.upload_or_queue(final_csvs, "RACHEL", run_name, ""):
+            helper("cleanup_processed_run_folder", PROCESSED_ROOT, run_name)
+
+    def process_modulegaze_logs(self):
+        if self.modulegaze_enabled != "1":
+            log("[modulegaze] Disabled in config. Skipping.")
+            return
+        log_dir = "/var/log/modulegaze"
+        if not os.path.isdir(log_dir):
+            log(f"[modulegaze] {log_dir} not found. Skipping.")
+            return
+
+        run_name = f"{self.device_location}_modulegaze_logs_{self.today_ymd}"
+        collect_dir = os.path.join(DATA_DIR, run_name)
+        processed_dir = os.path.join(PROCESSED_ROOT, run_name)
+
+        log(f"[modulegaze][collect] {collect_dir}")
+        os.makedirs(collect_dir, exist_ok=True)
+        for name in os.listdir(collect_dir):
+            path = os.path.join(collect_dir, name)
+            if os.path.isfile(path) and (name.startswith("modulegaze-access") or name.startswith("modulegaze-sessions")):
+                try:
+                    os.remove(path)
+                except OSError:
+                    log("[modulegaze][warn] Could not clear old collected ModuleGaze files.")
+        try:
+            copy_matching(
+                log_dir,
+                collect_dir,
+                lambda name: name == "modulegaze-sessions.log" or fnmatch.fnmatchcase(name, "modulegaze-sessions-*.log.zip"),
+            )
+        except OSError as exc:
+            log(f"[modulegaze][warn] ModuleGaze collection failed from {log_dir}: {exc}")
+            return
+        if not any(files for _, _, files in os.walk(collect_dir)):
+            log("[modulegaze] No ModuleGaze log files found. Skipping.")
+            return
+
+        args = [run_name, "--summary-only", "--workers", self.processor_workers]
+        window_csv = None
+        window = self.stream_window("modulegaze_logs", "[modulegaze]")
+        if window is not None:
+            args += ["--window-start", window["WINDOW_START_DATE"], "--window-end", window["WINDOW_END_DATE"]]
+            if window["WINDOW_COUNT"] == "1":
+                args += ["--window-output", window["WINDOW_FILENAME"]]
+                window_csv = os.path.join(processed_dir, window["WINDOW_FILENAME"])
+
+        log(f"[modulegaze][process] scripts/data/process/processors/modulegaze.py (folder={run_name})")
+        try:
+            import modulegaze
+        except ImportError as exc:
+            log(f"[modulegaze][warn] Could not load the ModuleGaze processor: {exc}. Skipping ModuleGaze upload for this run.")
+            return
+        if not call_processor(modulegaze.main, args):
+            log("[modulegaze][warn] ModuleGaze processing failed. Skipping ModuleGaze upload for this run.")
+            return
+        helper("cleanup_raw_run_folder", DATA_DIR, run_name)
+
+        final_csvs = self.window_outputs(processed_dir, "modulegaze_logs", window, window_csv, "[modulegaze]")
+        if final_csvs is None:
+            log("[modulegaze][warn] Skipping ModuleGaze upload for this run.")
+            return
+        if not final_csvs:
+            log("[modulegaze] No entries matched the time period. Skipping ModuleGaze upload.")
+            helper("cleanup_processed_run_folder", PROCESSED_ROOT, run_name)
+            return
+        for final_csv in final_csvs:
+            log(f"[modulegaze][upload] Prepared {os.path.basename(final_csv)} ({human_size(os.path.getsize(final_csv))})")
+        if self.upload_or_queue(final_csvs, "ModuleGaze", run_name, "[modulegaze]"):
+            helper("cleanup_processed_run_folder", PROCESSED_ROOT, run_name)
+
+    def process_oc4d_assessments(self):
+        if self.oc4d_assessments_enabled not in ("1", "true"):
+            log("[oc4d] Disabled in config. Skipping.")
+            return
+        if self.oc4d_upload_mode != "direct_s3":
+            log(f"[oc4d][warn] Upload mode '{self.oc4d_upload_mode}' is not implemented yet; using direct_s3.")
+
+        os.makedirs(ASSESSMENTS_ROOT, exist_ok=True)
+        log("[oc4d][process] scripts/data/process/processors/assessment.py")
+        try:
+            import assessment
+        except ImportError as exc:
+            log(f"[oc4d][warn] Could not load the assessment processor: {exc}.")
+            return
+        processor_ok = call_processor(lambda: sys.exit(assessment.main()))
+
+        manifests = sorted(
+            glob.glob(os.path.join(ASSESSMENTS_ROOT, "manifest.json"))
+            + glob.glob(os.path.join(ASSESSMENTS_ROOT, "*", "manifest.json"))
+        )
+        if not manifests:
+            if not processor_ok:
+                log("[oc4d][warn] Assessment processor failed and no manifest was produced.")
+            else:
+                log("[oc4d] No assessment manifest produced for this run.")
+            return
+        with open(manifests[-1], encoding="utf-8") as handle:
+            manifest = json.load(handle)
+
+        uploaded = queued = failed = 0
+        new_uploaded_ids = []
+
+        # (file, key, counts as an upload, result id) for the subject JSONs, marking schemes and results
+        jobs = []
+        for entry in manifest.get("marking_schemes", []):
+            if entry.get("subject_json", "") and entry.get("subject_s3_key", ""):
+                jobs.append((entry["subject_json"], entry["subject_s3_key"], False, ""))
+        for entry in manifest.get("marking_schemes", []):
+            jobs.append((entry.get("csv", ""), entry.get("s3_key", ""), True, ""))
+        for entry in manifest.get("ready", []):
+            jobs.append((entry.get("csv", ""), entry.get("s3_key", ""), True, entry.get("result_id", "")))
+        jobs = [job for job in jobs if job[0] and os.path.isfile(job[0])]
+
+        sent = set()
+        if self.online:
+            sent = upload_batch("upload_oc4d_batch", [(path, s3_key) for path, s3_key, _, _ in jobs])
+        for path, s3_key, counted, result_id in jobs:
+            if (path, s3_key) in sent:
+                if counted:
+                    uploaded += 1
+                    if result_id:
+                        new_uploaded_ids.append(result_id)
+                continue
+            if self.online:
+                failed += 1
+            helper("queue_oc4d_one", path, QUEUE_DIR, s3_key)
+            queued += 1
+
+        skipped = len(manifest.get("skipped", []))
+        failed += len(manifest.get("failed", []))
+
+        if new_uploaded_ids:
+            state_path = Path(self.oc4d_state_file)
+            assessment.save_state(state_path, assessment.load_state(state_path) | set(new_uploaded_ids))
+
+        log(f"[oc4d][report] uploaded={uploaded} queued={queued} skipped={skipped} failed={failed}")
+        if failed > 0:
+            log("[oc4d][warn] Assessment stage finished with validation/upload failures.")
+
+    def process_kolibri(self):
+        """Export and upload the Kolibri summary; False when the export failed."""
+        if shutil.which("kolibri") is None:
+            log("[info] Kolibri CLI not installed on this device. Skipping Kolibri summary export.")
+            return True
+        try:
+            window = time_window.window_values(
+                self.schedule_type,
+                self.device_location,
+                "kolibri_summary",
+                run_interval_seconds=self.interval_seconds,
+            )
+        except ValueError:
+            log(f"[error] Unable to resolve the Kolibri window for schedule '{self.schedule_type}'.")
+            return False
+
+        kolibri_file = os.path.join(KOLIBRI_EXPORT_DIR, window["WINDOW_FILENAME"])
+        log(f"[kolibri] Schedule '{self.schedule_type}' uses window: {window['WINDOW_LABEL']}")
+        if not helper(
+            "kolibri_export_summary",
+            kolibri_file,
+            self.kolibri_facility_id,
+            window["WINDOW_START_DATE"],
+            window["WINDOW_END_DATE"],
+        ):
+            log("[error] Kolibri summary export failed.")
+            return False
+
+        line_count = 0
+        if os.path.isfile(kolibri_file):
+            with open(kolibri_file, "rb") as handle:
+                line_count = sum(1 for _ in handle)
+        if line_count <= 1:
+            log("[info] Kolibri summary contains only the header row; uploading it anyway to preserve the snapshot.")
+
+        kolibri_file = self.compress_export(kolibri_file, "[kolibri]")
+        if self.online and helper("upload_one", kolibri_file, "Kolibri"):
+            return True
+        if self.online:
+            log("[warn] Kolibri upload failed; queueing the export.")
+        helper("queue_one", kolibri_file, QUEUE_DIR, "Kolibri")
+        return True
+
+
+def stage(name, call, *args):
+    """Run one stage; an unexpected error is logged and the next stage still runs."""
+    try:
+        return call(*args)
+    except Exception as exc:
+        log(f"[{name}][warn] Stage failed: {exc.__class__.__name__}: {exc}")
+        return None
+
+
+def main():
+    sys.stdout.reconfigure(line_buffering=True)
+    os.chdir(PROJECT_ROOT)
+    run = Run()
+
+    for path in (DATA_DIR, PROCESSED_ROOT, QUEUE_DIR, KOLIBRI_EXPORT_DIR):
+        os.makedirs(path, exist_ok=True)
+    helper("prepare_queue_dirs", QUEUE_DIR)
+
+    rachel_csvs = stage("rachel", run.process_rachel_logs) or []
+
+    if has_internet():
+        run.online = True
+        log("[online] Internet OK. Flushing queued uploads...")
+        os.environ["CDN_AUTO_PROCESSED_ROOT"] = PROCESSED_ROOT
+        if not helper("flush_all_queues", QUEUE_DIR):
+            log("[warn] Some queued files could not be flushed; continuing with new exports.")
+    else:
+        log("[offline] No internet. New exports will be queued.")
+
+    stage("rachel", run.upload_rachel, rachel_csvs)
+    stage("modulegaze", run.process_modulegaze_logs)
+    stage("oc4d", run.process_oc4d_assessments)
+    kolibri_ok = stage("kolibri", run.process_kolibri)
+
+    run.report_compression()
+    if kolibri_ok is False:
+        log("[warn] Run finished with Kolibri export errors.")
+        return 1
+    log("[done] Run finished.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
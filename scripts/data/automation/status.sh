@@ -134,10 +134,10 @@ for q_name in "." "RACHEL" "Kolibri" "ModuleGaze" "OC4DAssessments"; do
     q_path="$QUEUE_DIR/$q_name"
     label="$q_name"
   fi
-  Q_COUNT="$(find "$q_path" -maxdepth 1 -type f -name '*.csv' 2>/dev/null | wc -l | tr -d ' ')"
+  Q_COUNT="$(find "$q_path" -maxdepth 1 -type f \( -name '*.csv' -o -name '*.csv.gz' \) 2>/dev/null | wc -l | tr -d ' ')"
   echo "  $label      : $Q_COUNT queued CSV(s)"
   if [ "$Q_COUNT" != "0" ]; then
-    find "$q_path" -maxdepth 1 -type f -name '*.csv' -printf '    %TY-%Tm-%Td %TH:%TM %p\n' 2>/dev/null | sort
+    find "$q_path" -maxdepth 1 -type f \( -name '*.csv' -o -name '*.csv.gz' \) -printf '    %TY-%Tm-%Td %TH:%TM %p\n' 2>/dev/null | sort
   fi
 done
 echo
@@ -147,7 +147,7 @@ if [ -d "$PROCESSED_DIR" ]; then
   LATEST_DIR="$(find "$PROCESSED_DIR" -maxdepth 1 -mindepth 1 -type d -printf '%T@ %p\n' 2>/dev/null | sort -nr | head -n1 | cut -d' ' -f2-)"
   if [ -n "$LATEST_DIR" ]; then
     echo "  Latest dir : $LATEST_DIR"
-    find "$LATEST_DIR" -maxdepth 1 -type f -name '*.csv' -printf '    %TY-%Tm-%Td %TH:%TM %p\n' 2>/dev/null | sort
+    find "$LATEST_DIR" -maxdepth 1 -type f \( -name '*.csv' -o -name '*.csv.gz' \) -printf '    %TY-%Tm-%Td %TH:%TM %p\n' 2>/dev/null | sort
   else
     echo "  No processed runs yet."
   fi
@@ -0,0 +1,330 @@
+#!/bin/bash
+# Parity checks: filter_time_based.py (single windows and backfill splits) and upload/process_csv.py (one month and 'all') against the per-row strptime filters they replaced. Unsorted multi-day input checks that windows read through the day-shard index match a full scan.
+# BENCH_ROWS=2000000 bash scripts/data/automation/test_filters.sh also times both on a summary of that many rows.
+set -euo pipefail
+
+ROOT="$(CDPATH= cd -- "$(dirname -- "$0")/../../.." >/dev/null 2>&1 && pwd)"
+cd "$ROOT/scripts/data/automation"
+
+ts() { date '+%H:%M:%S'; }
+log() { echo "[$(ts)] $*"; }
+
+WORK_DIR="$(mktemp -d)"
+trap 'rm -rf "$WORK_DIR"' EXIT
+export WORK_DIR BENCH_ROWS="${BENCH_ROWS:-0}"
+
+log "=== Filter parity: time windows and months, with and without day shards ==="
+rc=0
+python3 - <<'PY' || rc=$?
+import contextlib
+import csv
+import io
+import os
+import random
+import shutil
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join("..", "upload"))
+sys.path.insert(0, os.path.join("..", "process", "processors"))
+
+import filter_time_based
+import process_csv
+import partitions
+from partitions import DayShards
+from time_window import Window, build_filename, last_window_end, list_windows, record_window_end, windows_between
+
+WORK_DIR = os.environ["WORK_DIR"]
+BENCH_ROWS = int(os.environ["BENCH_ROWS"])
+
+passed = 0
+failed = 0
+
+
+def legacy_window_rows(rows, header, start, end):
+    # filter_time_based.py before string comparison
+    date_index = filter_time_based.column_index(header, "Access Date", 1)
+    time_index = filter_time_based.column_index(header, "Access Time")
+    kept = []
+    for row in rows:
+        try:
+            row_date_str = row[date_index]
+            if time_index is not None and len(row) > time_index and row[time_index]:
+                try:
+                    moment = datetime.strptime(f"{row_date_str} {row[time_index]}", "%Y-%m-%d %H:%M:%S")
+                except (ValueError, IndexError):
+                    moment = datetime.strptime(row_date_str, "%Y-%m-%d")
+            else:
+                moment = datetime.strptime(row_date_str, "%Y-%m-%d")
+            if start <= moment <= end:
+                kept.append(row)
+        except (ValueError, IndexError):
+            continue
+    return kept
+
+
+def legacy_month_rows(rows, header, month, year=None):
+    # process_csv.py before the per-date cache; one year only, the newest unless given
+    date_index = process_csv.column_index(header, "Access Date", 1)
+    kept = {}
+    for row in rows:
+        try:
+            date_obj = datetime.strptime(row[date_index], "%Y-%m-%d")
+        except Exception:
+            continue
+        if date_obj.month == month and year in (None, date_obj.year):
+            kept.setdefault(date_obj.year, []).append(row)
+    return kept[max(kept)] if kept else []
+
+
+def write_summary(folder, header, rows, shards):
+    shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder)
+    path = os.path.join(folder, "summary.csv")
+    day_shards = DayShards(path, header) if shards else None
+    with open(path, "w", encoding="utf-8", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            if day_shards:
+                day_shards.writerow(row)
+    if day_shards:
+        day_shards.close()
+
+
+def read_output(folder, name):
+    if not name:
+        return []
+    path = os.path.join(folder, name)
+    with open(path, "r", encoding="utf-8", newline="") as handle:
+        rows = list(csv.reader(handle))[1:]
+    os.remove(path)
+    return rows
+
+
+def quiet(call):
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()):
+        try:
+            call()
+        except SystemExit:
+            pass
+    return out.getvalue().strip()
+
+
+def run_window(folder, start, end):
+    filter_time_based.compute_window = lambda *args, **kwargs: Window(start, end, "test", "test")
+    return read_output(folder, quiet(lambda: filter_time_based.process_time_based_csv(folder, "loc", "daily")))
+
+
+def run_backfill(folder, schedule_type, windows, interval):
+    names = quiet(lambda: filter_time_based.process_time_based_csv(folder, "loc", schedule_type, interval, windows=windows))
+    return {name: read_output(folder, name) for name in names.split()}
+
+
+def run_month(folder, month, year=None):
+    return read_output(folder, quiet(lambda: process_csv.process_csv(folder, "loc", month, "summary.csv", "filename", year=year)))
+
+
+def run_all_months(folder):
+    names = quiet(lambda: process_csv.split_months(folder, "loc", "summary.csv"))
+    return {name: read_output(folder, name) for name in names.split()}
+
+
+def check(label, want, got, ordered):
+    global passed, failed
+    if not ordered:
+        want, got = sorted(want), sorted(got)
+    if want == got:
+        passed += 1
+    else:
+        print(f"FAIL: {label}: expected {len(want)} rows, got {len(got)}")
+        failed += 1
+
+
+def make_rows(rng, count, timed, base):
+    rows = []
+    for number in range(count):
+        moment = base + timedelta(seconds=rng.randint(0, 90 * 86400))
+        row_date = moment.strftime("%Y-%m-%d")
+        row_time = moment.strftime("%H:%M:%S")
+        roll = rng.random()
+        if roll < 0.04:
+            row_time = rng.choice(["", "9:05:07", "24:00:00", "12:60:00", "12:00:60", "junk", "10:00"])
+        elif roll > 0.96:
+            row_date = rng.choice(["", "2025-1-5", "2025-02-30", "0000-01-01", "junk", "2025-01-05 "])
+        module = rng.choice(["Khan Academy", "a,b", 'say "hi"', "line\nbreak", "é"])
+        row = [f"10.0.0.{number % 255}", row_time, row_date, module] if timed else [f"10.0.0.{number % 255}", row_date, module]
+        if roll < 0.005:
+            row = row[:1]
+        rows.append(row)
+    return rows
+
+
+rng = random.Random(2025)
+base = datetime(2024, 12, 1)
+for case in range(24):
+    timed = case % 3 != 2
+    shards = case % 2 == 1
+    header = ["IP Address", "Access Time", "Access Date", "Module Viewed"] if timed else ["IP Address", "Access Date", "Module Viewed"]
+    rows = make_rows(rng, rng.randint(0, 400), timed, base)
+    folder = os.path.join(WORK_DIR, f"case{case}")
+    write_summary(folder, header, rows, shards)
+    for _ in range(20):
+        start = base + timedelta(seconds=rng.randint(-86400, 95 * 86400))
+        end = start + timedelta(seconds=rng.choice([0, 59, 3599, 86399, 7 * 86400, 31 * 86400]))
+        # Day shards list multi-day windows day by day
+        check(f"case {case} window {start}..{end}", legacy_window_rows(rows, header, start, end), run_window(folder, start, end), not shards)
+    for month in range(1, 13):
+        check(f"case {case} month {month}", legacy_month_rows(rows, header, month), run_month(folder, month), not shards)
+
+    # 'all': every (year, month) in one pass over summary.csv
+    want = {}
+    for row in rows:
+        try:
+            moment = datetime.strptime(row[process_csv.column_index(header, "Access Date", 1)], "%Y-%m-%d")
+        except (ValueError, IndexError):
+            continue
+        want.setdefault(f"loc_{moment.month:02d}_{moment.year}_access_logs.csv", []).append(row)
+    got = run_all_months(folder)
+    check(f"case {case} all months files", sorted(want), sorted(got), True)
+    for name in want:
+        check(f"case {case} all months {name}", want[name], got.get(name, []), True)
+
+    # Backfill: one pass over summary.csv splits it into every window
+    schedule_type, interval = rng.choice([("hourly", None), ("daily", None), ("weekly", None), ("custom", 5400)])
+    last = base + timedelta(days=rng.randint(1, 90))
+    windows = list_windows(schedule_type, since=last - timedelta(days=rng.randint(0, 20)), now=last, run_interval_seconds=interval, limit=400)
+    if windows != windows_between(schedule_type, windows[0].start, windows[-1].end, interval):
+        print(f"FAIL: case {case} windows_between does not rebuild list_windows for {schedule_type}")
+        failed += 1
+    got = run_backfill(folder, schedule_type, windows, interval)
+    want = {}
+    for window in windows:
+        kept = legacy_window_rows(rows, header, window.start, window.end)
+        if kept:
+            want[build_filename("loc", schedule_type, "access_logs", window=window)] = kept
+    check(f"case {case} backfill {schedule_type} files", sorted(want), sorted(got), True)
+    for name in want:
+        check(f"case {case} backfill {name}", want[name], got.get(name, []), not shards)
+
+# Unsorted multi-day input: hour spans in index.json overlap, and shards are closed and reopened
+# mid-run, yet every window read from the shards holds the rows a full scan of summary.csv finds
+partitions.MAX_OPEN_SHARDS = 2
+header = ["IP Address", "Access Time", "Access Date", "Module Viewed"]
+unsorted_base = datetime(2025, 2, 26)
+rows = make_rows(rng, 3000, True, unsorted_base)
+rows = [row for row in rows if len(row) == 4 and row[2][:8] in ("2025-02-", "2025-03-") and row[2] < "2025-03-04"]
+rng.shuffle(rows)
+write_summary(os.path.join(WORK_DIR, "unsorted_scan"), header, rows, False)
+write_summary(os.path.join(WORK_DIR, "unsorted_shards"), header, rows, True)
+partitions.MAX_OPEN_SHARDS = 64
+index = partitions.load_index(os.path.join(WORK_DIR, "unsorted_shards", "summary.csv"))
+overlapping = 0
+for entry in index["shards"].values():
+    spans = sorted((span[1], span[2]) for hour, span in entry.get("hours", {}).items())
+    overlapping += sum(1 for (_, end), (start, _) in zip(spans, spans[1:]) if start < end)
+check("unsorted input gives overlapping hour spans", [overlapping > 0, len(index["shards"]) > 5], [True, True], True)
+windows = []
+for day in range(7):
+    for hour in range(24):
+        start = unsorted_base + timedelta(days=day, hours=hour)
+        windows.append((start, start + timedelta(seconds=3599)))
+for _ in range(30):
+    start = unsorted_base + timedelta(seconds=rng.randint(0, 7 * 86400))
+    windows.append((start, start + timedelta(seconds=rng.choice([0, 59, 5399, 86399, 3 * 86400]))))
+for start, end in windows:
+    want = run_window(os.path.join(WORK_DIR, "unsorted_scan"), start, end)
+    got = run_window(os.path.join(WORK_DIR, "unsorted_shards"), start, end)
+    check(f"unsorted shards window {start}..{end}", want, got, False)
+    check(f"unsorted scan window {start}..{end}", legacy_window_rows(rows, header, start, end), want, True)
+hourly = list_windows("hourly", since=unsorted_base, now=unsorted_base + timedelta(days=7), limit=400)
+want = run_backfill(os.path.join(WORK_DIR, "unsorted_scan"), "hourly", hourly, None)
+got = run_backfill(os.path.join(WORK_DIR, "unsorted_shards"), "hourly", hourly, None)
+check("unsorted shards backfill files", sorted(want), sorted(got), True)
+for name in want:
+    check(f"unsorted shards backfill {name}", want[name], got.get(name, []), False)
+
+# One month across several years: only one year's rows, never merged under the newest year's name
+header = ["IP Address", "Access Date", "Module Viewed"]
+rows = [[f"10.0.0.{day}", f"{year}-01-{day:02d}", "Khan Academy"] for year in (2025, 2023, 2024) for day in (3, 1, 2)]
+for shards in (False, True):
+    folder = os.path.join(WORK_DIR, f"years{int(shards)}")
+    write_summary(folder, header, rows, shards)
+    name = quiet(lambda: process_csv.process_csv(folder, "loc", 1, "summary.csv", "filename"))
+    check(f"years shards={shards} newest year file", [name], ["loc_01_2025_access_logs.csv"], True)
+    check(f"years shards={shards} newest year rows", [row for row in rows if row[1].startswith("2025")], read_output(folder, name), not shards)
+    check(f"years shards={shards} given year rows", [row for row in rows if row[1].startswith("2023")], run_month(folder, 1, 2023), not shards)
+    check(f"years shards={shards} no other files", sorted(os.listdir(folder)), sorted(["summary.csv"] + (["summary"] if shards else [])), True)
+
+state_path = os.path.join(WORK_DIR, "window-state.json")
+now = datetime(2025, 3, 10, 14, 30)
+if last_window_end("access_logs", "hourly", path=state_path) is None and len(list_windows("hourly", now=now)) == 1:
+    passed += 1
+else:
+    print("FAIL: a stream without state should only get the current window")
+    failed += 1
+record_window_end("access_logs", "hourly", datetime(2025, 3, 10, 9, 59, 59), path=state_path)
+since = last_window_end("access_logs", "hourly", path=state_path)
+windows = list_windows("hourly", since=since, now=now)
+if [window.start.hour for window in windows] == [10, 11, 12, 13] and last_window_end("access_logs", "daily", path=state_path) is None:
+    passed += 1
+else:
+    print(f"FAIL: hourly backfill after 09:59:59 at 14:30 gave {[window.label for window in windows]}")
+    failed += 1
+if len(list_windows("hourly", since=since - timedelta(days=30), now=now, limit=24)) == 24:
+    passed += 1
+else:
+    print("FAIL: backfill limit not applied")
+    failed += 1
+
+print(f"{passed} passed, {failed} failed")
+
+if BENCH_ROWS:
+    header = ["IP Address", "Access Date", "Module Viewed", "Status Code", "Data Saved (GB)", "Device Used", "Browser Used", "Access Time"]
+    folder = os.path.join(WORK_DIR, "bench")
+    rows = []
+    for number in range(BENCH_ROWS):
+        moment = base + timedelta(seconds=number * 90 * 86400 // BENCH_ROWS)
+        rows.append([f"10.0.{number % 200}.{number % 250}", moment.strftime("%Y-%m-%d"), "Khan Academy", "200", "0.00012", "Android", "Chrome Mobile", moment.strftime("%H:%M:%S")])
+    write_summary(folder, header, rows, False)
+    del rows
+
+    def legacy_run(select):
+        # Same reading and writing as the scripts, with the old per-row filter
+        with open(os.path.join(folder, "summary.csv"), "r", encoding="utf-8", newline="") as infile, open(os.devnull, "w", newline="") as outfile:
+            reader = csv.reader(line.replace("\0", "") for line in infile)
+            summary_header = next(reader)
+            kept = select(reader, summary_header)
+            csv.writer(outfile).writerows(kept)
+        return kept
+
+    day = datetime(2025, 1, 15)
+    for label, start, end in (("daily", day, day.replace(hour=23, minute=59, second=59)), ("monthly", datetime(2025, 1, 1), datetime(2025, 1, 31, 23, 59, 59))):
+        began = time.perf_counter()
+        want = legacy_run(lambda reader, summary_header: legacy_window_rows(reader, summary_header, start, end))
+        legacy_seconds = time.perf_counter() - began
+        began = time.perf_counter()
+        got = run_window(folder, start, end)
+        seconds = time.perf_counter() - began
+        print(f"bench {label} window: {BENCH_ROWS} rows, strptime filter {legacy_seconds:.1f}s, filter_time_based.py {seconds:.1f}s ({len(got)} rows kept)")
+        check(f"bench {label}", want, got, True)
+    began = time.perf_counter()
+    want = legacy_run(lambda reader, summary_header: legacy_month_rows(reader, summary_header, 1))
+    legacy_seconds = time.perf_counter() - began
+    began = time.perf_counter()
+    got = run_month(folder, 1)
+    seconds = time.perf_counter() - began
+    print(f"bench month: {BENCH_ROWS} rows, strptime filter {legacy_seconds:.1f}s, process_csv.py {seconds:.1f}s ({len(got)} rows kept)")
+    check("bench month", want, got, True)
+
+sys.exit(1 if failed else 0)
+PY
+
+if (( rc != 0 )); then
+  log "=== Results: filter parity FAILED ==="
+  exit 1
+fi
+log "=== Results: filter parity passed ==="
@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 
+import json
+import os
 import shlex
 import sys
 from dataclasses import dataclass
 from datetime import datetime, time, timedelta
 
+# Last window each stream (file suffix) was built for, so missed windows can be backfilled
+DEFAULT_STATE_FILE = os.path.join("00_DATA", "00_CACHE", "window-state.json")
+# Oldest missed windows beyond this are dropped; a week of hourly windows
+DEFAULT_MAX_BACKFILL_WINDOWS = 168
+STATE_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
 
 @dataclass
 class Window:
@@ -104,6 +112,113 @@ def compute_window(
     raise ValueError(f"Unsupported schedule type: {schedule_type}")
 
 
+def previous_window(schedule_type: str, window: Window, run_interval_seconds: int | None = None) -> Window:
+    """The window just before window: the one that was last completed when window started."""
+    return compute_window(schedule_type, now=window.start, run_interval_seconds=run_interval_seconds)
+
+
+def windows_between(
+    schedule_type: str,
+    start: datetime,
+    end: datetime,
+    run_interval_seconds: int | None = None,
+) -> list[Window]:
+    """Consecutive windows from the one starting at start to the one ending at end, oldest first."""
+    window = compute_window(schedule_type, now=end + timedelta(seconds=1), run_interval_seconds=run_interval_seconds)
+    windows = []
+    while window.start >= start:
+        windows.append(window)
+        window = previous_window(schedule_type, window, run_interval_seconds)
+    windows.reverse()
+    return windows
+
+
+def list_windows(
+    schedule_type: str,
+    since: datetime | None = None,
+    now: datetime | None = None,
+    run_interval_seconds: int | None = None,
+    limit: int = DEFAULT_MAX_BACKFILL_WINDOWS,
+) -> list[Window]:
+    """
+    Completed windows ending after since, oldest first, keeping the newest limit.
+    Without since only the last completed window is returned, as compute_window does.
+    """
+    window = compute_window(schedule_type, now=now, run_interval_seconds=run_interval_seconds)
+    windows = [window]
+    while since is not None and len(windows) < limit:
+        window = previous_window(schedule_type, window, run_interval_seconds)
+        if window.end <= since:
+            break
+        windows.append(window)
+    windows.reverse()
+    return windows
+
+
+def state_file_path() -> str:
+    return os.environ.get("CDN_AUTO_WINDOW_STATE_FILE") or DEFAULT_STATE_FILE
+
+
+def max_backfill_windows() -> int:
+    try:
+        return max(1, int(os.environ.get("CDN_AUTO_MAX_BACKFILL_WINDOWS", DEFAULT_MAX_BACKFILL_WINDOWS)))
+    except ValueError:
+        return DEFAULT_MAX_BACKFILL_WINDOWS
+
+
+def load_state(path: str | None = None) -> dict:
+    try:
+        with open(path or state_file_path(), "r", encoding="utf-8") as handle:
+            state = json.load(handle)
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def last_window_end(
+    stream: str,
+    schedule_type: str,
+    run_interval_seconds: int | None = None,
+    path: str | None = None,
+) -> datetime | None:
+    """End of the last window recorded for stream, or None if there is none for this schedule."""
+    entry = load_state(path).get(stream)
+    if not isinstance(entry, dict):
+        return None
+    # Windows of another schedule do not line up with this one's
+    if entry.get("schedule_type") != schedule_type:
+        return None
+    if schedule_type == "custom" and entry.get("run_interval_seconds") != run_interval_seconds:
+        return None
+    try:
+        return datetime.strptime(entry.get("end", ""), STATE_TIME_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+def record_window_end(
+    stream: str,
+    schedule_type: str,
+    end: datetime,
+    run_interval_seconds: int | None = None,
+    path: str | None = None,
+) -> None:
+    path = path or state_file_path()
+    state = load_state(path)
+    state[stream] = {
+        "schedule_type": schedule_type,
+        "run_interval_seconds": run_interval_seconds,
+        "end": end.strftime(STATE_TIME_FORMAT),
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as handle:
+        json.dump(state, handle, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+
 def build_filename(
     location: str,
     schedule_type: str,
@@ -116,12 +231,37 @@ def build_filename(
     return f"{location}_{window.file_stamp}_{suffix}.csv"
 
 
-def emit_shell(schedule_type: str, location: str, suffix: str, run_interval_seconds: int | None = None) -> None:
-    window = compute_window(schedule_type, run_interval_seconds=run_interval_seconds)
+def window_values(
+    schedule_type: str,
+    location: str,
+    suffix: str,
+    run_interval_seconds: int | None = None,
+    backfill: bool = False,
+) -> dict:
+    """
+    The window as WINDOW_* values. With backfill, WINDOW_START_DATE and
+    WINDOW_END_DATE span every window missed since the last one recorded for
+    suffix, WINDOW_COUNT says how many there are, and WINDOW_FILENAME/
+    WINDOW_FILE_STAMP are the newest window's.
+    """
+    since = last_window_end(suffix, schedule_type, run_interval_seconds) if backfill else None
+    windows = list_windows(
+        schedule_type,
+        since=since,
+        run_interval_seconds=run_interval_seconds,
+        limit=max_backfill_windows(),
+    )
+    window = windows[-1]
+    label = window.label
+    if len(windows) > 1:
+        label = (
+            f"{len(windows)} windows from {windows[0].start.strftime('%Y-%m-%d %H:%M:%S')} "
+            f"to {window.end.strftime('%Y-%m-%d %H:%M:%S')}"
+        )
     values = {
-        "WINDOW_START_DATE": window.start.strftime("%Y-%m-%dT%H:%M:%S"),
-        "WINDOW_END_DATE": window.end.strftime("%Y-%m-%dT%H:%M:%S"),
-        "WINDOW_LABEL": window.label,
+        "WINDOW_START_DATE": windows[0].start.strftime(STATE_TIME_FORMAT),
+        "WINDOW_END_DATE": window.end.strftime(STATE_TIME_FORMAT),
+        "WINDOW_LABEL": label,
         "WINDOW_FILENAME": build_filename(
             location,
             schedule_type,
@@ -131,23 +271,60 @@ def emit_shell(schedule_type: str, location: str, suffix: str, run_interval_seco
         ),
         "WINDOW_FILE_STAMP": window.file_stamp,
         "WINDOW_SCHEDULE_TYPE": schedule_type,
+        "WINDOW_COUNT": str(len(windows)),
     }
 
     if run_interval_seconds is not None:
         values["WINDOW_RUN_INTERVAL_SECONDS"] = str(run_interval_seconds)
+    return values
+
 
+def emit_shell(
+    schedule_type: str,
+    location: str,
+    suffix: str,
+    run_interval_seconds: int | None = None,
+    backfill: bool = False,
+) -> None:
+    """Print window_values() as shell assignments."""
+    values = window_values(schedule_type, location, suffix, run_interval_seconds, backfill)
     for key, value in values.items():
         print(f"{key}={shlex.quote(value)}")
 
 
+def parse_interval(value: str) -> int | None:
+    return int(value) if value else None
+
+
 if __name__ == "__main__":
-    if len(sys.argv) not in (4, 5):
-        sys.stderr.write("Usage: python time_window.py <schedule_type> <location> <suffix> [run_interval_seconds]\n")
+    args = sys.argv[1:]
+
+    if args[:1] == ["record"]:
+        # time_window.py record <suffix> <schedule_type> <window_end> [run_interval_seconds]
+        if len(args) not in (4, 5):
+            sys.stderr.write("Usage: python time_window.py record <suffix> <schedule_type> <YYYY-MM-DDTHH:MM:SS> [run_interval_seconds]\n")
+            sys.exit(1)
+        try:
+            record_window_end(
+                args[1],
+                args[2],
+                datetime.strptime(args[3], STATE_TIME_FORMAT),
+                run_interval_seconds=parse_interval(args[4]) if len(args) == 5 else None,
+            )
+        except (OSError, ValueError) as exc:
+            sys.stderr.write(f"{exc}\n")
+            sys.exit(1)
+        sys.exit(0)
+
+    backfill = "--backfill" in args
+    args = [arg for arg in args if arg != "--backfill"]
+    if len(args) not in (3, 4):
+        sys.stderr.write("Usage: python time_window.py [--backfill] <schedule_type> <location> <suffix> [run_interval_seconds]\n")
         sys.exit(1)
 
     try:
-        run_interval_seconds = int(sys.argv[4]) if len(sys.argv) == 5 and sys.argv[4] else None
-        emit_shell(sys.argv[1], sys.argv[2], sys.argv[3], run_interval_seconds=run_interval_seconds)
+        run_interval_seconds = parse_interval(args[3]) if len(args) == 4 else None
+        emit_shell(args[0], args[1], args[2], run_interval_seconds=run_interval_seconds, backfill=backfill)
     except ValueError as exc:
         sys.stderr.write(f"{exc}\n")
         sys.exit(1)
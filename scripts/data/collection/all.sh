@@ -95,20 +95,6 @@ elif [[ "$log_choice" == "5" ]]; then
         -exec cp {} "$new_folder"/ \;
 fi
 
-# Move to the new folder
-cd "$new_folder" || { echo "Failed to access the logs folder. Exiting..."; exit 1; }
-
-# Uncompress any .gz files
-echo "Uncompressing files (if any)..."
-for compressed_file in *.gz; do
-    if [ -f "$compressed_file" ]; then
-        gzip -d "$compressed_file"
-    fi
-done
-
-# Return to the original directory
-cd ..
-
 # Check if the "00_DATA" folder exists, and create it if not
 if [ ! -d "00_DATA" ]; then
     mkdir "00_DATA"
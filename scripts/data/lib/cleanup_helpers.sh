@@ -6,6 +6,7 @@ RESERVED_LOG_RUN_NAMES=(
   "00_UPLOAD_QUEUE"
   "00_KOLIBRI_EXPORTS"
   "00_OC4D_ASSESSMENTS"
+  "00_CACHE"
 )
 
 log_cleanup() {
@@ -0,0 +1,117 @@
+#!/bin/bash
+# Queue flush shared by s3_helpers.sh and oc4d_assessment_helpers.sh.
+# Jobs are "<folder_name><TAB><queued file>"; every queued file across every queue folder
+# goes into one upload_batch (upload_helpers.sh), so at most UPLOAD_CONCURRENCY (default 4)
+# uploads run at once, and each file keeps its own success/failure handling afterwards
+# (finish_queued_file / finish_oc4d_queued_file). Queued files bound for the same destination
+# are collapsed to the newest; the older copies leave the queue once it has uploaded.
+
+_flush_helpers_dir="$(CDPATH= cd -- "$(dirname -- "${BASH_SOURCE[0]}")" >/dev/null 2>&1 && pwd)"
+# shellcheck disable=SC1091
+source "$_flush_helpers_dir/upload_helpers.sh"
+
+# Result detail for a queued file dropped in favour of a newer copy for the same destination
+UPLOAD_SUPERSEDED="superseded"
+
+# Append one job per queued *.csv / *.csv.gz in queue_dir to the array named by $3
+queue_flush_jobs() {
+  local queue_dir="$1"
+  local folder_name="$2"
+  local -n _jobs="$3"
+  local files=()
+  local queued_file
+
+  [[ -d "$queue_dir" ]] || return 0
+  shopt -s nullglob
+  files=("$queue_dir"/*.csv "$queue_dir"/*.csv.gz)
+  shopt -u nullglob
+  for queued_file in "${files[@]}"; do
+    _jobs+=("$folder_name"$'\t'"$queued_file")
+  done
+}
+
+# Set the variable named by $3 to the job's destination; returns 1 when the file cannot be uploaded
+flush_job_destination() {
+  local folder_name="$1"
+  local queued_file="$2"
+
+  if [[ "$folder_name" == "OC4DAssessments" ]]; then
+    oc4d_queued_destination "$queued_file" "$3"
+  else
+    upload_destination "$queued_file" "$folder_name" "$3"
+  fi
+}
+
+finish_flush_job() {
+  local folder_name="$1"
+  local queued_file="$2"
+  local status="$3"
+  local detail="${4:-}"
+
+  if [[ "$folder_name" == "OC4DAssessments" ]]; then
+    finish_oc4d_queued_file "$queued_file" "$status" "$detail"
+  else
+    finish_queued_file "$queued_file" "$folder_name" "$status" "$detail"
+  fi
+}
+
+# Upload every job in one batch; returns 1 if any file stays queued
+run_flush_jobs() {
+  local job folder_name queued_file destination status detail batch_jobs batch_results newest older
+  local failed=0
+  local -A job_folders=()
+  local -A newest_for=()
+  local -A superseded_by=()
+  local -A outcomes=()
+
+  (( $# > 0 )) || return 0
+  batch_jobs="$(mktemp)"
+  batch_results="$(mktemp)"
+
+  for job in "$@"; do
+    folder_name="${job%%$'\t'*}"
+    queued_file="${job#*$'\t'}"
+    destination=""
+    if ! flush_job_destination "$folder_name" "$queued_file" destination; then
+      failed=1
+      continue
+    fi
+    job_folders["$queued_file"]="$folder_name"
+    newest="${newest_for[$destination]:-}"
+    if [[ -z "$newest" ]]; then
+      newest_for["$destination"]="$queued_file"
+      continue
+    fi
+    # Only the newest queued copy for a destination is sent
+    older="$queued_file"
+    if [[ "$queued_file" -nt "$newest" ]]; then
+      older="$newest"
+      newest_for["$destination"]="$queued_file"
+    fi
+    superseded_by["$older"]="$destination"
+    log "[queue] $(basename "$older") has a newer queued copy for $destination; sending only that one."
+  done
+
+  for destination in "${!newest_for[@]}"; do
+    printf '%s\t%s\n' "${newest_for[$destination]}" "$destination" >> "$batch_jobs"
+  done
+
+  upload_batch "$batch_jobs" "$batch_results" || failed=1
+  while IFS=$'\t' read -r status queued_file destination _ detail; do
+    [[ -n "${job_folders[$queued_file]:-}" ]] || continue
+    outcomes["$destination"]="$status"
+    finish_flush_job "${job_folders[$queued_file]}" "$queued_file" "$status" "$detail" || failed=1
+  done < "$batch_results"
+
+  # Older copies go once their destination holds the newer one; otherwise they stay queued with it
+  for older in "${!superseded_by[@]}"; do
+    if [[ "${outcomes[${superseded_by[$older]}]:-}" == "ok" ]]; then
+      finish_flush_job "${job_folders[$older]}" "$older" "ok" "$UPLOAD_SUPERSEDED" || failed=1
+    else
+      failed=1
+    fi
+  done
+
+  rm -f "$batch_jobs" "$batch_results"
+  return "$failed"
+}
@@ -0,0 +1,63 @@
+#!/bin/bash
+# Upload ledger shared by every S3 upload (upload_helpers.sh).
+# Each successful upload records "<destination><TAB><sha256><TAB><size><TAB><epoch>" in
+# 00_DATA/00_CACHE/upload-ledger.tsv (CDN_AUTO_UPLOAD_LEDGER_FILE); a later upload of the same
+# bytes to the same destination is reported as unchanged instead of being sent again.
+# CDN_AUTO_UPLOAD_LEDGER=0 sends everything; deleting the file forces the next uploads.
+
+_ledger_helpers_dir="$(CDPATH= cd -- "$(dirname -- "${BASH_SOURCE[0]}")" >/dev/null 2>&1 && pwd)"
+
+# Result detail for a job the ledger skipped
+UPLOAD_UNCHANGED="unchanged"
+
+upload_ledger_file() {
+  printf '%s\n' "${CDN_AUTO_UPLOAD_LEDGER_FILE:-$_ledger_helpers_dir/../../../00_DATA/00_CACHE/upload-ledger.tsv}"
+}
+
+upload_ledger_enabled() {
+  [[ "${CDN_AUTO_UPLOAD_LEDGER:-1}" != "0" ]] && command -v sha256sum >/dev/null 2>&1
+}
+
+# Print "<sha256><TAB><size>" for a file
+file_fingerprint() {
+  local file_path="$1"
+  local digest size
+
+  digest="$(sha256sum -- "$file_path" 2>/dev/null)" || return 1
+  size="$(wc -c < "$file_path" | tr -d ' ')" || return 1
+  printf '%s\t%s\n' "${digest%% *}" "$size"
+}
+
+# Fill the associative array named by $1 with destination -> "<sha256><TAB><size>"
+read_upload_ledger() {
+  local -n _ledger="$1"
+  local ledger_file destination digest size
+
+  ledger_file="$(upload_ledger_file)"
+  [[ -f "$ledger_file" ]] || return 0
+  while IFS=$'\t' read -r destination digest size _; do
+    [[ -n "$destination" && -n "$digest" ]] || continue
+    _ledger["$destination"]="$digest"$'\t'"$size"
+  done < "$ledger_file"
+}
+
+# Record the uploads listed in fingerprints_file ("<destination><TAB><sha256><TAB><size>");
+# each replaces the destination's earlier entry. Locked and renamed into place like the region cache.
+record_upload_ledger() {
+  local fingerprints_file="$1"
+  local ledger_file tmp
+
+  [[ -s "$fingerprints_file" ]] || return 0
+  ledger_file="$(upload_ledger_file)"
+  mkdir -p "$(dirname "$ledger_file")" 2>/dev/null || return 0
+  tmp="$ledger_file.$BASHPID.tmp"
+  {
+    command -v flock >/dev/null 2>&1 && flock -w 30 9
+    {
+      if [[ -f "$ledger_file" ]]; then
+        awk -F'\t' 'NR == FNR { recorded[$1] = 1; next } !($1 in recorded)' "$fingerprints_file" "$ledger_file"
+      fi
+      awk -F'\t' -v now="$(date +%s)" 'BEGIN { OFS = "\t" } { print $1, $2, $3, now }' "$fingerprints_file"
+    } > "$tmp" 2>/dev/null && mv -f "$tmp" "$ledger_file" 2>/dev/null || rm -f "$tmp"
+  } 2>/dev/null 9> "$ledger_file.lock" || true
+}
@@ -5,6 +5,10 @@ if ! declare -f log >/dev/null 2>&1; then
   log() { echo "[oc4d] $*"; }
 fi
 
+_oc4d_helpers_dir="$(CDPATH= cd -- "$(dirname -- "${BASH_SOURCE[0]}")" >/dev/null 2>&1 && pwd)"
+# shellcheck disable=SC1091
+source "$_oc4d_helpers_dir/flush_helpers.sh"
+
 oc4d_sanitize_key_segment() {
   local value="${1:-}"
   value="$(printf '%s' "$value" | tr -d '\r\n')"
@@ -21,27 +25,11 @@ oc4d_bucket_name() {
 }
 
 oc4d_bucket_region() {
-  local bucket region=""
-  bucket="$(oc4d_bucket_name)"
-  region="$(aws --region us-east-1 s3api get-bucket-location --bucket "$bucket" --query 'LocationConstraint' --output text 2>/dev/null || true)"
-  if [[ -z "$region" || "$region" == "None" ]]; then
-    region="us-east-1"
-  fi
-  if [[ "$region" == "EU" ]]; then
-    region="eu-west-1"
-  fi
-  if [[ -z "$region" ]] && command -v curl >/dev/null 2>&1; then
-    region="$(curl -sI "https://${bucket}.s3.amazonaws.com/" | tr -d '\r' | awk -F': ' 'BEGIN{IGNORECASE=1}/^x-amz-bucket-region:/{print $2; exit}')"
-  fi
-  printf '%s' "$region"
+  cached_bucket_region "$(oc4d_bucket_name)"
 }
 
 oc4d_aws_cp() {
-  local file_path="$1"
-  local destination="$2"
-  local region
-  region="$(oc4d_bucket_region)"
-  aws --region "$region" s3 cp "$file_path" "$destination"
+  s3_put_file "$1" "$2"
 }
 
 oc4d_safe_filename_base() {
@@ -128,29 +116,83 @@ oc4d_sidecar_for_csv() {
   printf '%s.oc4dkey' "$1"
 }
 
-upload_oc4d_one() {
+# Set the variable named by $3 to the key's destination in OC4D_BUCKET and log the upload; returns 1 for an invalid key
+oc4d_upload_destination() {
   local file_path="$1"
   local s3_key="$2"
-  local bucket remote_path output rc reason
+  local -n _oc4d_destination="$3"
+  local reason
 
   reason="$(validate_oc4d_upload_key "$s3_key")" || {
     log "[oc4d][error] Invalid key for $(basename "$file_path"): $reason"
     return 1
   }
+  _oc4d_destination="s3://$(oc4d_bucket_name)/${s3_key}"
+  log "[oc4d][upload] $(basename "$file_path") -> $_oc4d_destination"
+}
 
-  bucket="$(oc4d_bucket_name)"
-  remote_path="s3://${bucket}/${s3_key}"
-  log "[oc4d][upload] $(basename "$file_path") -> $remote_path"
-  output="$(oc4d_aws_cp "$file_path" "$remote_path" 2>&1)"
-  rc=$?
-  if (( rc == 0 )); then
-    log "[oc4d][done] Uploaded: $(basename "$file_path")"
+# Log one upload's outcome; returns 1 when it failed
+log_oc4d_upload_result() {
+  local file_path="$1"
+  local status="$2"
+  local detail="${3:-}"
+
+  if [[ "$status" == "ok" ]]; then
+    case "$detail" in
+      "$UPLOAD_UNCHANGED") log "[oc4d][skip] Unchanged since its last upload: $(basename "$file_path")" ;;
+      "$UPLOAD_SUPERSEDED") log "[oc4d][skip] Superseded by a newer queued copy: $(basename "$file_path")" ;;
+      *) log "[oc4d][done] Uploaded: $(basename "$file_path")" ;;
+    esac
     return 0
   fi
-  log "[oc4d][error] Upload failed for $(basename "$file_path"): $output"
+  log "[oc4d][error] Upload failed for $(basename "$file_path"): $detail"
   return 1
 }
 
+upload_oc4d_one() {
+  local file_path="$1"
+  local s3_key="$2"
+  local remote_path output
+
+  oc4d_upload_destination "$file_path" "$s3_key" remote_path || return 1
+  if output="$(oc4d_aws_cp "$file_path" "$remote_path" 2>&1)"; then
+    log_oc4d_upload_result "$file_path" "ok" "${output##*$'\n'}"
+  else
+    log_oc4d_upload_result "$file_path" "failed" "$output"
+  fi
+}
+
+# Upload "<file><TAB><s3 key>" lines from jobs_file to OC4D_BUCKET in one batch;
+# results_file gets "ok|failed<TAB>file<TAB>key" per job. Returns 1 if any failed.
+upload_oc4d_batch() {
+  local jobs_file="$1"
+  local results_file="$2"
+  local file_path s3_key destination status detail batch_jobs batch_results
+  local rc=0
+
+  : > "$results_file"
+  batch_jobs="$(mktemp)"
+  batch_results="$(mktemp)"
+  while IFS=$'\t' read -r file_path s3_key; do
+    [[ -n "$file_path" ]] || continue
+    if oc4d_upload_destination "$file_path" "$s3_key" destination; then
+      printf '%s\t%s\n' "$file_path" "$destination" >> "$batch_jobs"
+    else
+      printf 'failed\t%s\t%s\n' "$file_path" "$s3_key" >> "$results_file"
+      rc=1
+    fi
+  done < "$jobs_file"
+
+  upload_batch "$batch_jobs" "$batch_results" || rc=1
+  while IFS=$'\t' read -r status file_path destination _ detail; do
+    log_oc4d_upload_result "$file_path" "$status" "$detail" || true
+    printf '%s\t%s\t%s\n' "$status" "$file_path" "${destination#s3://*/}" >> "$results_file"
+  done < "$batch_results"
+
+  rm -f "$batch_jobs" "$batch_results"
+  return "$rc"
+}
+
 queue_oc4d_one() {
   local file_path="$1"
   local queue_root="${2:?queue root required}"
@@ -166,38 +208,43 @@ queue_oc4d_one() {
   log "[oc4d][queue] Queued $base (key=$s3_key)"
 }
 
-flush_oc4d_queue() {
-  local queue_root="${1:?queue root required}"
-  local queue_dir failed=0 csv sidecar s3_key files=()
+# Set the variable named by $2 to a queued file's destination from its .oc4dkey sidecar; returns 1 (file stays queued) without a valid key
+oc4d_queued_destination() {
+  local csv="$1"
+  local sidecar s3_key
 
-  queue_dir="$(oc4d_queue_dir "$queue_root")"
-  [[ -d "$queue_dir" ]] || return 0
+  sidecar="$(oc4d_sidecar_for_csv "$csv")"
+  if [[ ! -f "$sidecar" ]]; then
+    log "[oc4d][warn] Missing sidecar for queued file $(basename "$csv"); leaving in queue."
+    return 1
+  fi
+  s3_key="$(tr -d '\r' < "$sidecar" | head -n1)"
+  if ! oc4d_upload_destination "$csv" "$s3_key" "$2"; then
+    log "[oc4d] Leaving queued: $(basename "$csv")"
+    return 1
+  fi
+}
 
-  shopt -s nullglob
-  files=("$queue_dir"/*.csv)
-  shopt -u nullglob
+# After a queued OC4D file's upload: on success drop it with its .oc4dkey sidecar
+finish_oc4d_queued_file() {
+  local csv="$1"
+  local status="$2"
+  local detail="${3:-}"
 
-  if (( ${#files[@]} == 0 )); then
+  if log_oc4d_upload_result "$csv" "$status" "$detail"; then
+    rm -f "$csv" "$(oc4d_sidecar_for_csv "$csv")"
     return 0
   fi
+  log "[oc4d] Leaving queued: $(basename "$csv")"
+  return 1
+}
 
-  for csv in "${files[@]}"; do
-    sidecar="$(oc4d_sidecar_for_csv "$csv")"
-    if [[ ! -f "$sidecar" ]]; then
-      log "[oc4d][warn] Missing sidecar for queued file $(basename "$csv"); leaving in queue."
-      failed=1
-      continue
-    fi
-    s3_key="$(tr -d '\r' < "$sidecar" | head -n1)"
-    if upload_oc4d_one "$csv" "$s3_key"; then
-      rm -f "$csv" "$sidecar"
-    else
-      log "[oc4d] Leaving queued: $(basename "$csv")"
-      failed=1
-    fi
-  done
+flush_oc4d_queue() {
+  local queue_root="${1:?queue root required}"
+  local jobs=()
 
-  return "$failed"
+  queue_flush_jobs "$(oc4d_queue_dir "$queue_root")" "OC4DAssessments" jobs
+  run_flush_jobs "${jobs[@]}"
 }
 
 resolve_oc4d_api_token() {
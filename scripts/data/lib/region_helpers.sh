@@ -0,0 +1,150 @@
+#!/bin/bash
+# Bucket-region cache shared by the RACHEL, Kolibri, ModuleGaze and OC4D uploads.
+# Regions are looked up once per bucket and kept in 00_DATA/00_CACHE/bucket-regions.tsv
+# (CDN_AUTO_BUCKET_REGION_FILE) for CDN_AUTO_BUCKET_REGION_TTL seconds (default 7 days);
+# an upload that fails with a region error retries once in the right region, and the batch corrects the entry.
+
+_region_helpers_dir="$(CDPATH= cd -- "$(dirname -- "${BASH_SOURCE[0]}")" >/dev/null 2>&1 && pwd)"
+
+DEFAULT_BUCKET_REGION_TTL=604800
+
+region_cache_file() {
+  printf '%s\n' "${CDN_AUTO_BUCKET_REGION_FILE:-$_region_helpers_dir/../../../00_DATA/00_CACHE/bucket-regions.tsv}"
+}
+
+region_cache_ttl() {
+  local ttl="${CDN_AUTO_BUCKET_REGION_TTL:-$DEFAULT_BUCKET_REGION_TTL}"
+  [[ "$ttl" =~ ^[0-9]+$ ]] || ttl="$DEFAULT_BUCKET_REGION_TTL"
+  printf '%s\n' "$ttl"
+}
+
+# Cached region for a bucket, if it is younger than the TTL
+read_cached_bucket_region() {
+  local bucket="$1"
+  local cache_file now ttl cached_bucket region resolved_at
+
+  cache_file="$(region_cache_file)"
+  [[ -f "$cache_file" ]] || return 1
+  now="$(date +%s)"
+  ttl="$(region_cache_ttl)"
+  while IFS=$'\t' read -r cached_bucket region resolved_at; do
+    [[ "$cached_bucket" == "$bucket" && -n "$region" && "$resolved_at" =~ ^[0-9]+$ ]] || continue
+    if (( now - resolved_at < ttl )); then
+      printf '%s\n' "$region"
+      return 0
+    fi
+    return 1
+  done < "$cache_file"
+  return 1
+}
+
+# Replace (or with no region, drop) a bucket's entry. Writers take a lock on <cache>.lock so
+# concurrent updates never drop each other's entries, and the file is replaced by a rename so
+# readers never see half a file.
+write_cached_bucket_region() {
+  local bucket="$1"
+  local region="${2:-}"
+  local cache_file tmp
+
+  cache_file="$(region_cache_file)"
+  mkdir -p "$(dirname "$cache_file")" 2>/dev/null || return 0
+  # $BASHPID, unlike $$, differs between background subshells
+  tmp="$cache_file.$BASHPID.tmp"
+  {
+    command -v flock >/dev/null 2>&1 && flock -w 30 9
+    {
+      if [[ -f "$cache_file" ]]; then
+        awk -F'\t' -v bucket="$bucket" '$1 != bucket' "$cache_file"
+      fi
+      if [[ -n "$region" ]]; then
+        printf '%s\t%s\t%s\n' "$bucket" "$region" "$(date +%s)"
+      fi
+    } > "$tmp" 2>/dev/null && mv -f "$tmp" "$cache_file" 2>/dev/null || rm -f "$tmp"
+  } 2>/dev/null 9> "$cache_file.lock" || true
+}
+
+forget_bucket_region() {
+  write_cached_bucket_region "$1"
+}
+
+# Ask S3 where the bucket lives; prints nothing when neither the API nor the endpoint answered
+lookup_bucket_region() {
+  local bucket="$1"
+  local region=""
+
+  region="$(aws --region us-east-1 s3api get-bucket-location --bucket "$bucket" --query 'LocationConstraint' --output text 2>/dev/null || true)"
+  if [[ "$region" == "None" ]]; then
+    region="us-east-1"
+  fi
+  if [[ "$region" == "EU" ]]; then
+    region="eu-west-1"
+  fi
+
+  if [[ -z "$region" ]] && command -v curl >/dev/null 2>&1; then
+    region="$(curl -sI "https://${bucket}.s3.amazonaws.com/" | tr -d '\r' | awk -F': ' 'BEGIN{IGNORECASE=1}/^x-amz-bucket-region:/{print $2; exit}')"
+  fi
+
+  printf '%s\n' "$region"
+}
+
+# Region for a bucket: the cache while it is fresh, else one lookup that is cached.
+# A failed lookup falls back to us-east-1 without caching it.
+cached_bucket_region() {
+  local bucket="$1"
+  local region=""
+
+  if region="$(read_cached_bucket_region "$bucket")"; then
+    printf '%s\n' "$region"
+    return 0
+  fi
+
+  region="$(lookup_bucket_region "$bucket")"
+  if [[ -n "$region" ]]; then
+    write_cached_bucket_region "$bucket" "$region"
+  else
+    region="us-east-1"
+  fi
+  printf '%s\n' "$region"
+}
+
+# True when aws output says the request went to the wrong region
+is_region_mismatch() {
+  grep -qE 'PermanentRedirect|AuthorizationHeaderMalformed|IllegalLocationConstraint|wrong; expecting|must be addressed using the specified endpoint|\(301\)' <<< "$1"
+}
+
+# aws s3 cp with the given region, or else the bucket's cached one (and CDN_AUTO_S3_ENDPOINT_URL when set);
+# .gz keys are stored as application/gzip, matching s3_uploader.py. On a region error the copy is retried
+# once with the region S3 names, or a fresh lookup. The cache is left alone so parallel copies never write
+# it: aws_cli_region is set to the region S3 accepted or named (empty otherwise) for the caller to record.
+aws_cli_cp_bucket() {
+  local file_path="$1"
+  local destination="$2"
+  local bucket="$3"
+  local region="${4:-}"
+  local output rc expected
+  local endpoint=()
+  local metadata=()
+
+  aws_cli_region=""
+  [[ -n "${CDN_AUTO_S3_ENDPOINT_URL:-}" ]] && endpoint=(--endpoint-url "$CDN_AUTO_S3_ENDPOINT_URL")
+  [[ "$destination" == *.gz ]] && metadata=(--content-type application/gzip)
+  [[ -n "$region" ]] || region="$(cached_bucket_region "$bucket")"
+  output="$(aws --region "$region" "${endpoint[@]}" s3 cp "$file_path" "$destination" "${metadata[@]}" 2>&1)"
+  rc=$?
+  if (( rc == 0 )) || ! is_region_mismatch "$output"; then
+    (( rc == 0 )) && aws_cli_region="$region"
+    [[ -n "$output" ]] && printf '%s\n' "$output"
+    return "$rc"
+  fi
+
+  expected="$(sed -nE "s/.*expecting '([a-z0-9-]+)'.*/\1/p" <<< "$output" | head -n1)"
+  if [[ -n "$expected" ]]; then
+    region="$expected"
+    aws_cli_region="$expected"
+  else
+    region="$(lookup_bucket_region "$bucket")"
+    [[ -n "$region" ]] || region="us-east-1"
+  fi
+  aws --region "$region" "${endpoint[@]}" s3 cp "$file_path" "$destination" "${metadata[@]}" || return
+  aws_cli_region="$region"
+}
@@ -3,6 +3,8 @@
 _helpers_dir="$(CDPATH= cd -- "$(dirname -- "${BASH_SOURCE[0]}")" >/dev/null 2>&1 && pwd)"
 # shellcheck disable=SC1091
 source "$_helpers_dir/cleanup_helpers.sh"
+# shellcheck disable=SC1091
+source "$_helpers_dir/flush_helpers.sh"
 
 join_path() {
   local a="${1%/}"
@@ -16,33 +18,11 @@ bucket_name() {
 }
 
 bucket_region() {
-  local bucket
-  local region=""
-
-  bucket="$(bucket_name)"
-  region="$(aws --region us-east-1 s3api get-bucket-location --bucket "$bucket" --query 'LocationConstraint' --output text 2>/dev/null || true)"
-
-  if [[ -z "$region" || "$region" == "None" ]]; then
-    region="us-east-1"
-  fi
-  if [[ "$region" == "EU" ]]; then
-    region="eu-west-1"
-  fi
-
-  if [[ -z "$region" ]] && command -v curl >/dev/null 2>&1; then
-    region="$(curl -sI "https://${bucket}.s3.amazonaws.com/" | tr -d '\r' | awk -F': ' 'BEGIN{IGNORECASE=1}/^x-amz-bucket-region:/{print $2; exit}')"
-  fi
-
-  echo "$region"
+  cached_bucket_region "$(bucket_name)"
 }
 
 aws_cp_region() {
-  local file_path="$1"
-  local destination="$2"
-  local region
-
-  region="$(bucket_region)"
-  aws --region "$region" s3 cp "$file_path" "$destination"
+  s3_put_file "$1" "$2"
 }
 
 remote_base_path() {
@@ -53,34 +33,82 @@ remote_base_path() {
   echo "$base"
 }
 
-upload_one() {
+# Set the variable named by $3 to the file's S3 destination under folder_name and log the upload
+upload_destination() {
   local file_path="$1"
   local folder_name="${2:-RACHEL}"
+  local -n _upload_destination="$3"
   local remote_base
-  local remote_path
-  local output
-  local rc
 
   remote_base="$(remote_base_path)"
   if [[ "$folder_name" == "RACHEL" && -n "${RACHEL_SUBFOLDER:-}" ]]; then
-    remote_path="$(join_path "$remote_base" "$folder_name/${RACHEL_SUBFOLDER}/$(basename "$file_path")")"
+    _upload_destination="$(join_path "$remote_base" "$folder_name/${RACHEL_SUBFOLDER}/$(basename "$file_path")")"
   else
-    remote_path="$(join_path "$remote_base" "$folder_name/$(basename "$file_path")")"
+    _upload_destination="$(join_path "$remote_base" "$folder_name/$(basename "$file_path")")"
   fi
+  log "[upload] $(basename "$file_path") -> $_upload_destination"
+}
 
-  log "[upload] $(basename "$file_path") -> $remote_path"
-  output="$(aws_cp_region "$file_path" "$remote_path" 2>&1)"
-  rc=$?
-
-  if (( rc == 0 )); then
-    log "[done] Uploaded: $(basename "$file_path")"
+# Log one upload's outcome (or why it was skipped); returns 1 when it failed
+log_upload_result() {
+  local file_path="$1"
+  local status="$2"
+  local detail="${3:-}"
+
+  if [[ "$status" == "ok" ]]; then
+    case "$detail" in
+      "$UPLOAD_UNCHANGED") log "[skip] Unchanged since its last upload: $(basename "$file_path")" ;;
+      "$UPLOAD_SUPERSEDED") log "[skip] Superseded by a newer queued copy: $(basename "$file_path")" ;;
+      *) log "[done] Uploaded: $(basename "$file_path")" ;;
+    esac
     return 0
   fi
-
-  log "[error] Upload failed for $(basename "$file_path"): $output"
+  log "[error] Upload failed for $(basename "$file_path"): $detail"
   return 1
 }
 
+upload_one() {
+  local file_path="$1"
+  local folder_name="${2:-RACHEL}"
+  local remote_path
+  local output
+
+  upload_destination "$file_path" "$folder_name" remote_path
+  if output="$(aws_cp_region "$file_path" "$remote_path" 2>&1)"; then
+    log_upload_result "$file_path" "ok" "${output##*$'\n'}"
+  else
+    log_upload_result "$file_path" "failed" "$output"
+  fi
+}
+
+# Upload the files listed one per line in jobs_file to folder_name in one batch;
+# results_file gets "ok|failed<TAB>file" per file. Returns 1 if any failed.
+upload_folder_batch() {
+  local jobs_file="$1"
+  local results_file="$2"
+  local folder_name="${3:-RACHEL}"
+  local file_path destination status detail batch_jobs batch_results
+  local rc=0
+
+  batch_jobs="$(mktemp)"
+  batch_results="$(mktemp)"
+  while IFS= read -r file_path; do
+    [[ -n "$file_path" ]] || continue
+    upload_destination "$file_path" "$folder_name" destination
+    printf '%s\t%s\n' "$file_path" "$destination" >> "$batch_jobs"
+  done < "$jobs_file"
+
+  upload_batch "$batch_jobs" "$batch_results" || rc=1
+  : > "$results_file"
+  while IFS=$'\t' read -r status file_path destination _ detail; do
+    log_upload_result "$file_path" "$status" "$detail" || true
+    printf '%s\t%s\n' "$status" "$file_path" >> "$results_file"
+  done < "$batch_results"
+
+  rm -f "$batch_jobs" "$batch_results"
+  return "$rc"
+}
+
 queue_dir_for_folder() {
   local queue_root="${1:?queue root required}"
   local folder_name="${2:-RACHEL}"
@@ -110,55 +138,55 @@ queue_one() {
   log "[queue] Queued $(basename "$file_path") for $folder_name uploads."
 }
 
-flush_queue_dir() {
-  local queue_dir="$1"
+# After a queued file's upload: on success drop it with its .cdnrun sidecar and the processed run folder it came from
+finish_queued_file() {
+  local queued_file="$1"
   local folder_name="${2:-RACHEL}"
-  local failed=0
-  local files=()
-
-  shopt -s nullglob
-  files=("$queue_dir"/*.csv)
-  shopt -u nullglob
+  local status="$3"
+  local detail="${4:-}"
 
-  if (( ${#files[@]} == 0 )); then
+  if log_upload_result "$queued_file" "$status" "$detail"; then
+    if [[ -n "${CDN_AUTO_PROCESSED_ROOT:-}" && ("$folder_name" == "RACHEL" || "$folder_name" == "ModuleGaze") ]]; then
+      cleanup_processed_for_uploaded_csv "$CDN_AUTO_PROCESSED_ROOT" "$queued_file"
+    fi
+    rm -f "$queued_file"
+    remove_queue_run_sidecar "$queued_file"
     return 0
   fi
 
-  for queued_file in "${files[@]}"; do
-    if upload_one "$queued_file" "$folder_name"; then
-      if [[ -n "${CDN_AUTO_PROCESSED_ROOT:-}" && ("$folder_name" == "RACHEL" || "$folder_name" == "ModuleGaze") ]]; then
-        cleanup_processed_for_uploaded_csv "$CDN_AUTO_PROCESSED_ROOT" "$queued_file"
-      fi
-      rm -f "$queued_file"
-      remove_queue_run_sidecar "$queued_file"
-    else
-      log "Leaving queued: $(basename "$queued_file")"
-      failed=1
-    fi
-  done
+  log "Leaving queued: $(basename "$queued_file")"
+  return 1
+}
+
+flush_queue_dir() {
+  local queue_dir="$1"
+  local folder_name="${2:-RACHEL}"
+  local jobs=()
 
-  return "$failed"
+  queue_flush_jobs "$queue_dir" "$folder_name" jobs
+  run_flush_jobs "${jobs[@]}"
 }
 
 flush_all_queues() {
   local queue_root="${1:?queue root required}"
-  local failed=0
   local helpers_dir
+  local jobs=()
 
   prepare_queue_dirs "$queue_root"
 
   # Backward compatibility for old queue files that were stored at the queue root.
-  flush_queue_dir "$queue_root" "RACHEL" || failed=1
-  flush_queue_dir "$queue_root/RACHEL" "RACHEL" || failed=1
-  flush_queue_dir "$queue_root/Kolibri" "Kolibri" || failed=1
-  flush_queue_dir "$queue_root/ModuleGaze" "ModuleGaze" || failed=1
+  queue_flush_jobs "$queue_root" "RACHEL" jobs
+  queue_flush_jobs "$queue_root/RACHEL" "RACHEL" jobs
+  queue_flush_jobs "$queue_root/Kolibri" "Kolibri" jobs
+  queue_flush_jobs "$queue_root/ModuleGaze" "ModuleGaze" jobs
 
   helpers_dir="$(CDPATH= cd -- "$(dirname -- "${BASH_SOURCE[0]}")" >/dev/null 2>&1 && pwd)"
   if [[ -f "$helpers_dir/oc4d_assessment_helpers.sh" ]]; then
     # shellcheck disable=SC1091
     source "$helpers_dir/oc4d_assessment_helpers.sh"
-    flush_oc4d_queue "$queue_root" || failed=1
+    queue_flush_jobs "$(oc4d_queue_dir "$queue_root")" "OC4DAssessments" jobs
   fi
 
-  return "$failed"
+  # One concurrency limit across every queue folder
+  run_flush_jobs "${jobs[@]}"
 }
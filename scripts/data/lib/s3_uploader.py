@@ -0,0 +1,581 @@
+#!/usr/bin/env python3
+"""
+In-process S3 uploader used by the shell upload helpers (upload_helpers.sh).
+
+Reads one job per stdin line, "<file><TAB>s3://bucket/key[<TAB>region]", signs
+each PUT with AWS Signature V4 and sends it over a pooled keep-alive connection
+per endpoint, so a batch of uploads costs one Python start and one TLS handshake
+per region instead of one aws CLI process per file. One result line per job is
+printed as it finishes:
+
+    ok|failed<TAB>file<TAB>destination<TAB>region<TAB>detail
+
+Content-Type is guessed from the key; .gz keys are stored as application/gzip
+with no Content-Encoding, so downloads keep their compressed bytes. region is
+the one the upload used; it differs from the job's when S3 redirected the
+request to the bucket's real region. Exit status is 0 when every job uploaded,
+1 when any failed and 3 when no static credentials are available (the shell
+then falls back to the aws CLI, which also covers SSO and instance roles).
+
+Files of at least CDN_AUTO_MULTIPART_THRESHOLD bytes (default 16 MiB) go up as
+multipart uploads of CDN_AUTO_MULTIPART_PART_SIZE parts (default 8 MiB). Each
+acknowledged part is recorded in 00_DATA/00_CACHE/multipart-uploads.json
+(CDN_AUTO_MULTIPART_STATE_FILE), so when the link drops partway the next run
+re-hashes the parts already sent and continues with the first missing one.
+
+Credentials come from AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY /
+AWS_SESSION_TOKEN, else the AWS_PROFILE (default "default") profile in
+~/.aws/credentials or ~/.aws/config. CDN_AUTO_S3_ENDPOINT_URL (or --endpoint-url)
+points uploads at an S3-compatible endpoint with path-style addressing.
+"""
+
+import argparse
+import configparser
+import hashlib
+import hmac
+import http.client
+import json
+import mimetypes
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from urllib.parse import quote, urlsplit
+
+DEFAULT_REGION = "us-east-1"
+EXIT_NO_CREDENTIALS = 3
+CHUNK_SIZE = 1024 * 1024
+TIMEOUT_SECONDS = 60
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+DEFAULT_MULTIPART_STATE_FILE = os.path.join(PROJECT_ROOT, "00_DATA", "00_CACHE", "multipart-uploads.json")
+# Files of at least this size go up in parts that a later run can resume
+DEFAULT_MULTIPART_THRESHOLD = 16 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+# S3 rejects smaller parts (except the last)
+MIN_PART_SIZE = 5 * 1024 * 1024
+# Unfinished uploads older than this are started again rather than resumed
+MULTIPART_MAX_AGE_SECONDS = 7 * 24 * 3600
+
+
+@dataclass
+class Credentials:
+    access_key: str
+    secret_key: str
+    session_token: str | None = None
+
+
+@dataclass
+class Result:
+    ok: bool
+    file_path: str
+    destination: str
+    region: str
+    detail: str = ""
+
+    def line(self):
+        detail = " ".join(self.detail.split())
+        status = "ok" if self.ok else "failed"
+        return "\t".join((status, self.file_path, self.destination, self.region, detail))
+
+
+class UploadError(Exception):
+    def __init__(self, message, region=None, code=""):
+        super().__init__(message)
+        self.region = region
+        self.code = code
+
+
+@dataclass
+class FileSlice:
+    """length bytes of a file from offset: a whole object or one multipart part."""
+
+    path: str
+    offset: int
+    length: int
+
+    def chunks(self):
+        with open(self.path, "rb") as handle:
+            handle.seek(self.offset)
+            remaining = self.length
+            while remaining > 0:
+                chunk = handle.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise OSError(f"{self.path} shrank while it was being uploaded")
+                remaining -= len(chunk)
+                yield chunk
+
+    def sha256(self):
+        digest = hashlib.sha256()
+        for chunk in self.chunks():
+            digest.update(chunk)
+        return digest.hexdigest()
+
+
+class MultipartState:
+    """Destination -> unfinished multipart upload (id, region, sizes, acknowledged parts), kept in a
+    JSON file so a later run can resume it. Every change is written atomically."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as handle:
+                data = json.load(handle)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _save(self, data):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        partial = f"{self.path}.{os.getpid()}.tmp"
+        with open(partial, "w", encoding="utf-8") as handle:
+            json.dump(data, handle, indent=2, sort_keys=True)
+        os.replace(partial, self.path)
+
+    def get(self, destination):
+        with self._lock:
+            return self._load().get(destination)
+
+    def put(self, destination, entry):
+        with self._lock:
+            data = self._load()
+            data[destination] = entry
+            self._save(data)
+
+    def remove(self, destination):
+        with self._lock:
+            data = self._load()
+            if data.pop(destination, None) is not None:
+                self._save(data)
+
+
+def _profile_section(parser, name, config_file):
+    if config_file and name != "default":
+        name = f"profile {name}"
+    return parser[name] if parser.has_section(name) else None
+
+
+def load_credentials(environ=None):
+    """Static credentials from the environment or the shared AWS files; None when there are none."""
+    environ = os.environ if environ is None else environ
+    access_key = environ.get("AWS_ACCESS_KEY_ID", "")
+    secret_key = environ.get("AWS_SECRET_ACCESS_KEY", "")
+    if access_key and secret_key:
+        return Credentials(access_key, secret_key, environ.get("AWS_SESSION_TOKEN") or None)
+
+    home = environ.get("HOME") or os.path.expanduser("~")
+    profile = environ.get("AWS_PROFILE") or environ.get("AWS_DEFAULT_PROFILE") or "default"
+    sources = (
+        (environ.get("AWS_SHARED_CREDENTIALS_FILE") or os.path.join(home, ".aws", "credentials"), False),
+        (environ.get("AWS_CONFIG_FILE") or os.path.join(home, ".aws", "config"), True),
+    )
+    for path, config_file in sources:
+        parser = configparser.RawConfigParser()
+        try:
+            if not parser.read(path, encoding="utf-8"):
+                continue
+        except (configparser.Error, OSError):
+            continue
+        section = _profile_section(parser, profile, config_file)
+        if section is None:
+            continue
+        access_key = section.get("aws_access_key_id", "").strip()
+        secret_key = section.get("aws_secret_access_key", "").strip()
+        if access_key and secret_key:
+            return Credentials(access_key, secret_key, section.get("aws_session_token", "").strip() or None)
+    return None
+
+
+def split_destination(destination):
+    """("bucket", "key") for s3://bucket/key."""
+    match = re.fullmatch(r"s3://([^/]+)/(.+)", destination)
+    if not match:
+        raise ValueError(f"not an s3://bucket/key destination: {destination}")
+    return match.group(1), match.group(2)
+
+
+def content_headers(key):
+    """Content-Type guessed from the key. A .gz key is the gzip file itself, so it is
+    application/gzip; Content-Encoding: gzip would make HTTP clients unpack it on download."""
+    content_type, encoding = mimetypes.guess_type(key)
+    if encoding == "gzip":
+        return {"Content-Type": "application/gzip"}
+    if content_type:
+        return {"Content-Type": content_type}
+    return {}
+
+
+def _hmac(key, message):
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def canonical_query(query):
+    """Sorted, URI-encoded query string; the same string is signed and sent."""
+    return "&".join(
+        f"{quote(name, safe='-_.~')}={quote(value, safe='-_.~')}" for name, value in sorted((query or {}).items())
+    )
+
+
+def sign_request(credentials, method, host, path, region, headers, payload_hash, query=None, now=None):
+    """Add the SigV4 x-amz-date, x-amz-content-sha256, x-amz-security-token and Authorization headers."""
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    day = amz_date[:8]
+
+    signed = {name.lower(): str(value).strip() for name, value in headers.items()}
+    signed["host"] = host
+    signed["x-amz-date"] = amz_date
+    signed["x-amz-content-sha256"] = payload_hash
+    if credentials.session_token:
+        signed["x-amz-security-token"] = credentials.session_token
+
+    names = sorted(signed)
+    canonical_request = "\n".join(
+        (
+            method,
+            path,
+            canonical_query(query),
+            "".join(f"{name}:{signed[name]}\n" for name in names),
+            ";".join(names),
+            payload_hash,
+        )
+    )
+    scope = f"{day}/{region}/s3/aws4_request"
+    string_to_sign = "\n".join(
+        ("AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest())
+    )
+    key = _hmac(("AWS4" + credentials.secret_key).encode("utf-8"), day)
+    for part in (region, "s3", "aws4_request"):
+        key = _hmac(key, part)
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    signed["authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={credentials.access_key}/{scope}, "
+        f"SignedHeaders={';'.join(names)}, Signature={signature}"
+    )
+    return signed
+
+
+def _xml_value(body, tag):
+    match = re.search(rf"<{tag}>([^<]*)</{tag}>", body)
+    return match.group(1) if match else ""
+
+
+class S3Uploader:
+    """Signs and sends S3 object requests, reusing idle keep-alive connections per endpoint."""
+
+    def __init__(
+        self,
+        credentials,
+        endpoint_url=None,
+        multipart_state=None,
+        multipart_threshold=DEFAULT_MULTIPART_THRESHOLD,
+        part_size=DEFAULT_PART_SIZE,
+        progress=None,
+    ):
+        self.credentials = credentials
+        self.endpoint = urlsplit(endpoint_url) if endpoint_url else None
+        self.multipart_state = multipart_state or MultipartState(DEFAULT_MULTIPART_STATE_FILE)
+        self.multipart_threshold = multipart_threshold
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.progress = progress or (lambda message: None)
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _address(self, bucket, key, region):
+        """(scheme, host, request path) for an object."""
+        object_path = quote(key, safe="/~")
+        if self.endpoint:
+            base = self.endpoint.path.rstrip("/")
+            return self.endpoint.scheme or "https", self.endpoint.netloc, f"{base}/{bucket}/{object_path}"
+        if "." in bucket:
+            # Dotted bucket names break the wildcard certificate; use path-style
+            return "https", f"s3.{region}.amazonaws.com", f"/{bucket}/{object_path}"
+        return "https", f"{bucket}.s3.{region}.amazonaws.com", f"/{object_path}"
+
+    def _connection(self, scheme, host, reuse=True):
+        if reuse:
+            with self._lock:
+                idle = self._idle.get((scheme, host))
+                if idle:
+                    return idle.pop(), True
+        connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return connection_class(host, timeout=TIMEOUT_SECONDS), False
+
+    def _release(self, scheme, host, connection):
+        with self._lock:
+            self._idle.setdefault((scheme, host), []).append(connection)
+
+    def close(self):
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+
+    def _send(self, connection, method, target, headers, body):
+        connection.putrequest(method, target, skip_host=True, skip_accept_encoding=True)
+        for name, value in headers.items():
+            connection.putheader(name, value)
+        connection.endheaders()
+        if isinstance(body, FileSlice):
+            for chunk in body.chunks():
+                connection.send(chunk)
+        elif body:
+            connection.send(body)
+        response = connection.getresponse()
+        return response, response.read()
+
+    def request(self, method, bucket, key, region, query=None, body=None, headers=None, payload_hash=None):
+        """Send one signed request; (status, response headers, body text). body is bytes or a FileSlice.
+        A request on a dropped idle connection is retried once."""
+        scheme, host, path = self._address(bucket, key, region)
+        headers = dict(headers or {})
+        if isinstance(body, FileSlice):
+            headers["Content-Length"] = str(body.length)
+            payload_hash = payload_hash or body.sha256()
+        else:
+            body = body or b""
+            headers["Content-Length"] = str(len(body))
+            payload_hash = payload_hash or hashlib.sha256(body).hexdigest()
+        signed = sign_request(self.credentials, method, host, path, region, headers, payload_hash, query)
+        target = f"{path}?{canonical_query(query)}" if query else path
+
+        for attempt in range(2):
+            # The retry always gets a fresh connection; other idle ones may have been dropped too
+            connection, reused = self._connection(scheme, host, reuse=attempt == 0)
+            try:
+                response, response_body = self._send(connection, method, target, signed, body)
+            except (http.client.HTTPException, OSError):
+                connection.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            if response.will_close:
+                connection.close()
+            else:
+                self._release(scheme, host, connection)
+            return response.status, response.headers, response_body.decode("utf-8", "replace")
+        raise UploadError("connection closed")
+
+    def call(self, method, bucket, key, region, **kwargs):
+        """request() that raises UploadError for S3 errors; (response headers, body, region).
+        A wrong-region answer is retried once in the region S3 names."""
+        for attempt in range(2):
+            status, headers, body = self.request(method, bucket, key, region, **kwargs)
+            # CompleteMultipartUpload can answer 200 with an error document
+            if 200 <= status < 300 and "<Error>" not in body:
+                return headers, body, region
+            code = _xml_value(body, "Code") or f"HTTP {status}"
+            message = _xml_value(body, "Message")
+            actual = headers.get("x-amz-bucket-region") or _xml_value(body, "Region")
+            if attempt == 0 and actual and actual != region:
+                region = actual
+                continue
+            raise UploadError(f"{code}: {message}".rstrip(": "), region, code)
+        raise UploadError("region redirect loop", region)
+
+    def put_file(self, file_path, bucket, key, region):
+        """Upload one file; returns the region that accepted it."""
+        size = os.path.getsize(file_path)
+        if size >= self.multipart_threshold:
+            return self.put_multipart(file_path, bucket, key, region, size)
+        _, _, region = self.call(
+            "PUT", bucket, key, region, body=FileSlice(file_path, 0, size), headers=content_headers(key)
+        )
+        return region
+
+    def _abort(self, bucket, key, entry):
+        """Best-effort AbortMultipartUpload so S3 drops the parts of an upload that will not be resumed."""
+        try:
+            self.call("DELETE", bucket, key, entry["region"], query={"uploadId": entry["upload_id"]})
+        except (UploadError, OSError, http.client.HTTPException):
+            pass
+
+    def _resumable_entry(self, destination, bucket, key, size):
+        """The recorded upload for destination if it can be continued; stale ones are aborted and dropped."""
+        entry = self.multipart_state.get(destination)
+        if not entry:
+            return None
+        usable = (
+            entry.get("size") == size
+            and entry.get("part_size") == self.part_size
+            and entry.get("upload_id")
+            and time.time() - entry.get("started", 0) < MULTIPART_MAX_AGE_SECONDS
+        )
+        if usable:
+            return entry
+        self._abort(bucket, key, entry)
+        self.multipart_state.remove(destination)
+        return None
+
+    def put_multipart(self, file_path, bucket, key, region, size, restart=True):
+        """Multipart upload that records each acknowledged part and resumes from the state file."""
+        destination = f"s3://{bucket}/{key}"
+        part_count = -(-size // self.part_size)
+        entry = self._resumable_entry(destination, bucket, key, size)
+        if entry is None:
+            _, body, region = self.call("POST", bucket, key, region, query={"uploads": ""}, headers=content_headers(key))
+            upload_id = _xml_value(body, "UploadId")
+            if not upload_id:
+                raise UploadError("CreateMultipartUpload returned no UploadId", region)
+            entry = {
+                "upload_id": upload_id,
+                "region": region,
+                "size": size,
+                "part_size": self.part_size,
+                "started": int(time.time()),
+                "parts": {},
+            }
+            self.multipart_state.put(destination, entry)
+        else:
+            region = entry["region"]
+            self.progress(f"Resuming {destination}: {len(entry['parts'])} of {part_count} parts already sent.")
+
+        parts = entry["parts"]
+        try:
+            for number in range(1, part_count + 1):
+                offset = (number - 1) * self.part_size
+                piece = FileSlice(file_path, offset, min(self.part_size, size - offset))
+                digest = piece.sha256()
+                done = parts.get(str(number))
+                # A recorded part is skipped only while the file still holds the same bytes there
+                if done and done.get("sha256") == digest:
+                    continue
+                headers, _, region = self.call(
+                    "PUT",
+                    bucket,
+                    key,
+                    region,
+                    query={"partNumber": str(number), "uploadId": entry["upload_id"]},
+                    body=piece,
+                    payload_hash=digest,
+                )
+                parts[str(number)] = {"sha256": digest, "etag": headers.get("ETag", "")}
+                self.multipart_state.put(destination, entry)
+
+            manifest = "".join(
+                f"<Part><PartNumber>{number}</PartNumber><ETag>{parts[str(number)]['etag']}</ETag></Part>"
+                for number in range(1, part_count + 1)
+            )
+            self.call(
+                "POST",
+                bucket,
+                key,
+                region,
+                query={"uploadId": entry["upload_id"]},
+                body=f"<CompleteMultipartUpload>{manifest}</CompleteMultipartUpload>".encode("utf-8"),
+            )
+        except UploadError as exc:
+            if exc.code == "NoSuchUpload" and restart:
+                # Aborted or expired on the S3 side; start over once
+                self.multipart_state.remove(destination)
+                return self.put_multipart(file_path, bucket, key, region, size, restart=False)
+            raise UploadError(f"{exc} ({len(parts)} of {part_count} parts sent; the next run resumes)", exc.region, exc.code)
+        except (OSError, http.client.HTTPException) as exc:
+            raise UploadError(
+                f"{exc.__class__.__name__}: {exc} ({len(parts)} of {part_count} parts sent; the next run resumes)", region
+            )
+        self.multipart_state.remove(destination)
+        return region
+
+    def upload(self, file_path, destination, region):
+        try:
+            bucket, key = split_destination(destination)
+            region = self.put_file(file_path, bucket, key, region)
+        except UploadError as exc:
+            return Result(False, file_path, destination, exc.region or region, str(exc))
+        except (ValueError, OSError, http.client.HTTPException) as exc:
+            return Result(False, file_path, destination, region, f"{exc.__class__.__name__}: {exc}")
+        return Result(True, file_path, destination, region)
+
+
+def read_jobs(lines, default_region):
+    """(file, destination, region) per non-empty "<file><TAB>destination[<TAB>region]" line."""
+    jobs = []
+    for line in lines:
+        fields = line.rstrip("\r\n").split("\t")
+        if not fields[0]:
+            continue
+        region = fields[2] if len(fields) > 2 and fields[2] else default_region
+        jobs.append((fields[0], fields[1] if len(fields) > 1 else "", region))
+    return jobs
+
+
+def upload_batch(uploader, jobs, concurrency=1, report=None):
+    """Upload every job with at most `concurrency` in flight; report(result) is called as each one finishes."""
+    report_lock = threading.Lock()
+    results = []
+
+    def run(job):
+        result = uploader.upload(*job)
+        with report_lock:
+            results.append(result)
+            if report:
+                report(result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        list(pool.map(run, jobs))
+    return results
+
+
+def _env_bytes(name, default):
+    value = os.environ.get(name, "")
+    return int(value) if value.isdigit() and int(value) > 0 else default
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Upload <file><TAB>s3://bucket/key lines from stdin to S3.")
+    parser.add_argument("--region", default=os.environ.get("AWS_DEFAULT_REGION") or DEFAULT_REGION)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--endpoint-url", default=os.environ.get("CDN_AUTO_S3_ENDPOINT_URL", ""))
+    parser.add_argument(
+        "--state-file", default=os.environ.get("CDN_AUTO_MULTIPART_STATE_FILE") or DEFAULT_MULTIPART_STATE_FILE
+    )
+    parser.add_argument(
+        "--multipart-threshold",
+        type=int,
+        default=_env_bytes("CDN_AUTO_MULTIPART_THRESHOLD", DEFAULT_MULTIPART_THRESHOLD),
+    )
+    parser.add_argument(
+        "--part-size", type=int, default=_env_bytes("CDN_AUTO_MULTIPART_PART_SIZE", DEFAULT_PART_SIZE)
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    credentials = load_credentials()
+    if credentials is None:
+        return EXIT_NO_CREDENTIALS
+
+    jobs = read_jobs(sys.stdin, args.region)
+    uploader = S3Uploader(
+        credentials,
+        args.endpoint_url or None,
+        MultipartState(args.state_file),
+        args.multipart_threshold,
+        args.part_size,
+        progress=lambda message: print(message, file=sys.stderr, flush=True),
+    )
+
+    def report(result):
+        print(result.line(), flush=True)
+
+    try:
+        results = upload_batch(uploader, jobs, args.concurrency, report)
+    finally:
+        uploader.close()
+    return 0 if all(result.ok for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
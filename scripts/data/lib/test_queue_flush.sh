@@ -0,0 +1,200 @@
+#!/bin/bash
+# Queue flush against a local S3 stand-in: a fake `aws` on PATH that copies uploads into a folder.
+set -euo pipefail
+
+ROOT="$(CDPATH= cd -- "$(dirname -- "$0")/../../.." >/dev/null 2>&1 && pwd)"
+cd "$ROOT"
+
+ts() { date '+%H:%M:%S'; }
+log() { echo "[$(ts)] $*"; }
+
+source scripts/data/lib/s3_helpers.sh
+source scripts/data/lib/oc4d_assessment_helpers.sh
+
+pass=0
+fail=0
+
+assert_eq() {
+  local got="$1"
+  local want="$2"
+  local label="$3"
+  if [[ "$got" != "$want" ]]; then
+    log "FAIL: $label expected '$want' got '$got'"
+    fail=$((fail + 1))
+    return 0
+  fi
+  log "PASS: $label"
+  pass=$((pass + 1))
+}
+
+assert_file() {
+  local path="$1"
+  local label="$2"
+  if [[ -f "$path" ]]; then
+    log "PASS: $label"
+    pass=$((pass + 1))
+  else
+    log "FAIL: $label missing at $path"
+    fail=$((fail + 1))
+  fi
+}
+
+assert_no_file() {
+  local path="$1"
+  local label="$2"
+  if [[ -e "$path" ]]; then
+    log "FAIL: $label still exists at $path"
+    fail=$((fail + 1))
+  else
+    log "PASS: $label"
+    pass=$((pass + 1))
+  fi
+}
+
+TEST_ROOT="$(mktemp -d)"
+trap 'rm -rf "$TEST_ROOT"' EXIT
+STANDIN="$TEST_ROOT/s3"
+mkdir -p "$TEST_ROOT/bin" "$STANDIN/active"
+
+# s3 cp SRC s3://bucket/key copies into $STANDIN/bucket/key after a short delay;
+# keys matching FAKE_AWS_FAIL fail. Each call notes how many copies were in flight.
+cat > "$TEST_ROOT/bin/aws" <<'AWS'
+#!/bin/bash
+echo "$*" >> "$STANDIN/calls"
+if [[ "$*" == *get-bucket-location* ]]; then
+  echo "eu-west-1"
+  exit 0
+fi
+args=("$@")
+for ((i = 0; i < ${#args[@]}; i++)); do
+  if [[ "${args[$i]}" == "cp" ]]; then
+    src="${args[$((i + 1))]}"
+    dest="${args[$((i + 2))]}"
+  fi
+done
+mkdir "$STANDIN/active/$$"
+ls "$STANDIN/active" | wc -l >> "$STANDIN/in_flight"
+sleep "${FAKE_AWS_DELAY:-0.2}"
+rmdir "$STANDIN/active/$$"
+if [[ -n "${FAKE_AWS_FAIL:-}" && "$dest" == *"$FAKE_AWS_FAIL"* ]]; then
+  echo "upload failed: $src to $dest An error occurred (AccessDenied)" >&2
+  exit 1
+fi
+target="$STANDIN/${dest#s3://}"
+mkdir -p "$(dirname "$target")"
+cp "$src" "$target"
+AWS
+chmod +x "$TEST_ROOT/bin/aws"
+export PATH="$TEST_ROOT/bin:$PATH" STANDIN
+export CDN_AUTO_BUCKET_REGION_FILE="$TEST_ROOT/bucket-regions.tsv"
+export CDN_AUTO_UPLOAD_LEDGER_FILE="$TEST_ROOT/upload-ledger.tsv"
+# These checks drive the aws CLI path; test_s3_uploader.sh covers the in-process uploader
+export CDN_AUTO_S3_UPLOADER=0
+
+S3_BUCKET="s3://cdn-bucket"
+S3_SUBFOLDER="site"
+RACHEL_SUBFOLDER=""
+OC4D_BUCKET="oc4d-bucket"
+PROCESSED_ROOT="$TEST_ROOT/00_PROCESSED"
+export CDN_AUTO_PROCESSED_ROOT="$PROCESSED_ROOT"
+
+make_queue() {
+  QUEUE_DIR="$TEST_ROOT/queue"
+  rm -rf "$QUEUE_DIR" "$PROCESSED_ROOT" "$STANDIN/cdn-bucket" "$STANDIN/oc4d-bucket"
+  rm -f "$STANDIN/in_flight" "$STANDIN/calls" "$CDN_AUTO_BUCKET_REGION_FILE" "$CDN_AUTO_UPLOAD_LEDGER_FILE"
+  prepare_queue_dirs "$QUEUE_DIR"
+  local day
+  for day in 01 02 03 04 05 06; do
+    mkdir -p "$PROCESSED_ROOT/lab_logs_2025_06_$day"
+    echo "rachel $day" > "$PROCESSED_ROOT/lab_logs_2025_06_$day/lab_${day}_06_2025_access_logs.csv"
+    queue_one "$PROCESSED_ROOT/lab_logs_2025_06_$day/lab_${day}_06_2025_access_logs.csv" "$QUEUE_DIR" "RACHEL" "lab_logs_2025_06_$day" >/dev/null
+  done
+  mkdir -p "$PROCESSED_ROOT/lab_modulegaze_logs_2025_06_01"
+  echo "mg" > "$PROCESSED_ROOT/lab_modulegaze_logs_2025_06_01/lab_01_06_2025_modulegaze_logs.csv"
+  queue_one "$PROCESSED_ROOT/lab_modulegaze_logs_2025_06_01/lab_01_06_2025_modulegaze_logs.csv" "$QUEUE_DIR" "ModuleGaze" "lab_modulegaze_logs_2025_06_01" >/dev/null
+  echo "kolibri" > "$TEST_ROOT/lab_06_2025_kolibri_summary.csv"
+  queue_one "$TEST_ROOT/lab_06_2025_kolibri_summary.csv" "$QUEUE_DIR" "Kolibri" >/dev/null
+  echo "legacy" > "$QUEUE_DIR/legacy_access_logs.csv"
+  echo "result" > "$TEST_ROOT/result.csv"
+  queue_oc4d_one "$TEST_ROOT/result.csv" "$QUEUE_DIR" "Org/Assessments/s1/a1/result__2025-06-01T00-00-00Z.csv" >/dev/null
+}
+
+max_in_flight() {
+  sort -n "$STANDIN/in_flight" | tail -n1
+}
+
+log "=== Flush 1: every queue folder through one concurrency limit ==="
+make_queue
+rc=0
+UPLOAD_CONCURRENCY=3 flush_all_queues "$QUEUE_DIR" >/dev/null || rc=$?
+assert_eq "$rc" "0" "flush succeeds"
+assert_file "$STANDIN/cdn-bucket/site/RACHEL/lab_03_06_2025_access_logs.csv" "RACHEL upload"
+assert_file "$STANDIN/cdn-bucket/site/RACHEL/legacy_access_logs.csv" "legacy root queue upload"
+assert_file "$STANDIN/cdn-bucket/site/ModuleGaze/lab_01_06_2025_modulegaze_logs.csv" "ModuleGaze upload"
+assert_file "$STANDIN/cdn-bucket/site/Kolibri/lab_06_2025_kolibri_summary.csv" "Kolibri upload"
+assert_file "$STANDIN/oc4d-bucket/Org/Assessments/s1/a1/result__2025-06-01T00-00-00Z.csv" "OC4D upload to sidecar key"
+assert_eq "$(find "$QUEUE_DIR" -type f | wc -l | tr -d ' ')" "0" "queue emptied with sidecars"
+assert_eq "$(find "$PROCESSED_ROOT" -mindepth 1 -maxdepth 1 | wc -l | tr -d ' ')" "0" "processed run folders cleaned"
+assert_eq "$(wc -l < "$STANDIN/in_flight" | tr -d ' ')" "10" "one copy per queued file"
+assert_eq "$(max_in_flight)" "3" "at most UPLOAD_CONCURRENCY copies in flight"
+assert_eq "$(grep -c get-bucket-location "$STANDIN/calls")" "2" "one region lookup per bucket"
+
+log "=== Flush 2: a failed upload stays queued with its sidecar ==="
+make_queue
+rc=0
+UPLOAD_CONCURRENCY=4 FAKE_AWS_FAIL="lab_02_06_2025" flush_all_queues "$QUEUE_DIR" >/dev/null || rc=$?
+assert_eq "$rc" "1" "flush reports the failure"
+assert_file "$QUEUE_DIR/RACHEL/lab_02_06_2025_access_logs.csv" "failed file kept"
+assert_file "$QUEUE_DIR/RACHEL/lab_02_06_2025_access_logs.csv.cdnrun" "failed file sidecar kept"
+assert_file "$PROCESSED_ROOT/lab_logs_2025_06_02/lab_02_06_2025_access_logs.csv" "failed file processed folder kept"
+assert_no_file "$QUEUE_DIR/RACHEL/lab_01_06_2025_access_logs.csv.cdnrun" "uploaded file sidecar removed"
+assert_no_file "$PROCESSED_ROOT/lab_logs_2025_06_01" "uploaded file processed folder removed"
+assert_eq "$(find "$QUEUE_DIR" -name '*.csv' | wc -l | tr -d ' ')" "1" "only the failed file left"
+
+log "=== Flush 3: UPLOAD_CONCURRENCY=1 uploads one at a time ==="
+make_queue
+rc=0
+UPLOAD_CONCURRENCY=1 FAKE_AWS_DELAY=0.05 flush_all_queues "$QUEUE_DIR" >/dev/null || rc=$?
+assert_eq "$rc" "0" "sequential flush succeeds"
+assert_eq "$(max_in_flight)" "1" "one copy in flight"
+
+log "=== Flush 4: OC4D queue without a sidecar stays queued ==="
+make_queue
+rm -f "$QUEUE_DIR/OC4DAssessments/result.csv.oc4dkey"
+rc=0
+flush_oc4d_queue "$QUEUE_DIR" >/dev/null || rc=$?
+assert_eq "$rc" "1" "missing sidecar reported"
+assert_file "$QUEUE_DIR/OC4DAssessments/result.csv" "file without sidecar kept"
+
+log "=== Flush 5: empty queue ==="
+QUEUE_DIR="$TEST_ROOT/empty_queue"
+rc=0
+flush_all_queues "$QUEUE_DIR" >/dev/null || rc=$?
+assert_eq "$rc" "0" "empty queue is a no-op"
+
+log "=== Flush 6: unchanged files are skipped and duplicates collapse to the newest ==="
+make_queue
+flush_all_queues "$QUEUE_DIR" >/dev/null || true
+rm -f "$STANDIN/in_flight"
+queue_one "$TEST_ROOT/lab_06_2025_kolibri_summary.csv" "$QUEUE_DIR" "Kolibri" >/dev/null
+queue_oc4d_one "$TEST_ROOT/result.csv" "$QUEUE_DIR" "Org/Assessments/s1/a1/result__2025-06-01T00-00-00Z.csv" >/dev/null
+echo "rachel 03 retried" > "$TEST_ROOT/lab_03_06_2025_access_logs.csv"
+queue_one "$TEST_ROOT/lab_03_06_2025_access_logs.csv" "$QUEUE_DIR" "RACHEL" >/dev/null
+echo "old copy" > "$QUEUE_DIR/dup_access_logs.csv"
+touch -d '2025-06-01 00:00' "$QUEUE_DIR/dup_access_logs.csv"
+echo "new copy" > "$QUEUE_DIR/RACHEL/dup_access_logs.csv"
+rc=0
+flush_all_queues "$QUEUE_DIR" > "$TEST_ROOT/flush.log" || rc=$?
+assert_eq "$rc" "0" "flush succeeds"
+assert_eq "$(wc -l < "$STANDIN/in_flight" | tr -d ' ')" "2" "only the changed file and the newest duplicate sent"
+assert_eq "$(grep -c 'Unchanged since its last upload' "$TEST_ROOT/flush.log")" "2" "unchanged Kolibri and OC4D files reported"
+assert_eq "$(grep -c 'Superseded by a newer queued copy: dup_access_logs.csv' "$TEST_ROOT/flush.log")" "1" "older duplicate reported"
+assert_eq "$(cat "$STANDIN/cdn-bucket/site/RACHEL/lab_03_06_2025_access_logs.csv")" "rachel 03 retried" "changed content re-sent"
+assert_eq "$(cat "$STANDIN/cdn-bucket/site/RACHEL/dup_access_logs.csv")" "new copy" "newest duplicate uploaded"
+assert_eq "$(find "$QUEUE_DIR" -type f | wc -l | tr -d ' ')" "0" "skipped and superseded files leave the queue"
+assert_eq "$(grep -c 'site/RACHEL/lab_03_06_2025_access_logs.csv' "$CDN_AUTO_UPLOAD_LEDGER_FILE")" "1" "ledger keeps one entry per destination"
+
+log "=== Results: $pass passed, $fail failed ==="
+if (( fail > 0 )); then
+  exit 1
+fi
@@ -0,0 +1,548 @@
+#!/bin/bash
+# s3_uploader.py and the upload_batch helpers against a local S3-compatible stand-in: an
+# http.server that checks each request's SigV4 signature, redirects buckets asked for in the
+# wrong region, and stores objects (and their Content-Type/Content-Encoding) in a temp folder.
+set -euo pipefail
+
+ROOT="$(CDPATH= cd -- "$(dirname -- "$0")/../../.." >/dev/null 2>&1 && pwd)"
+cd "$ROOT"
+
+ts() { date '+%H:%M:%S'; }
+log() { echo "[$(ts)] $*"; }
+
+source scripts/data/lib/s3_helpers.sh
+source scripts/data/lib/oc4d_assessment_helpers.sh
+
+pass=0
+fail=0
+
+assert_eq() {
+  local got="$1"
+  local want="$2"
+  local label="$3"
+  if [[ "$got" != "$want" ]]; then
+    log "FAIL: $label expected '$want' got '$got'"
+    fail=$((fail + 1))
+    return 0
+  fi
+  log "PASS: $label"
+  pass=$((pass + 1))
+}
+
+assert_same_file() {
+  local got="$1"
+  local want="$2"
+  local label="$3"
+  if [[ -f "$got" ]] && cmp -s "$got" "$want"; then
+    log "PASS: $label"
+    pass=$((pass + 1))
+  else
+    log "FAIL: $label ($got does not match $want)"
+    fail=$((fail + 1))
+  fi
+}
+
+TEST_ROOT="$(mktemp -d)"
+STANDIN="$TEST_ROOT/s3"
+mkdir -p "$TEST_ROOT/bin" "$TEST_ROOT/home" "$STANDIN"
+
+# Buckets live in us-east-1 except moved-bucket (eu-west-1). Requests signed for the wrong
+# region get S3's AuthorizationHeaderMalformed answer; STANDIN_DROP_IDLE=1 closes every
+# connection after its response without telling the client, like an idle-timeout reset.
+# Multipart uploads keep their parts under .mpu/ so they survive a stand-in restart;
+# STANDIN_DROP_AFTER_PARTS=N cuts the connection halfway through every part after the Nth.
+cat > "$TEST_ROOT/standin.py" <<'PY'
+import hashlib
+import hmac
+import os
+import re
+import shutil
+import socket
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote
+
+STORE = os.environ["STANDIN"]
+MPU = os.path.join(STORE, ".mpu")
+SECRETS = {"AKIDSTANDIN": "standin-secret"}
+BUCKET_REGIONS = {"moved-bucket": "eu-west-1"}
+DROP_AFTER_PARTS = int(os.environ.get("STANDIN_DROP_AFTER_PARTS", "0"))
+parts_stored = 0
+parts_lock = threading.Lock()
+
+
+def note(name, line):
+    with open(os.path.join(STORE, name), "a", encoding="utf-8") as handle:
+        handle.write(line + "\n")
+
+
+def signature_error(handler, body):
+    auth = handler.headers.get("Authorization", "")
+    match = re.fullmatch(
+        r"AWS4-HMAC-SHA256 Credential=([^/]+)/(\d{8})/([^/]+)/s3/aws4_request, SignedHeaders=([^,]+), Signature=([0-9a-f]{64})",
+        auth,
+    )
+    if not match:
+        return "AccessDenied", "malformed Authorization header", None
+    access_key, day, region, signed_headers, signature = match.groups()
+    if access_key not in SECRETS:
+        return "InvalidAccessKeyId", access_key, None
+    payload_hash = handler.headers.get("x-amz-content-sha256", "")
+    if payload_hash != hashlib.sha256(body).hexdigest():
+        return "XAmzContentSHA256Mismatch", payload_hash, None
+    names = signed_headers.split(";")
+    if "host" not in names or "x-amz-date" not in names:
+        return "AccessDenied", "host and x-amz-date must be signed", None
+    path, _, query = handler.path.partition("?")
+    canonical = "\n".join(
+        [
+            handler.command,
+            path,
+            "&".join(sorted(query.split("&"))) if query else "",
+            "".join(f"{name}:{handler.headers.get(name, '').strip()}\n" for name in names),
+            signed_headers,
+            payload_hash,
+        ]
+    )
+    amz_date = handler.headers.get("x-amz-date", "")
+    to_sign = "\n".join(
+        ["AWS4-HMAC-SHA256", amz_date, f"{day}/{region}/s3/aws4_request", hashlib.sha256(canonical.encode()).hexdigest()]
+    )
+    key = ("AWS4" + SECRETS[access_key]).encode()
+    for part in (day, region, "s3", "aws4_request"):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    if hmac.new(key, to_sign.encode(), hashlib.sha256).hexdigest() != signature:
+        return "SignatureDoesNotMatch", "The request signature we calculated does not match", None
+    return None, None, region
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        note("connections", "open")
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if os.environ.get("STANDIN_DROP_IDLE") == "1":
+            self.close_connection = True
+
+    def error(self, status, code, message, extra="", headers=None):
+        body = f"<Error><Code>{code}</Code><Message>{message}</Message>{extra}</Error>".encode()
+        self.reply(status, body, headers)
+
+    def accept(self, body):
+        """(bucket, key, query) once the signature and region check out; None after an error reply."""
+        path, _, query = self.path.partition("?")
+        bucket, _, key = path.lstrip("/").partition("/")
+        code, message, region = signature_error(self, body)
+        if code:
+            note("requests", f"{code}\t{bucket}/{key}")
+            self.error(403, code, message)
+            return None
+        token = self.headers.get("x-amz-security-token", "")
+        if token:
+            note("tokens", token)
+        actual = BUCKET_REGIONS.get(bucket, "us-east-1")
+        if region != actual:
+            note("requests", f"redirect\t{bucket}/{key}")
+            self.error(
+                400,
+                "AuthorizationHeaderMalformed",
+                f"the region '{region}' is wrong; expecting '{actual}'",
+                f"<Region>{actual}</Region>",
+                {"x-amz-bucket-region": actual},
+            )
+            return None
+        return bucket, unquote(key), {name: values[0] for name, values in parse_qs(query, keep_blank_values=True).items()}
+
+    def store(self, bucket, key, body):
+        target = os.path.join(STORE, bucket, key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as handle:
+            handle.write(body)
+
+    def do_PUT(self):
+        global parts_stored
+        length = int(self.headers.get("Content-Length", "0"))
+        query = self.path.partition("?")[2]
+        if "partNumber=" in query and DROP_AFTER_PARTS:
+            with parts_lock:
+                drop = parts_stored >= DROP_AFTER_PARTS
+            if drop:
+                # The link dies halfway through the part
+                self.rfile.read(length // 2)
+                note("requests", "dropped")
+                self.connection.shutdown(socket.SHUT_RDWR)
+                self.close_connection = True
+                return
+        body = self.rfile.read(length)
+        accepted = self.accept(body)
+        if accepted is None:
+            return
+        bucket, key, params = accepted
+        if "uploadId" in params:
+            upload_dir = os.path.join(MPU, params["uploadId"])
+            if not os.path.isdir(upload_dir):
+                self.error(404, "NoSuchUpload", "The specified upload does not exist")
+                return
+            with open(os.path.join(upload_dir, params["partNumber"]), "wb") as handle:
+                handle.write(body)
+            with parts_lock:
+                parts_stored += 1
+            note("requests", f"part\t{params['partNumber']}")
+            self.reply(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+            return
+        self.store(bucket, key, body)
+        note("requests", f"ok\t{bucket}/{key}")
+        note("metadata", f"{key}\t{self.headers.get('Content-Type', '')}\t{self.headers.get('Content-Encoding', '')}")
+        self.reply(200, headers={"ETag": f'"{hashlib.md5(body).hexdigest()}"'})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        accepted = self.accept(body)
+        if accepted is None:
+            return
+        bucket, key, params = accepted
+        if "uploads" in params:
+            upload_id = uuid.uuid4().hex
+            os.makedirs(os.path.join(MPU, upload_id))
+            note("requests", "create")
+            note("metadata", f"{key}\t{self.headers.get('Content-Type', '')}\t{self.headers.get('Content-Encoding', '')}")
+            self.reply(200, f"<InitiateMultipartUploadResult><UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>".encode())
+            return
+        upload_dir = os.path.join(MPU, params.get("uploadId", "-"))
+        if not os.path.isdir(upload_dir):
+            self.error(404, "NoSuchUpload", "The specified upload does not exist")
+            return
+        numbers = re.findall(r"<PartNumber>(\d+)</PartNumber>", body.decode())
+        content = b""
+        for number in numbers:
+            with open(os.path.join(upload_dir, number), "rb") as handle:
+                content += handle.read()
+        self.store(bucket, key, content)
+        shutil.rmtree(upload_dir)
+        note("requests", f"complete\t{bucket}/{key}")
+        self.reply(200, b"<CompleteMultipartUploadResult></CompleteMultipartUploadResult>")
+
+    def do_DELETE(self):
+        accepted = self.accept(b"")
+        if accepted is None:
+            return
+        shutil.rmtree(os.path.join(MPU, accepted[2].get("uploadId", "-")), ignore_errors=True)
+        note("requests", "abort")
+        self.reply(204)
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+with open(os.path.join(STORE, "port"), "w", encoding="utf-8") as handle:
+    handle.write(str(server.server_address[1]))
+server.serve_forever()
+PY
+
+export STANDIN
+STANDIN_PID=""
+trap 'kill "$STANDIN_PID" 2>/dev/null || true; rm -rf "$TEST_ROOT"' EXIT
+
+# (Re)start the stand-in with the given VAR=value settings and point uploads at it
+start_standin() {
+  if [[ -n "$STANDIN_PID" ]]; then
+    kill "$STANDIN_PID" 2>/dev/null || true
+    wait "$STANDIN_PID" 2>/dev/null || true
+  fi
+  rm -f "$STANDIN/port"
+  env "$@" python3 "$TEST_ROOT/standin.py" &
+  STANDIN_PID=$!
+  for _ in $(seq 50); do
+    [[ -s "$STANDIN/port" ]] && break
+    sleep 0.1
+  done
+  export CDN_AUTO_S3_ENDPOINT_URL="http://127.0.0.1:$(cat "$STANDIN/port")"
+}
+start_standin
+
+# Fallback aws CLI: copies into the stand-in folder and notes the call; bucket-location
+# lookups fail, as they do without s3:GetBucketLocation
+cat > "$TEST_ROOT/bin/aws" <<'AWS'
+#!/bin/bash
+echo "$*" >> "$STANDIN/cli_calls"
+[[ " $* " == *" s3api "* ]] && exit 254
+if [[ " $* " == *" s3://moved-bucket/"* && " $* " != *" --region eu-west-1 "* ]]; then
+  echo "upload failed: An error occurred (AuthorizationHeaderMalformed) when calling the PutObject operation: the region 'us-east-1' is wrong; expecting 'eu-west-1'"
+  exit 1
+fi
+args=("$@")
+for ((i = 0; i < ${#args[@]}; i++)); do
+  if [[ "${args[$i]}" == "cp" ]]; then
+    src="${args[$((i + 1))]}"
+    dest="${args[$((i + 2))]}"
+  fi
+done
+target="$STANDIN/${dest#s3://}"
+mkdir -p "$(dirname "$target")"
+cp "$src" "$target"
+AWS
+chmod +x "$TEST_ROOT/bin/aws"
+# The region probe gets no answer
+cat > "$TEST_ROOT/bin/curl" <<'CURL'
+#!/bin/bash
+echo "$*" >> "$STANDIN/curl_calls"
+exit 6
+CURL
+chmod +x "$TEST_ROOT/bin/curl"
+
+export PATH="$TEST_ROOT/bin:$PATH"
+export HOME="$TEST_ROOT/home"
+export CDN_AUTO_BUCKET_REGION_FILE="$TEST_ROOT/bucket-regions.tsv"
+export CDN_AUTO_UPLOAD_LEDGER_FILE="$TEST_ROOT/upload-ledger.tsv"
+export AWS_ACCESS_KEY_ID="AKIDSTANDIN" AWS_SECRET_ACCESS_KEY="standin-secret"
+unset AWS_SESSION_TOKEN AWS_PROFILE AWS_DEFAULT_PROFILE AWS_SHARED_CREDENTIALS_FILE AWS_CONFIG_FILE CDN_AUTO_S3_UPLOADER
+
+FILES="$TEST_ROOT/files"
+mkdir -p "$FILES"
+for n in 1 2 3 4 5 6; do
+  seq 1 "$((n * 5000))" > "$FILES/part_$n.csv"
+done
+
+reset_standin() {
+  rm -rf "$STANDIN/cdn-bucket" "$STANDIN/moved-bucket" "$STANDIN/oc4d-bucket" "$STANDIN/unknown-bucket"
+  rm -f "$STANDIN/connections" "$STANDIN/requests" "$STANDIN/tokens" "$STANDIN/cli_calls" "$STANDIN/curl_calls" "$STANDIN/metadata"
+  rm -f "$CDN_AUTO_UPLOAD_LEDGER_FILE"
+  printf 'cdn-bucket\tus-east-1\t%s\noc4d-bucket\tus-east-1\t%s\n' "$(date +%s)" "$(date +%s)" > "$CDN_AUTO_BUCKET_REGION_FILE"
+}
+
+count_lines() {
+  if [[ -f "$1" ]]; then
+    wc -l < "$1" | tr -d ' '
+  else
+    echo 0
+  fi
+}
+
+log "=== Upload 1: a batch over one keep-alive connection ==="
+reset_standin
+rc=0
+python3 scripts/data/lib/s3_uploader.py > "$TEST_ROOT/results" <<EOF || rc=$?
+$FILES/part_1.csv	s3://cdn-bucket/site/RACHEL/part_1.csv
+$FILES/part_2.csv	s3://cdn-bucket/site/RACHEL/part 2+(copy).csv
+$FILES/part_3.csv	s3://cdn-bucket/site/Kolibri/part_3.csv
+$FILES/part_4.csv	s3://oc4d-bucket/Org/Assessments/s1/a1/part_4.csv
+EOF
+assert_eq "$rc" "0" "batch exits 0"
+assert_eq "$(grep -c '^ok' "$TEST_ROOT/results")" "4" "one ok line per object"
+assert_same_file "$STANDIN/cdn-bucket/site/RACHEL/part_1.csv" "$FILES/part_1.csv" "object stored"
+assert_same_file "$STANDIN/cdn-bucket/site/RACHEL/part 2+(copy).csv" "$FILES/part_2.csv" "key with space, plus and parentheses signed and stored"
+assert_same_file "$STANDIN/oc4d-bucket/Org/Assessments/s1/a1/part_4.csv" "$FILES/part_4.csv" "second bucket on the same endpoint"
+assert_eq "$(count_lines "$STANDIN/connections")" "1" "one connection for the whole batch"
+
+log "=== Upload 2: concurrency bounds the connection pool ==="
+reset_standin
+for n in 1 2 3 4 5 6; do
+  printf '%s\ts3://cdn-bucket/site/RACHEL/part_%s.csv\n' "$FILES/part_$n.csv" "$n"
+done > "$TEST_ROOT/jobs"
+rc=0
+python3 scripts/data/lib/s3_uploader.py --concurrency 3 < "$TEST_ROOT/jobs" > "$TEST_ROOT/results" || rc=$?
+assert_eq "$rc" "0" "concurrent batch exits 0"
+assert_eq "$(grep -c '^ok' "$TEST_ROOT/results")" "6" "every object uploaded"
+connections="$(count_lines "$STANDIN/connections")"
+assert_eq "$(( connections >= 1 && connections <= 3 ))" "1" "at most 3 connections for 6 objects ($connections)"
+
+log "=== Upload 3: wrong cached region is redirected and the cache corrected ==="
+reset_standin
+printf 'moved-bucket\tus-east-1\t%s\n' "$(date +%s)" >> "$CDN_AUTO_BUCKET_REGION_FILE"
+printf '%s\ts3://moved-bucket/site/RACHEL/part_1.csv\n%s\ts3://moved-bucket/site/RACHEL/part_2.csv\n' \
+  "$FILES/part_1.csv" "$FILES/part_2.csv" > "$TEST_ROOT/jobs"
+rc=0
+UPLOAD_CONCURRENCY=1 upload_batch "$TEST_ROOT/jobs" "$TEST_ROOT/results" >/dev/null || rc=$?
+assert_eq "$rc" "0" "redirected batch succeeds"
+assert_eq "$(cut -f4 "$TEST_ROOT/results" | sort -u)" "eu-west-1" "results report the bucket's real region"
+assert_eq "$(read_cached_bucket_region moved-bucket)" "eu-west-1" "region cache corrected"
+assert_same_file "$STANDIN/moved-bucket/site/RACHEL/part_2.csv" "$FILES/part_2.csv" "redirected object stored"
+
+log "=== Upload 4: a rejected signature is reported per object ==="
+reset_standin
+rc=0
+printf '%s\ts3://cdn-bucket/site/RACHEL/part_1.csv\n' "$FILES/part_1.csv" \
+  | AWS_SECRET_ACCESS_KEY="not-the-secret" python3 scripts/data/lib/s3_uploader.py > "$TEST_ROOT/results" || rc=$?
+assert_eq "$rc" "1" "failed batch exits 1"
+assert_eq "$(cut -f1 "$TEST_ROOT/results")" "failed" "failure reported"
+assert_eq "$(cut -f5 "$TEST_ROOT/results" | cut -d: -f1)" "SignatureDoesNotMatch" "S3 error code in the detail"
+
+log "=== Upload 5: profile credentials and session token ==="
+reset_standin
+mkdir -p "$HOME/.aws"
+printf '[cdn]\naws_access_key_id = AKIDSTANDIN\naws_secret_access_key = standin-secret\naws_session_token = token-123\n' > "$HOME/.aws/credentials"
+rc=0
+printf '%s\ts3://cdn-bucket/site/RACHEL/part_1.csv\n' "$FILES/part_1.csv" \
+  | env -u AWS_ACCESS_KEY_ID -u AWS_SECRET_ACCESS_KEY AWS_PROFILE=cdn python3 scripts/data/lib/s3_uploader.py > "$TEST_ROOT/results" || rc=$?
+assert_eq "$rc" "0" "profile credentials accepted"
+assert_eq "$(cat "$STANDIN/tokens" 2>/dev/null)" "token-123" "session token sent and signed"
+rm -rf "$HOME/.aws"
+
+log "=== Upload 6: idle connections dropped by the server are reopened ==="
+start_standin STANDIN_DROP_IDLE=1
+reset_standin
+for n in 1 2 3; do
+  printf '%s\ts3://cdn-bucket/site/RACHEL/part_%s.csv\n' "$FILES/part_$n.csv" "$n"
+done > "$TEST_ROOT/jobs"
+rc=0
+python3 scripts/data/lib/s3_uploader.py < "$TEST_ROOT/jobs" > "$TEST_ROOT/results" || rc=$?
+assert_eq "$rc" "0" "batch survives dropped connections"
+assert_eq "$(grep -c '^ok' "$TEST_ROOT/results")" "3" "every object uploaded after reconnecting"
+
+log "=== Upload 7: queue flush through the uploader ==="
+reset_standin
+S3_BUCKET="s3://cdn-bucket"
+S3_SUBFOLDER="site"
+RACHEL_SUBFOLDER=""
+OC4D_BUCKET="oc4d-bucket"
+QUEUE_DIR="$TEST_ROOT/queue"
+prepare_queue_dirs "$QUEUE_DIR"
+for n in 1 2 3; do
+  queue_one "$FILES/part_$n.csv" "$QUEUE_DIR" "RACHEL" >/dev/null
+done
+queue_one "$FILES/part_4.csv" "$QUEUE_DIR" "Kolibri" >/dev/null
+queue_oc4d_one "$FILES/part_5.csv" "$QUEUE_DIR" "Org/Assessments/s1/a1/result__2025-06-01T00-00-00Z.csv" >/dev/null
+rc=0
+UPLOAD_CONCURRENCY=2 flush_all_queues "$QUEUE_DIR" > "$TEST_ROOT/flush.log" || rc=$?
+assert_eq "$rc" "0" "flush succeeds"
+assert_eq "$(find "$QUEUE_DIR" -type f | wc -l | tr -d ' ')" "0" "queue emptied with sidecars"
+assert_same_file "$STANDIN/cdn-bucket/site/RACHEL/part_3.csv" "$FILES/part_3.csv" "RACHEL queue upload"
+assert_same_file "$STANDIN/cdn-bucket/site/Kolibri/part_4.csv" "$FILES/part_4.csv" "Kolibri queue upload"
+assert_same_file "$STANDIN/oc4d-bucket/Org/Assessments/s1/a1/result__2025-06-01T00-00-00Z.csv" "$FILES/part_5.csv" "OC4D queue upload to sidecar key"
+assert_eq "$(grep -c '\[done\] Uploaded' "$TEST_ROOT/flush.log")" "5" "one done line per queued file"
+assert_eq "$(count_lines "$STANDIN/cli_calls")" "0" "no aws CLI calls"
+
+log "=== Upload 8: compressed exports are stored as gzip files through the queue ==="
+reset_standin
+gzip -n -c "$FILES/part_1.csv" > "$FILES/lab_2025_access_logs.csv.gz"
+PROCESSED_ROOT="$TEST_ROOT/00_PROCESSED"
+mkdir -p "$PROCESSED_ROOT/lab_logs_2025_06_01"
+cp "$FILES/lab_2025_access_logs.csv.gz" "$PROCESSED_ROOT/lab_logs_2025_06_01/"
+queue_one "$PROCESSED_ROOT/lab_logs_2025_06_01/lab_2025_access_logs.csv.gz" "$QUEUE_DIR" "RACHEL" "lab_logs_2025_06_01" >/dev/null
+queue_one "$FILES/part_2.csv" "$QUEUE_DIR" "RACHEL" >/dev/null
+rc=0
+CDN_AUTO_PROCESSED_ROOT="$PROCESSED_ROOT" flush_all_queues "$QUEUE_DIR" >/dev/null || rc=$?
+assert_eq "$rc" "0" "compressed flush succeeds"
+assert_same_file "$STANDIN/cdn-bucket/site/RACHEL/lab_2025_access_logs.csv.gz" "$FILES/lab_2025_access_logs.csv.gz" "stored as .csv.gz bytes"
+assert_eq "$(grep 'lab_2025_access_logs.csv.gz' "$STANDIN/metadata" | cut -f2-)" "application/gzip	" "Content-Type application/gzip without Content-Encoding"
+assert_eq "$(grep 'part_2.csv' "$STANDIN/metadata" | cut -f2-)" "text/csv	" "plain CSV without Content-Encoding"
+assert_eq "$(find "$QUEUE_DIR" -type f | wc -l | tr -d ' ')" "0" "compressed file and sidecar flushed"
+assert_eq "$(find "$PROCESSED_ROOT" -mindepth 1 -maxdepth 1 | wc -l | tr -d ' ')" "0" "processed run folder cleaned"
+
+log "=== Upload 9: an interrupted multipart upload resumes from the last stored part ==="
+reset_standin
+head -c $((5 * 1024 * 1024 * 2 + 512 * 1024)) /dev/urandom > "$FILES/big_export.csv"
+export CDN_AUTO_MULTIPART_THRESHOLD=5242880 CDN_AUTO_MULTIPART_PART_SIZE=5242880
+export CDN_AUTO_MULTIPART_STATE_FILE="$TEST_ROOT/multipart-uploads.json"
+queue_one "$FILES/big_export.csv" "$QUEUE_DIR" "RACHEL" >/dev/null
+start_standin STANDIN_DROP_AFTER_PARTS=2
+rc=0
+flush_all_queues "$QUEUE_DIR" > "$TEST_ROOT/flush.log" 2>&1 || rc=$?
+assert_eq "$rc" "1" "flush reports the dropped connection"
+assert_eq "$(grep -c '^part' "$STANDIN/requests")" "2" "two parts stored before the drop"
+assert_eq "$(find "$QUEUE_DIR/RACHEL" -name 'big_export.csv' | wc -l | tr -d ' ')" "1" "file stays queued"
+assert_eq "$(python3 -c 'import json, sys; print(sum(len(e["parts"]) for e in json.load(open(sys.argv[1])).values()))' "$CDN_AUTO_MULTIPART_STATE_FILE")" "2" "state file records the two stored parts"
+start_standin
+rm -f "$STANDIN/requests"
+rc=0
+flush_all_queues "$QUEUE_DIR" > "$TEST_ROOT/flush.log" 2>&1 || rc=$?
+assert_eq "$rc" "0" "second flush completes the upload"
+assert_eq "$(grep -v '^complete' "$STANDIN/requests" | tr '\n' ' ')" "part	3 " "only the missing part is sent"
+assert_same_file "$STANDIN/cdn-bucket/site/RACHEL/big_export.csv" "$FILES/big_export.csv" "object assembled from both runs"
+assert_eq "$(python3 -c 'import json, sys; print(len(json.load(open(sys.argv[1]))))' "$CDN_AUTO_MULTIPART_STATE_FILE")" "0" "state entry removed once complete"
+assert_eq "$(find "$QUEUE_DIR" -type f | wc -l | tr -d ' ')" "0" "queue emptied"
+unset CDN_AUTO_MULTIPART_THRESHOLD CDN_AUTO_MULTIPART_PART_SIZE CDN_AUTO_MULTIPART_STATE_FILE
+
+log "=== Upload 10: without credentials the aws CLI takes over ==="
+reset_standin
+rc=0
+(
+  unset AWS_ACCESS_KEY_ID AWS_SECRET_ACCESS_KEY
+  s3_put_file "$FILES/part_6.csv" "s3://cdn-bucket/site/RACHEL/part_6.csv" >/dev/null
+) || rc=$?
+assert_eq "$rc" "0" "fallback upload succeeds"
+assert_eq "$(count_lines "$STANDIN/cli_calls")" "1" "one aws CLI call"
+assert_eq "$(grep -c "endpoint-url $CDN_AUTO_S3_ENDPOINT_URL" "$STANDIN/cli_calls")" "1" "CLI gets the endpoint override"
+assert_same_file "$STANDIN/cdn-bucket/site/RACHEL/part_6.csv" "$FILES/part_6.csv" "fallback object stored"
+reset_standin
+(
+  unset AWS_ACCESS_KEY_ID AWS_SECRET_ACCESS_KEY
+  s3_put_file "$FILES/lab_2025_access_logs.csv.gz" "s3://cdn-bucket/site/RACHEL/lab_2025_access_logs.csv.gz" >/dev/null
+) || true
+assert_eq "$(grep -c -- '--content-type application/gzip' "$STANDIN/cli_calls")" "1" "CLI fallback stores .gz keys as application/gzip"
+assert_eq "$(grep -c -- '--content-encoding' "$STANDIN/cli_calls")" "0" "CLI fallback sets no Content-Encoding"
+
+reset_standin
+for n in 1 2 3; do
+  printf '%s\ts3://unknown-bucket/site/RACHEL/part_%s.csv\n' "$FILES/part_$n.csv" "$n"
+done > "$TEST_ROOT/jobs"
+rc=0
+(
+  unset AWS_ACCESS_KEY_ID AWS_SECRET_ACCESS_KEY
+  UPLOAD_CONCURRENCY=3 upload_batch "$TEST_ROOT/jobs" "$TEST_ROOT/results" >/dev/null
+) || rc=$?
+assert_eq "$rc" "0" "CLI batch to a bucket whose region lookup fails"
+assert_eq "$(grep -c 'get-bucket-location' "$STANDIN/cli_calls")" "1" "region looked up once per batch, not per file"
+assert_eq "$(count_lines "$STANDIN/curl_calls")" "1" "region probed once per batch"
+assert_eq "$(grep -c -- '--region us-east-1 .* s3 cp' "$STANDIN/cli_calls")" "3" "every copy uses the batch's region"
+
+reset_standin
+printf 'moved-bucket\tus-east-1\t%s\n' "$(date +%s)" >> "$CDN_AUTO_BUCKET_REGION_FILE"
+for n in 1 2 3 4; do
+  printf '%s\ts3://moved-bucket/site/RACHEL/part_%s.csv\n' "$FILES/part_$n.csv" "$n"
+done > "$TEST_ROOT/jobs"
+rc=0
+(
+  unset AWS_ACCESS_KEY_ID AWS_SECRET_ACCESS_KEY
+  # Count cache writes: the parallel copies must leave them to send_batch
+  eval "counted_$(declare -f write_cached_bucket_region)"
+  write_cached_bucket_region() {
+    echo "$*" >> "$STANDIN/cache_writes"
+    counted_write_cached_bucket_region "$@"
+  }
+  UPLOAD_CONCURRENCY=4 upload_batch "$TEST_ROOT/jobs" "$TEST_ROOT/results" >/dev/null
+) || rc=$?
+assert_eq "$rc" "0" "CLI batch redirected to the bucket's region"
+assert_eq "$(cut -f4 "$TEST_ROOT/results" | sort -u)" "eu-west-1" "CLI results report the region S3 named"
+assert_eq "$(cat "$STANDIN/cache_writes" 2>/dev/null)" "moved-bucket eu-west-1" "one cache write, after the copies"
+assert_eq "$(read_cached_bucket_region moved-bucket)" "eu-west-1" "region cache corrected from the CLI results"
+rm -f "$STANDIN/cache_writes"
+
+log "=== Caches: parallel writers keep every entry ==="
+reset_standin
+for n in $(seq 40); do
+  printf 'bucket-%s\tus-east-1\t%s\n' "$n" "$(date +%s)"
+done > "$CDN_AUTO_BUCKET_REGION_FILE"
+for n in $(seq 40); do
+  printf 's3://cdn-bucket/old/%s.csv\t%s\t1\t%s\n' "$n" "$n" "$(date +%s)"
+done > "$CDN_AUTO_UPLOAD_LEDGER_FILE"
+for n in $(seq 8); do
+  printf 's3://cdn-bucket/new/%s.csv\t%s\t1\n' "$n" "$n" > "$TEST_ROOT/fingerprints.$n"
+done
+writers=()
+for n in $(seq 8); do
+  ( write_cached_bucket_region "parallel-$n" eu-west-1 ) &
+  writers+=($!)
+  ( record_upload_ledger "$TEST_ROOT/fingerprints.$n" ) &
+  writers+=($!)
+done
+wait "${writers[@]}"
+assert_eq "$(count_lines "$CDN_AUTO_BUCKET_REGION_FILE")" "48" "8 parallel region writes on a 40-line cache"
+assert_eq "$(count_lines "$CDN_AUTO_UPLOAD_LEDGER_FILE")" "48" "8 parallel ledger writes on a 40-line ledger"
+assert_eq "$(find "$TEST_ROOT" -maxdepth 1 -name '*.tmp' | wc -l | tr -d ' ')" "0" "no temp files left"
+
+log "=== Results: $pass passed, $fail failed ==="
+if (( fail > 0 )); then
+  exit 1
+fi
@@ -0,0 +1,194 @@
+#!/bin/bash
+# Batch S3 uploads shared by the automation, the queue flush and the manual upload tools.
+# Jobs are "<file><TAB>s3://bucket/key" lines. s3_uploader.py sends a whole batch from one
+# Python process over a keep-alive connection per region; without python3 or static AWS
+# credentials (or with CDN_AUTO_S3_UPLOADER=0) each file goes through aws s3 cp instead.
+# Either way at most UPLOAD_CONCURRENCY (default 4) uploads run at once. Files whose bytes
+# already went to the same destination (ledger_helpers.sh) are reported as unchanged and skipped.
+
+if ! declare -f log >/dev/null 2>&1; then
+  log() { echo "$*"; }
+fi
+
+_upload_helpers_dir="$(CDPATH= cd -- "$(dirname -- "${BASH_SOURCE[0]}")" >/dev/null 2>&1 && pwd)"
+# shellcheck disable=SC1091
+source "$_upload_helpers_dir/region_helpers.sh"
+# shellcheck disable=SC1091
+source "$_upload_helpers_dir/ledger_helpers.sh"
+
+DEFAULT_UPLOAD_CONCURRENCY=4
+# s3_uploader.py exit status when it has no credentials and nothing was attempted
+S3_UPLOADER_UNAVAILABLE=3
+
+upload_concurrency() {
+  local limit="${UPLOAD_CONCURRENCY:-$DEFAULT_UPLOAD_CONCURRENCY}"
+  if [[ ! "$limit" =~ ^[0-9]+$ ]] || (( limit < 1 )); then
+    limit="$DEFAULT_UPLOAD_CONCURRENCY"
+  fi
+  printf '%s\n' "$limit"
+}
+
+s3_uri_bucket() {
+  local rest="${1#s3://}"
+  printf '%s\n' "${rest%%/*}"
+}
+
+s3_uploader_enabled() {
+  [[ "${CDN_AUTO_S3_UPLOADER:-1}" != "0" ]] && command -v python3 >/dev/null 2>&1
+}
+
+# aws s3 cp per "<file><TAB>destination<TAB>region" job, at most upload_concurrency() at once;
+# writes the same result lines as s3_uploader.py, with the region S3 accepted or named for the
+# copy. The jobs never write the region cache; send_batch does once they are done.
+cli_upload_batch() {
+  local jobs_file="$1"
+  local results_file="$2"
+  local limit status_dir file_path destination region
+  local n=0
+
+  limit="$(upload_concurrency)"
+  status_dir="$(mktemp -d)"
+  while IFS=$'\t' read -r file_path destination region _; do
+    [[ -n "$file_path" ]] || continue
+    n=$((n + 1))
+    while (( $(jobs -rp | wc -l) >= limit )); do
+      wait -n || true
+    done
+    (
+      bucket="$(s3_uri_bucket "$destination")"
+      status="ok"
+      output=""
+      # Not in a command substitution, so aws_cli_region reaches this shell
+      aws_cli_cp_bucket "$file_path" "$destination" "$bucket" "$region" > "$status_dir/$n.out" 2>&1 || status="failed"
+      [[ "$status" == "ok" ]] || output="$(tr '\t\n' '  ' < "$status_dir/$n.out")"
+      rm -f "$status_dir/$n.out"
+      printf '%s\t%s\t%s\t%s\t%s\n' "$status" "$file_path" "$destination" \
+        "${aws_cli_region:-$region}" "$output" > "$status_dir/$n"
+    ) < /dev/null &
+  done < "$jobs_file"
+  wait || true
+
+  find "$status_dir" -type f -exec cat {} + > "$results_file"
+  rm -rf "$status_dir"
+}
+
+# Send every job in jobs_file; results_file gets one
+# "ok|failed<TAB>file<TAB>destination<TAB>region<TAB>detail" line per job attempted.
+# Returns 1 unless every job uploaded.
+send_batch() {
+  local jobs_file="$1"
+  local results_file="$2"
+  local file_path destination bucket region status uploader_jobs
+  local rc=0
+  local -A regions=()
+
+  : > "$results_file"
+  [[ -s "$jobs_file" ]] || return 0
+
+  # Each bucket's region is resolved once, before any upload starts
+  uploader_jobs="$(mktemp)"
+  while IFS=$'\t' read -r file_path destination _; do
+    [[ -n "$file_path" ]] || continue
+    bucket="$(s3_uri_bucket "$destination")"
+    [[ -n "${regions[$bucket]:-}" ]] || regions[$bucket]="$(cached_bucket_region "$bucket")"
+    printf '%s\t%s\t%s\n' "$file_path" "$destination" "${regions[$bucket]}"
+  done < "$jobs_file" > "$uploader_jobs"
+
+  if s3_uploader_enabled; then
+    python3 "$_upload_helpers_dir/s3_uploader.py" --concurrency "$(upload_concurrency)" \
+      < "$uploader_jobs" > "$results_file" || rc=$?
+    if (( rc == S3_UPLOADER_UNAVAILABLE )); then
+      log "[upload] No static AWS credentials for the in-process uploader; using the aws CLI."
+    fi
+  else
+    rc="$S3_UPLOADER_UNAVAILABLE"
+  fi
+  if (( rc == S3_UPLOADER_UNAVAILABLE )); then
+    cli_upload_batch "$uploader_jobs" "$results_file"
+    rc=0
+    grep -q '^failed' "$results_file" && rc=1
+  fi
+  rm -f "$uploader_jobs"
+
+  # Keep the cache in step with any region redirect the uploads followed
+  while IFS=$'\t' read -r status file_path destination region _; do
+    bucket="$(s3_uri_bucket "$destination")"
+    if [[ -n "$region" && "$region" != "${regions[$bucket]:-}" ]]; then
+      write_cached_bucket_region "$bucket" "$region"
+      regions[$bucket]="$region"
+    fi
+  done < "$results_file"
+  (( rc == 0 ))
+}
+
+# Upload every job in jobs_file; results_file gets one
+# "ok|failed<TAB>file<TAB>destination<TAB>region<TAB>detail" line per job attempted.
+# Jobs the ledger already holds are not sent; they are "ok" with detail "unchanged".
+# Returns 1 unless every job uploaded.
+upload_batch() {
+  local jobs_file="$1"
+  local results_file="$2"
+  local file_path destination fingerprint send_jobs sent_results fingerprints status key
+  local rc=0
+  local -A ledger=()
+  local -A sent=()
+
+  : > "$results_file"
+  [[ -s "$jobs_file" ]] || return 0
+  if ! upload_ledger_enabled; then
+    send_batch "$jobs_file" "$results_file"
+    return
+  fi
+
+  send_jobs="$(mktemp)"
+  sent_results="$(mktemp)"
+  fingerprints="$(mktemp)"
+  read_upload_ledger ledger
+  while IFS=$'\t' read -r file_path destination _; do
+    [[ -n "$file_path" ]] || continue
+    fingerprint="$(file_fingerprint "$file_path")" || fingerprint=""
+    if [[ -n "$fingerprint" && "${ledger[$destination]:-}" == "$fingerprint" ]]; then
+      printf 'ok\t%s\t%s\t%s\t%s\n' "$file_path" "$destination" \
+        "$(read_cached_bucket_region "$(s3_uri_bucket "$destination")" || echo -)" "$UPLOAD_UNCHANGED" >> "$results_file"
+      continue
+    fi
+    if [[ -n "$fingerprint" ]]; then
+      sent["$file_path"$'\t'"$destination"]="$fingerprint"
+    fi
+    printf '%s\t%s\n' "$file_path" "$destination" >> "$send_jobs"
+  done < "$jobs_file"
+
+  send_batch "$send_jobs" "$sent_results" || rc=1
+  while IFS=$'\t' read -r status file_path destination _; do
+    key="$file_path"$'\t'"$destination"
+    [[ "$status" == "ok" && -n "${sent[$key]:-}" ]] || continue
+    printf '%s\t%s\n' "$destination" "${sent[$key]}"
+  done < "$sent_results" > "$fingerprints"
+  record_upload_ledger "$fingerprints"
+  cat "$sent_results" >> "$results_file"
+
+  rm -f "$send_jobs" "$sent_results" "$fingerprints"
+  return "$rc"
+}
+
+# Upload one file; prints the error detail and returns 1 when it fails, or prints
+# "unchanged" when the ledger skipped it
+s3_put_file() {
+  local file_path="$1"
+  local destination="$2"
+  local jobs results detail
+  local rc=0
+
+  jobs="$(mktemp)"
+  results="$(mktemp)"
+  printf '%s\t%s\n' "$file_path" "$destination" > "$jobs"
+  upload_batch "$jobs" "$results" || rc=1
+  IFS=$'\t' read -r _ _ _ _ detail < "$results" || detail="no upload result"
+  rm -f "$jobs" "$results"
+  if (( rc != 0 )); then
+    printf '%s\n' "${detail:-upload failed}"
+  elif [[ "$detail" == "$UPLOAD_UNCHANGED" ]]; then
+    printf '%s\n' "$detail"
+  fi
+  return "$rc"
+}
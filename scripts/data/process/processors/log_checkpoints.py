@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Byte-offset checkpoints for incremental log processing.
+
+Each log is identified by its inode and a SHA-1 of its first bytes (the
+"head"), and is only resumed when the recorded offset still fits in its
+current size. Sizes, heads and offsets refer to the decompressed content.
+The inode is the one of the original log: the runner copies logs into
+00_DATA/<run folder> and records each copy's source inode there
+(record_sources()), so a later run recognises the same log, including after
+a rename such as access.log -> access.log.1, and starts parsing where the
+previous run stopped. A truncated log, or a new log that happens to start
+with the same bytes, is parsed from the start.
+
+A checkpoint only advances past lines whose timestamp is at or before the
+--checkpoint-until cutoff (the end of the window being uploaded), so lines
+that belong to a later window are parsed again by the next run. Processors
+write the new offsets to checkpoints.pending.json in the processed folder;
+orchestrator.py commits them into the store once the window CSV has been built.
+
+Usage: python log_checkpoints.py commit <pending_file> [store_file]
+"""
+
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Iterator
+
+from log_input import content_size, iter_binary_lines, iter_text_lines, read_head
+
+DEFAULT_STORE_FILE = os.path.join("00_DATA", "00_CACHE", "log-checkpoints.json")
+PENDING_FILE_NAME = "checkpoints.pending.json"
+SOURCES_FILE_NAME = ".log-sources.json"
+HEAD_BYTES = 4096
+STALE_AFTER_DAYS = 35
+
+
+def parse_cutoff(value: str):
+    if not value:
+        return None
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S")
+
+
+def record_sources(folder: str, inodes: dict) -> None:
+    """Remember the inode of the log each file in folder was copied from ({file name: inode})."""
+    with open(os.path.join(folder, SOURCES_FILE_NAME), "w", encoding="utf-8") as handle:
+        json.dump(inodes, handle, indent=2, sort_keys=True)
+
+
+@lru_cache(maxsize=64)
+def _folder_sources(folder: str) -> dict:
+    try:
+        with open(os.path.join(folder, SOURCES_FILE_NAME), "r", encoding="utf-8") as handle:
+            sources = json.load(handle)
+    except (OSError, ValueError):
+        return {}
+    return sources if isinstance(sources, dict) else {}
+
+
+def source_inode(file_path: str) -> int:
+    """Inode of the log file_path was copied from, or its own when no source was recorded."""
+    inode = _folder_sources(os.path.dirname(os.path.abspath(file_path))).get(os.path.basename(file_path))
+    return inode if isinstance(inode, int) else os.stat(file_path).st_ino
+
+
+class FileCheckpoint:
+    """Start offset for one file plus the offset the next run should resume from."""
+
+    def __init__(self, file_path: str, start_offset: int, until: datetime = None, replaces: str = None):
+        head = read_head(file_path, HEAD_BYTES)
+        self.name = os.path.basename(file_path)
+        self.inode = source_inode(file_path)
+        self.size = content_size(file_path)
+        self.head_len = len(head)
+        self.head_hash = hashlib.sha1(head).hexdigest()
+        self.start_offset = start_offset
+        self.replaces = replaces
+        self.until = until
+        self.line_start = start_offset
+        self.resume_offset = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.inode}:{self.head_len}:{self.head_hash}"
+
+    def observe(self, timestamp: datetime) -> None:
+        """Called with each parsed line's timestamp; the first line past the cutoff pins the resume offset."""
+        if self.until is not None and self.resume_offset is None and timestamp > self.until:
+            self.resume_offset = self.line_start
+
+    def finish(self, complete_offset: int) -> None:
+        if self.resume_offset is None:
+            self.resume_offset = complete_offset
+
+    def entry(self) -> dict:
+        return {
+            "name": self.name,
+            "inode": self.inode,
+            "size": self.size,
+            "head_len": self.head_len,
+            "head_hash": self.head_hash,
+            "offset": self.resume_offset if self.resume_offset is not None else self.start_offset,
+            "replaces": self.replaces,
+            "seen": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+
+def read_lines(file_path: str, checkpoint: FileCheckpoint = None, encoding: str = "utf-8") -> Iterator[str]:
+    """
+    Yield text lines of file_path. With a checkpoint, reading starts at its
+    offset and the byte offset of each line is tracked so the resume point can
+    be recorded. A trailing line without a newline is left for the next run.
+    """
+    if checkpoint is None:
+        yield from iter_text_lines(file_path, encoding)
+        return
+
+    offset = checkpoint.start_offset
+    complete_offset = offset
+    for raw_line in iter_binary_lines(file_path, offset):
+        checkpoint.line_start = offset
+        offset += len(raw_line)
+        if raw_line.endswith(b"\n"):
+            complete_offset = offset
+            if raw_line.endswith(b"\r\n"):
+                raw_line = raw_line[:-2] + b"\n"
+        yield raw_line.decode(encoding)
+    checkpoint.finish(complete_offset)
+
+
+class CheckpointStore:
+    def __init__(self, path: str = None):
+        self.path = path or os.environ.get("CDN_AUTO_LOG_CHECKPOINT_FILE", DEFAULT_STORE_FILE)
+        self.entries = {}
+
+    def load(self) -> "CheckpointStore":
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as handle:
+                    entries = json.load(handle).get("files", {})
+                if isinstance(entries, dict):
+                    self.entries = entries
+            except (OSError, ValueError, AttributeError) as exc:
+                print(f"Log checkpoint store ignored ({self.path}): {exc}")
+        return self
+
+    def save(self) -> None:
+        cutoff = (datetime.now() - timedelta(days=STALE_AFTER_DAYS)).strftime("%Y-%m-%dT%H:%M:%S")
+        entries = {key: entry for key, entry in self.entries.items() if entry.get("seen", "") >= cutoff}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump({"files": entries}, handle, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    def start_offset(self, file_path: str) -> tuple:
+        """
+        (resume offset, matched entry key) for file_path; (0, None) when the file
+        is new, was replaced or was truncated. An entry matches when it has the
+        same inode and head and its offset is no larger than the current size.
+        """
+        inode = source_inode(file_path)
+        size = content_size(file_path)
+        digests = {}
+        best = (0, None)
+        for key, entry in self.entries.items():
+            if entry.get("inode") != inode:
+                continue
+            head_len = entry.get("head_len", 0)
+            offset = entry.get("offset", 0)
+            if size is None or head_len > size or offset > size:
+                continue
+            if head_len not in digests:
+                head = read_head(file_path, head_len)
+                digests[head_len] = hashlib.sha1(head).hexdigest() if len(head) == head_len else None
+            if digests[head_len] == entry.get("head_hash") and (best[1] is None or offset > best[0]):
+                best = (offset, key)
+        return best
+
+
+class CheckpointSession:
+    """Resolves start offsets for one processor run and collects the new offsets."""
+
+    def __init__(self, store_path: str = None, until: str = None):
+        self.store = CheckpointStore(store_path).load()
+        self.until = parse_cutoff(until)
+        self.pending = {}
+        self.skipped_bytes = 0
+
+    def open(self, file_path: str) -> FileCheckpoint:
+        start_offset, replaces = self.store.start_offset(file_path)
+        checkpoint = FileCheckpoint(file_path, start_offset, self.until, replaces)
+        self.skipped_bytes += checkpoint.start_offset
+        return checkpoint
+
+    def record(self, checkpoint: FileCheckpoint) -> None:
+        if checkpoint is not None:
+            self.pending[checkpoint.key] = checkpoint.entry()
+
+    def write_pending(self, folder: str) -> str:
+        pending_path = os.path.join(folder, PENDING_FILE_NAME)
+        with open(pending_path, "w", encoding="utf-8") as handle:
+            json.dump({"files": self.pending}, handle, indent=2, sort_keys=True)
+        return pending_path
+
+
+def commit_pending(pending_path: str, store_path: str = None) -> int:
+    with open(pending_path, "r", encoding="utf-8") as handle:
+        pending = json.load(handle).get("files", {})
+    store = CheckpointStore(store_path).load()
+    for key, entry in pending.items():
+        # A log that grew past its recorded head length gets a new key; drop the old one
+        replaced = entry.pop("replaces", None)
+        if replaced and replaced != key:
+            store.entries.pop(replaced, None)
+        store.entries[key] = entry
+    store.save()
+    return len(pending)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4) or sys.argv[1] != "commit":
+        sys.stderr.write("Usage: python log_checkpoints.py commit <pending_file> [store_file]\n")
+        sys.exit(1)
+
+    try:
+        committed = commit_pending(sys.argv[2], sys.argv[3] if len(sys.argv) == 4 else None)
+    except (OSError, ValueError) as exc:
+        sys.stderr.write(f"Could not commit log checkpoints: {exc}\n")
+        sys.exit(1)
+    print(f"Committed checkpoints for {committed} log file(s).")
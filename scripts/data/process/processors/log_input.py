@@ -0,0 +1,159 @@
+"""
+Transparent input layer for plain, gzip and zip logs.
+
+Rotated logs are read straight from the collected archive, so nothing is
+decompressed to disk. Zip archives are read as the concatenation of their
+.log members in archive order.
+"""
+
+import gzip
+import mmap
+import os
+import zipfile
+from contextlib import contextmanager
+from typing import Iterator
+
+COMPRESSED_SUFFIXES = (".gz", ".zip")
+BLOCK_BYTES = 8 * 1024 * 1024
+
+
+def log_name(file_path: str) -> str:
+    """Base name without the compression suffix, e.g. oc4d-2025-01-27.log for oc4d-2025-01-27.log.gz."""
+    base_name = os.path.basename(file_path)
+    for suffix in COMPRESSED_SUFFIXES:
+        if base_name.endswith(suffix):
+            return base_name[: -len(suffix)]
+    return base_name
+
+
+def content_size(file_path: str):
+    """
+    Decompressed size in bytes. For gzip this is the trailer's size field: exact
+    for the single-stream files logrotate writes, and never more than the real
+    size otherwise (multi-stream files, 4 GiB and over); None for an empty file.
+    """
+    if file_path.endswith(".gz"):
+        with open(file_path, "rb") as handle:
+            handle.seek(0, os.SEEK_END)
+            if handle.tell() < 4:
+                return None
+            handle.seek(-4, os.SEEK_END)
+            return int.from_bytes(handle.read(4), "little")
+    if file_path.endswith(".zip"):
+        with zipfile.ZipFile(file_path) as archive:
+            return sum(info.file_size for info in archive.infolist() if info.filename.endswith(".log"))
+    return os.path.getsize(file_path)
+
+
+@contextmanager
+def _open_members(file_path: str):
+    """Binary streams for the decompressed content of file_path."""
+    if file_path.endswith(".zip"):
+        with zipfile.ZipFile(file_path) as archive:
+            yield (archive.open(name) for name in archive.namelist() if name.endswith(".log"))
+    elif file_path.endswith(".gz"):
+        with gzip.open(file_path, "rb") as handle:
+            yield iter((handle,))
+    else:
+        with open(file_path, "rb") as handle:
+            yield iter((handle,))
+
+
+def read_head(file_path: str, length: int) -> bytes:
+    """First length bytes of the decompressed content (fewer when the log is shorter)."""
+    chunks = []
+    remaining = length
+    with _open_members(file_path) as members:
+        for member in members:
+            with member:
+                while remaining > 0:
+                    chunk = member.read(remaining)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    remaining -= len(chunk)
+            if remaining <= 0:
+                break
+    return b"".join(chunks)
+
+
+def iter_text_lines(file_path: str, encoding: str = "utf-8", errors: str = "strict") -> Iterator[str]:
+    """Text lines; CRLF endings are normalised to \\n as text-mode open() does for plain logs."""
+    if not file_path.endswith(COMPRESSED_SUFFIXES):
+        with open(file_path, "r", encoding=encoding, errors=errors) as handle:
+            yield from handle
+        return
+
+    for raw_line in iter_binary_lines(file_path):
+        if raw_line.endswith(b"\r\n"):
+            raw_line = raw_line[:-2] + b"\n"
+        yield raw_line.decode(encoding, errors)
+
+
+def _skip(member, start_offset: int) -> int:
+    """Move member forward by up to start_offset bytes; returns what is left to skip in later members."""
+    # gzip and zip members seek forward by decompressing, without writing anything
+    if member.seekable():
+        position = member.seek(start_offset)
+    else:
+        position = len(member.read(start_offset))
+    return start_offset - min(position, start_offset)
+
+
+def iter_binary_lines(file_path: str, start_offset: int = 0) -> Iterator[bytes]:
+    """Raw lines of the decompressed content, starting start_offset bytes in."""
+    with _open_members(file_path) as members:
+        for member in members:
+            with member:
+                if start_offset:
+                    start_offset = _skip(member, start_offset)
+                    if start_offset:
+                        continue
+                yield from member
+
+
+def iter_line_blocks(file_path: str, start_offset: int = 0, block_size: int = BLOCK_BYTES) -> Iterator[tuple]:
+    """
+    (offset, bytes) blocks of about block_size bytes that end on a line break,
+    so a block never splits a line; only the last block of a member may end
+    without one. Plain logs are memory-mapped, archives are read in blocks.
+    Blocks never span zip members, matching iter_binary_lines().
+    """
+    if not file_path.endswith(COMPRESSED_SUFFIXES):
+        with open(file_path, "rb") as handle:
+            size = os.fstat(handle.fileno()).st_size
+            if size <= start_offset:
+                return
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                position = start_offset
+                while position < size:
+                    end = mapped.rfind(b"\n", position, position + block_size) + 1
+                    if end == 0:
+                        # A line longer than block_size
+                        end = mapped.find(b"\n", position + block_size) + 1 or size
+                    yield position, mapped[position:end]
+                    position = end
+        return
+
+    offset = start_offset
+    with _open_members(file_path) as members:
+        for member in members:
+            with member:
+                if start_offset:
+                    start_offset = _skip(member, start_offset)
+                    if start_offset:
+                        continue
+                carry = b""
+                while True:
+                    data = member.read(block_size)
+                    if not data:
+                        break
+                    data = carry + data
+                    end = data.rfind(b"\n") + 1
+                    carry = data[end:]
+                    if end:
+                        yield offset, data[:end]
+                        offset += end
+                if carry:
+                    yield offset, carry
+                    offset += len(carry)
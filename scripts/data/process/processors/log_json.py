@@ -0,0 +1,81 @@
+"""
+Fast extraction of the "message" field from Winston-style JSON log lines.
+
+OC4D, D-Hub and Castle lines look like
+{"level":"info","message":"<access log line>","timestamp":"..."} and only
+"message" is used. When orjson is installed it parses the envelope faster
+than anything done in Python, so it is used for every line. Otherwise
+extract_message() slices and unescapes "message" straight out of the line
+and only runs json.loads when the line is not in that simple shape.
+"""
+
+import json
+import re
+from json.decoder import scanstring
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+MESSAGE_KEY = '"message":'
+# Any later "message" string may be a duplicate key (json keeps the last one), so such lines are fully parsed
+MESSAGE_STRING = '"message"'
+
+# The envelope up to the message key: "{" and any number of '"key": <string, number or literal>,' pairs.
+# Lines with anything else before the key (nested values, broken JSON) go through the full parser.
+_WS = r"[ \t\n\r]*"
+_STRING = r'"(?:[^"\\\x00-\x1f]|\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4}))*"'
+_SCALAR = rf"(?:{_STRING}|-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?|true|false|null|NaN|-?Infinity)"
+ENVELOPE_PREFIX = re.compile(rf"\{{{_WS}(?:{_STRING}{_WS}:{_WS}{_SCALAR}{_WS},{_WS})*")
+# Prefixes already matched; a log only has a handful, such as '{"level":"info",'
+_known_prefixes = set()
+KNOWN_PREFIXES_LIMIT = 1024
+
+
+def loads(line: str):
+    """json.loads, through orjson when available. Lines orjson rejects are retried with json for identical results."""
+    if orjson is not None:
+        try:
+            return orjson.loads(line)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(line)
+
+
+def _valid_prefix(line: str, key_at: int) -> bool:
+    prefix = line[:key_at]
+    if prefix in _known_prefixes:
+        return True
+    if ENVELOPE_PREFIX.fullmatch(prefix) is None:
+        return False
+    if len(_known_prefixes) < KNOWN_PREFIXES_LIMIT:
+        _known_prefixes.add(prefix)
+    return True
+
+
+def extract_message(line: str):
+    """
+    Same result as json.loads(line).get("message", ""), including the
+    JSONDecodeError raised for lines that are not JSON. Without orjson, a line
+    whose envelope is only broken after the message field is not rejected.
+    """
+    if orjson is None and line.startswith("{") and (line.endswith("}\n") or line.endswith("}")):
+        key_at = line.find(MESSAGE_KEY)
+        # Only a top-level key that appears once: flat valid JSON before it, no duplicate after it
+        if key_at > 0 and _valid_prefix(line, key_at):
+            value_at = key_at + len(MESSAGE_KEY)
+            while line[value_at] == " ":
+                value_at += 1
+            if line[value_at] == '"':
+                try:
+                    message, end = scanstring(line, value_at + 1)
+                except ValueError:
+                    # Let the full parser raise its usual error for this line
+                    return loads(line).get("message", "")
+                while line[end] == " ":
+                    end += 1
+                if line[end] in ",}" and line.find(MESSAGE_STRING, end) == -1:
+                    return message
+
+    return loads(line).get("message", "")
@@ -9,7 +9,29 @@ import urllib.error
 import urllib.parse
 import urllib.request
 import zipfile
-from datetime import datetime
+from functools import partial
+
+from log_input import iter_text_lines
+from pipeline import (
+    finish_partitions,
+    finish_window_output,
+    in_window,
+    open_partitions,
+    parse_args,
+    plan_files,
+    process_files,
+    summary_path_for,
+    window_from_args,
+)
+from timestamps import (
+    ISO_MILLIS_OFFSET,
+    ISO_MILLIS_Z,
+    ISO_OFFSET,
+    ISO_Z,
+    SPACE,
+    SPACE_MILLIS,
+    TimestampParser,
+)
 
 
 HEADER = [
@@ -26,6 +48,9 @@ DEFAULT_MODULE_MAP_FILE = os.path.join("config", "oc4d", "module-map.csv")
 MODULE_ID_KEYS = ("moduleId", "moduleSlug", "module")
 MODULE_NAME_KEYS = ("moduleName", "moduleTitle", "moduleDisplayName", "name", "title")
 DYNAMIC_MODULE_SEGMENT = re.compile(r"^\d{10,}_[a-zA-Z0-9_-]+$")
+SESSION_TIMESTAMP_FORMATS = (ISO_MILLIS_Z, ISO_Z, ISO_MILLIS_OFFSET, ISO_OFFSET, SPACE_MILLIS, SPACE)
+# Returned by parse_session_line for sessions outside the schedule window
+OUTSIDE_WINDOW = []
 
 
 def normalize_lookup_key(value):
@@ -153,23 +178,14 @@ def build_module_name_index():
     return module_index
 
 
-def parse_timestamp(value):
+def parse_timestamp(value, timestamp_parser=None):
+    """(naive datetime, Access Date, Access Time) for a session line timestamp."""
     value = value.lstrip("\ufeff").strip()
-    formats = [
-        "%Y-%m-%dT%H:%M:%S.%fZ",
-        "%Y-%m-%dT%H:%M:%SZ",
-        "%Y-%m-%dT%H:%M:%S.%f%z",
-        "%Y-%m-%dT%H:%M:%S%z",
-        "%Y-%m-%d %H:%M:%S.%f",
-        "%Y-%m-%d %H:%M:%S",
-    ]
-    for fmt in formats:
-        try:
-            parsed = datetime.strptime(value, fmt)
-            return parsed.replace(tzinfo=None)
-        except ValueError:
-            continue
-    raise ValueError(f"Unsupported timestamp: {value}")
+    timestamp_parser = timestamp_parser or TimestampParser(SESSION_TIMESTAMP_FORMATS)
+    try:
+        return timestamp_parser.parse(value)
+    except ValueError:
+        raise ValueError(f"Unsupported timestamp: {value}") from None
 
 
 def normalize_ip(ip):
@@ -192,31 +208,19 @@ def resolve_module_viewed(fields, module_index):
     return "none"
 
 
-def iter_text_lines(file_path):
-    if file_path.endswith(".zip"):
-        with zipfile.ZipFile(file_path) as archive:
-            for name in archive.namelist():
-                if not name.endswith(".log"):
-                    continue
-                with archive.open(name) as handle:
-                    for raw_line in handle:
-                        yield raw_line.decode("utf-8", "replace")
-        return
-
-    with open(file_path, "r", encoding="utf-8", errors="replace") as handle:
-        yield from handle
-
-
-def parse_session_line(line, module_index):
+def parse_session_line(line, module_index, window=None, timestamp_parser=None):
     parts = line.lstrip("\ufeff").strip().split("\t")
     if len(parts) < 4:
         return None
 
     try:
-        timestamp = parse_timestamp(parts[0])
+        timestamp, access_date, access_time = parse_timestamp(parts[0], timestamp_parser)
     except ValueError:
         return None
 
+    if window and not in_window(window, timestamp.replace(microsecond=0)):
+        return OUTSIDE_WINDOW
+
     fields = {}
     for part in parts[1:]:
         if "=" in part:
@@ -230,25 +234,30 @@ def parse_session_line(line, module_index):
 
     return [
         user_id or "Guest",
-        timestamp.strftime("%H:%M:%S"),
+        access_time,
         normalize_ip(ip),
-        timestamp.strftime("%Y-%m-%d"),
+        access_date,
         resolve_module_viewed(fields, module_index),
         fields.get("durationSeconds", ""),
     ]
 
 
-def process_log_file(file_path, module_index):
-    log_data = []
+def process_log_file(file_path, module_index, window=None):
+    row_count = 0
     skipped_count = 0
+    outside_count = 0
+    timestamp_parser = TimestampParser(SESSION_TIMESTAMP_FORMATS)
     source_log = os.path.basename(file_path)
 
     try:
-        for line in iter_text_lines(file_path):
+        for line in iter_text_lines(file_path, errors="replace"):
             try:
-                row = parse_session_line(line, module_index)
-                if row:
-                    log_data.append(row)
+                row = parse_session_line(line, module_index, window, timestamp_parser)
+                if row is OUTSIDE_WINDOW:
+                    outside_count += 1
+                elif row:
+                    row_count += 1
+                    yield row
                 else:
                     skipped_count += 1
             except Exception as exc:
@@ -259,8 +268,10 @@ def process_log_file(file_path, module_index):
         skipped_count += 1
         print(f"Skipping file {source_log}: {exc}")
 
-    print(f"Processed {source_log}: {len(log_data)} rows, {skipped_count} skipped")
-    return log_data
+    if window:
+        print(f"Processed {source_log}: {row_count} rows, {skipped_count} skipped, {outside_count} outside window")
+    else:
+        print(f"Processed {source_log}: {row_count} rows, {skipped_count} skipped")
 
 
 def clear_csv_outputs(folder_path):
@@ -272,36 +283,6 @@ def clear_csv_outputs(folder_path):
                 os.remove(os.path.join(root, file))
 
 
-def save_processed_log_file(folder_path, file_path, log_data):
-    os.makedirs(folder_path, exist_ok=True)
-    base_name = os.path.basename(file_path)
-    if base_name.endswith(".zip"):
-        base_name = base_name[:-4]
-    processed_file_path = os.path.join(folder_path, f"{os.path.splitext(base_name)[0]}.csv")
-
-    with open(processed_file_path, "w", encoding="utf-8", newline="") as output_file:
-        writer = csv.writer(output_file)
-        writer.writerow(HEADER)
-        writer.writerows(log_data)
-
-
-def create_master_csv(folder_path):
-    master_csv_path = os.path.join(folder_path, "summary.csv")
-    os.makedirs(folder_path, exist_ok=True)
-
-    with open(master_csv_path, "w", encoding="utf-8", newline="") as master_csv:
-        writer = csv.writer(master_csv)
-        writer.writerow(HEADER)
-        for root, _, files in os.walk(folder_path):
-            for file in sorted(files):
-                if not file.endswith(".csv") or file == "summary.csv":
-                    continue
-                with open(os.path.join(root, file), "r", encoding="utf-8") as csv_file:
-                    reader = csv.reader(csv_file)
-                    next(reader, None)
-                    writer.writerows(reader)
-
-
 def is_processable(file_name):
     return (
         file_name == "modulegaze-sessions.log"
@@ -313,8 +294,9 @@ def is_processable(file_name):
     )
 
 
-if __name__ == "__main__":
-    selected_folder = sys.argv[1]
+def main(argv=None):
+    args = parse_args("Process ModuleGaze session logs into CSV.", argv)
+    selected_folder = args.folder
     folder_path = os.path.join("00_DATA", selected_folder)
     processed_folder_path = os.path.join("00_DATA", "00_PROCESSED", selected_folder)
 
@@ -328,6 +310,9 @@ if __name__ == "__main__":
             if is_processable(file):
                 files_to_process.append(os.path.join(root, file))
 
+    window = window_from_args(args)
+    files_to_process, _ = plan_files(files_to_process, window)
+
     clear_csv_outputs(processed_folder_path)
     module_index = build_module_name_index()
     if module_index:
@@ -339,10 +324,31 @@ if __name__ == "__main__":
     if total_files == 0:
         print(f"No ModuleGaze session log files found in {folder_path}.")
 
-    for index, file_path in enumerate(sorted(files_to_process), start=1):
-        log_data = process_log_file(file_path, module_index)
-        save_processed_log_file(processed_folder_path, file_path, log_data)
-        print(f"Processing files: {index}/{total_files}")
+    os.makedirs(processed_folder_path, exist_ok=True)
+    master_csv_path = summary_path_for(args, processed_folder_path)
+    shards = open_partitions(args, master_csv_path, HEADER)
+    total_rows = 0
+    with open(master_csv_path, "w", encoding="utf-8", newline="") as master_csv:
+        csv.writer(master_csv).writerow(HEADER)
+        results = process_files(
+            partial(process_log_file, module_index=module_index, window=window),
+            sorted(files_to_process),
+            HEADER,
+            master_csv,
+            processed_folder_path,
+            summary_only=args.summary_only,
+            workers=args.workers,
+            shards=shards,
+        )
+        for index, (_, row_count) in enumerate(results, start=1):
+            total_rows += row_count
+            print(f"Processing files: {index}/{total_files}")
+
+    finish_partitions(shards)
+    finish_window_output(args, master_csv_path, total_rows)
 
-    create_master_csv(processed_folder_path)
     print("Processing completed. All ModuleGaze session log files have been processed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Day-partitioned copies of summary.csv.
+
+Whenever a processor writes summary.csv it also writes summary/<Access Date>.csv,
+one shard per day with the CSV header, and summary/index.json:
+
+    {"version": 1, "summary_bytes": 1234567, "header": [...],
+     "shards": {"2025-01-28": {"file": "2025-01-28.csv", "rows": 812, "bytes": 96012,
+                               "hours": {"09": [40, 1210, 5630], "--": [...]}}}}
+
+An hour entry is [rows, first byte, end byte] inside the day's shard, so a
+reader that wants 09:00-09:59 seeks straight to that span. Shards keep the
+summary.csv row order; when a log is out of order an hour's span can hold rows
+of other hours, so readers still compare every row. Rows whose Access Time is
+missing or not HH:MM:SS are counted under "--", and rows whose Access Date is
+not YYYY-MM-DD go to other.csv; both are always read.
+
+filter_time_based.py and process_csv.py use the index only when it matches the
+summary file they were given (same size and header) and fall back to a full
+scan otherwise.
+"""
+
+import csv
+import io
+import json
+import os
+import re
+import shutil
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, Optional
+
+INDEX_VERSION = 1
+INDEX_NAME = "index.json"
+OTHER_SHARD = "other"
+UNKNOWN_HOUR = "--"
+# Shards stay open while rows arrive; past this many, all are closed and reopened on demand
+MAX_OPEN_SHARDS = 64
+READ_BLOCK_BYTES = 8 * 1024 * 1024
+
+DAY_PATTERN = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}")
+HOUR_PATTERN = re.compile(r"([01][0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9]")
+
+
+def column_index(header, column_name, fallback=None):
+    normalized = [value.strip().lower() for value in header]
+    try:
+        return normalized.index(column_name.strip().lower())
+    except ValueError:
+        return fallback
+
+
+def partition_dir(summary_path: str) -> str:
+    return os.path.join(os.path.dirname(summary_path), "summary")
+
+
+class _Shard:
+    """
+    One day's CSV. The file position is only read when the hour changes, which
+    in a chronological log is once an hour, not once a row.
+    """
+
+    __slots__ = ("path", "handle", "writer", "size", "rows", "hours", "hour", "span")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.handle = None
+        self.writer = None
+        self.size = 0
+        self.rows = 0
+        self.hours = {}
+        self.hour = None
+        self.span = None
+
+    def open(self, header: list):
+        self.handle = open(self.path, "a", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.handle)
+        if self.handle.tell() == 0:
+            self.writer.writerow(header)
+        return self.writer
+
+    def enter(self, hour: str) -> None:
+        position = self.handle.tell()
+        if self.span is not None:
+            self.span[2] = position
+        span = self.hours.get(hour)
+        if span is None:
+            span = self.hours[hour] = [0, position, position]
+        self.hour = hour
+        self.span = span
+
+    def close(self) -> None:
+        if self.handle is None:
+            return
+        self.size = self.handle.tell()
+        if self.span is not None:
+            self.span[2] = self.size
+        self.handle.close()
+        self.handle = None
+        self.writer = None
+        self.hour = None
+        self.span = None
+
+
+class DayShards:
+    """
+    csv.writer-compatible sink that splits summary rows into day shards.
+    close() writes the index once summary.csv itself has been closed.
+    """
+
+    def __init__(self, summary_path: str, header: list):
+        self.summary_path = summary_path
+        self.directory = partition_dir(summary_path)
+        self.header = list(header)
+        self.date_index = column_index(header, "Access Date", 1)
+        self.time_index = column_index(header, "Access Time")
+        self.shards = {}
+        self.open_count = 0
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory)
+
+    def _shard(self, day: str) -> _Shard:
+        key = day if DAY_PATTERN.fullmatch(day) else OTHER_SHARD
+        shard = self.shards.get(key)
+        if shard is None:
+            shard = self.shards[key] = _Shard(os.path.join(self.directory, f"{key}.csv"))
+        if day != key:
+            # Keep the raw value too, so the next row with it is a dict hit
+            self.shards[day] = shard
+        return shard
+
+    def _open(self, shard: _Shard):
+        if self.open_count >= MAX_OPEN_SHARDS:
+            for open_shard in set(self.shards.values()):
+                open_shard.close()
+            self.open_count = 0
+        self.open_count += 1
+        return shard.open(self.header)
+
+    def _hour(self, row: list) -> str:
+        if len(row) <= self.time_index:
+            return UNKNOWN_HOUR
+        value = row[self.time_index]
+        return value[:2] if HOUR_PATTERN.fullmatch(value) else UNKNOWN_HOUR
+
+    def writerow(self, row: list) -> None:
+        day = row[self.date_index] if len(row) > self.date_index else ""
+        shard = self.shards.get(day) or self._shard(day)
+        writer = shard.writer or self._open(shard)
+        if self.time_index is not None:
+            hour = self._hour(row)
+            if hour != shard.hour:
+                shard.enter(hour)
+            shard.span[0] += 1
+        writer.writerow(row)
+        shard.rows += 1
+
+    def close(self) -> None:
+        shards = {}
+        for key, shard in self.shards.items():
+            shard.close()
+            name = os.path.splitext(os.path.basename(shard.path))[0]
+            if key != name:
+                continue
+            entry = {"file": os.path.basename(shard.path), "rows": shard.rows, "bytes": shard.size}
+            if self.time_index is not None:
+                entry["hours"] = dict(sorted(shard.hours.items()))
+            shards[key] = entry
+
+        index = {
+            "version": INDEX_VERSION,
+            "summary_bytes": os.path.getsize(self.summary_path),
+            "header": self.header,
+            "shards": dict(sorted(shards.items())),
+        }
+        temp_path = os.path.join(self.directory, f".{INDEX_NAME}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump(index, handle, separators=(",", ":"))
+        os.replace(temp_path, os.path.join(self.directory, INDEX_NAME))
+
+
+class TeeWriter:
+    """Forwards writerow() to the summary writer and the day shards."""
+
+    def __init__(self, summary_writer, shards: DayShards):
+        self.summary_writer = summary_writer
+        self.shards = shards
+
+    def writerow(self, row: list) -> None:
+        self.summary_writer.writerow(row)
+        self.shards.writerow(row)
+
+
+def load_index(summary_path: str) -> Optional[dict]:
+    """
+    The partition index for summary_path, or None when there is none or it does
+    not describe this file (e.g. summary.csv was rewritten without shards).
+    A copy of summary.csv in the same folder, such as summary_copy.csv, matches.
+    """
+    directory = partition_dir(summary_path)
+    try:
+        with open(os.path.join(directory, INDEX_NAME), "r", encoding="utf-8") as handle:
+            index = json.load(handle)
+        if index.get("version") != INDEX_VERSION:
+            return None
+        if index["summary_bytes"] != os.path.getsize(summary_path):
+            return None
+        with open(summary_path, "r", encoding="utf-8", newline="") as handle:
+            header = next(csv.reader(handle), None)
+        if header != index["header"]:
+            return None
+        for entry in index["shards"].values():
+            if os.path.getsize(os.path.join(directory, entry["file"])) != entry["bytes"]:
+                return None
+    except (OSError, ValueError, KeyError, TypeError, AttributeError, UnicodeDecodeError):
+        return None
+    index["directory"] = directory
+    return index
+
+
+def _shard_day(key: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(key, "%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def _merge(spans: list) -> list:
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _read_spans(index: dict, entry: dict, spans: list) -> Iterator[str]:
+    """Lines in the given byte spans of a shard, read in blocks cut at newlines."""
+    with open(os.path.join(index["directory"], entry["file"]), "rb") as handle:
+        for start, end in spans:
+            handle.seek(start)
+            remaining = end - start
+            carry = b""
+            while remaining > 0:
+                block = handle.read(min(READ_BLOCK_BYTES, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                block = carry + block
+                cut = block.rfind(b"\n") + 1 if remaining > 0 else len(block)
+                carry = block[cut:]
+                yield from io.StringIO(block[:cut].decode("utf-8"), newline="")
+            if carry:
+                yield from io.StringIO(carry.decode("utf-8"), newline="")
+
+
+def _header_end(index: dict, entry: dict) -> int:
+    with open(os.path.join(index["directory"], entry["file"]), "rb") as handle:
+        return len(handle.readline())
+
+
+def window_lines(index: dict, start: datetime, end: datetime) -> Iterator[str]:
+    """
+    Summary lines (without the header) from the shards and hours that can hold
+    rows between start and end inclusive. Days come out in date order.
+    """
+    for key, entry in index["shards"].items():
+        day = _shard_day(key)
+        if day is not None and (day > end or day + timedelta(days=1) <= start):
+            continue
+        hours = entry.get("hours")
+        if day is None or hours is None:
+            yield from _read_spans(index, entry, [[_header_end(index, entry), entry["bytes"]]])
+            continue
+        spans = []
+        for hour, (_, span_start, span_end) in hours.items():
+            if hour != UNKNOWN_HOUR:
+                hour_start = day + timedelta(hours=int(hour))
+                if hour_start > end or hour_start + timedelta(hours=1) <= start:
+                    continue
+            spans.append([span_start, span_end])
+        yield from _read_spans(index, entry, _merge(spans))
+
+
+def day_lines(index: dict, keep_day: Callable[[datetime], bool]) -> Iterator[str]:
+    """Summary lines (without the header) from the shards whose day passes keep_day, plus other.csv."""
+    for key, entry in index["shards"].items():
+        day = _shard_day(key)
+        if day is not None and not keep_day(day):
+            continue
+        yield from _read_spans(index, entry, [[_header_end(index, entry), entry["bytes"]]])
@@ -0,0 +1,318 @@
+"""
+Shared output stage for the log processors.
+
+Rows are teed into the per-file CSV and the run-level summary.csv as they are
+produced, so summary.csv never has to be rebuilt by re-reading per-file CSVs.
+"""
+
+import argparse
+import csv
+import multiprocessing
+import os
+import re
+import shutil
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Iterator
+
+from log_checkpoints import CheckpointSession
+from log_input import log_name
+from partitions import DayShards, TeeWriter
+
+
+def parse_args(description: str, argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("folder", help="run folder under 00_DATA to process")
+    parser.add_argument(
+        "--summary-only",
+        action="store_true",
+        help="write summary.csv only and skip the per-file CSVs",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="number of log files to parse in parallel (0 = one per CPU core)",
+    )
+    parser.add_argument(
+        "--checkpoints",
+        action="store_true",
+        help="resume each log from the byte offset recorded by earlier runs",
+    )
+    parser.add_argument(
+        "--checkpoint-until",
+        metavar="YYYY-MM-DDTHH:MM:SS",
+        help="only advance checkpoints past lines at or before this time",
+    )
+    parser.add_argument(
+        "--window-start",
+        metavar="YYYY-MM-DDTHH:MM:SS",
+        help="drop lines before this time (WINDOW_START_DATE from time_window.py)",
+    )
+    parser.add_argument(
+        "--window-end",
+        metavar="YYYY-MM-DDTHH:MM:SS",
+        help="drop lines after this time (WINDOW_END_DATE from time_window.py)",
+    )
+    parser.add_argument(
+        "--window-output",
+        metavar="FILENAME",
+        help="write the in-window rows to this CSV instead of summary.csv; it is removed when no rows match",
+    )
+    return parser.parse_args(argv)
+
+
+def window_from_args(args: argparse.Namespace):
+    """(start, end) datetimes, or None when no window was given."""
+    if not args.window_start and not args.window_end:
+        return None
+    start = datetime.strptime(args.window_start, "%Y-%m-%dT%H:%M:%S") if args.window_start else datetime.min
+    end = datetime.strptime(args.window_end, "%Y-%m-%dT%H:%M:%S") if args.window_end else datetime.max
+    return start, end
+
+
+def in_window(window, moment: datetime) -> bool:
+    """
+    Same inclusive comparison as filter_time_based.py. Callers pass the row's
+    date at midnight when the CSV has no Access Time column, otherwise the
+    timestamp truncated to whole seconds.
+    """
+    return window is None or window[0] <= moment <= window[1]
+
+
+# Daily rotations: oc4d-2025-01-27.log, capecoastcastle-2025-01-27.log,
+# modulegaze-sessions-2025-01-27.log.zip (optionally .gz)
+FILE_NAME_DATE_PATTERN = re.compile(r"-(\d{4}-\d{2}-\d{2})(?:\.log)?(?:\.gz|\.zip)?$")
+# Rotation is by server-local day while some logs stamp lines in UTC
+FILE_DATE_SLACK = timedelta(days=1)
+
+
+def file_may_overlap(file_path: str, window) -> bool:
+    """
+    Whether file_path can hold lines inside window. Dated rotations are judged
+    by the date in their name; other files by mtime, which is the newest line
+    they can hold (the runner copies logs with cp -p to keep it).
+    """
+    start, end = window
+    match = FILE_NAME_DATE_PATTERN.search(os.path.basename(file_path))
+    if match:
+        try:
+            file_day = datetime.strptime(match.group(1), "%Y-%m-%d")
+        except ValueError:
+            return True
+        return file_day - FILE_DATE_SLACK <= end and file_day + timedelta(days=1) + FILE_DATE_SLACK > start
+    try:
+        modified = datetime.fromtimestamp(os.path.getmtime(file_path))
+    except (OSError, OverflowError, ValueError):
+        return True
+    return modified + FILE_DATE_SLACK >= start
+
+
+def plan_files(file_paths: list, window) -> tuple:
+    """Split file_paths into (files to parse, files skipped because they end before or start after window)."""
+    if window is None:
+        return list(file_paths), []
+    selected = []
+    skipped = []
+    for file_path in file_paths:
+        (selected if file_may_overlap(file_path, window) else skipped).append(file_path)
+    if skipped:
+        names = ", ".join(sorted(os.path.basename(file_path) for file_path in skipped))
+        print(f"Skipped {len(skipped)} file(s) outside the time window: {names}")
+    return selected, skipped
+
+
+def summary_path_for(args: argparse.Namespace, processed_folder: str) -> str:
+    return os.path.join(processed_folder, args.window_output or "summary.csv")
+
+
+def finish_window_output(args: argparse.Namespace, summary_path: str, row_count: int) -> None:
+    """Mirror filter_time_based.py: keep the window CSV only when rows matched."""
+    if not args.window_output:
+        return
+    if row_count:
+        print(f"\nFound {row_count} log entries for uploading in {args.window_output}")
+    else:
+        os.remove(summary_path)
+        print("\nNo log entries found for this period")
+
+
+def open_checkpoints(args: argparse.Namespace):
+    if not args.checkpoints:
+        return None
+    return CheckpointSession(until=args.checkpoint_until)
+
+
+def finish_checkpoints(checkpoints, processed_folder: str) -> None:
+    """Write the pending offsets; orchestrator.py commits them once the window CSV is built."""
+    if checkpoints is None:
+        return
+    checkpoints.write_pending(processed_folder)
+    print(f"\nCheckpoints: skipped {checkpoints.skipped_bytes} already-parsed bytes across {len(checkpoints.pending)} file(s).")
+
+
+def open_partitions(args: argparse.Namespace, summary_path: str, header: list):
+    """Day shards for summary.csv; window CSVs are already cut to one window and get none."""
+    if args.window_output:
+        return None
+    return DayShards(summary_path, header)
+
+
+def finish_partitions(shards) -> None:
+    """Write summary/index.json; call after summary.csv is closed so its size is final."""
+    if shards is None:
+        return
+    shards.close()
+
+
+def output_path_for(processed_folder: str, file_path: str) -> str:
+    """Per-file CSV path: the log name without its compression and log extensions."""
+    return os.path.join(processed_folder, f"{os.path.splitext(log_name(file_path))[0]}.csv")
+
+
+def write_rows(
+    rows: Iterable[list],
+    header: list,
+    summary_writer,
+    output_path: str = None,
+    write_empty: bool = True,
+) -> int:
+    """
+    Tee rows into summary_writer and, unless output_path is None, into a per-file CSV.
+    With write_empty=False the per-file CSV is only created once a row arrives.
+    """
+    row_count = 0
+    output_file = None
+    writer = None
+
+    try:
+        if output_path and write_empty:
+            output_file = open(output_path, "w", encoding="utf-8", newline="")
+            writer = csv.writer(output_file)
+            writer.writerow(header)
+
+        for row in rows:
+            if output_path and writer is None:
+                output_file = open(output_path, "w", encoding="utf-8", newline="")
+                writer = csv.writer(output_file)
+                writer.writerow(header)
+            if writer is not None:
+                writer.writerow(row)
+            summary_writer.writerow(row)
+            row_count += 1
+    finally:
+        if output_file:
+            output_file.close()
+
+    return row_count
+
+
+def resolve_workers(workers: int) -> int:
+    """0 means one worker per CPU core."""
+    if workers is None or workers < 1:
+        return os.cpu_count() or 1
+    return workers
+
+
+_WORKER_UA_CACHE = None
+
+
+def _init_worker(ua_cache) -> None:
+    global _WORKER_UA_CACHE
+    _WORKER_UA_CACHE = ua_cache
+    if ua_cache is not None:
+        ua_cache.learned = []
+
+
+def _rows_for(process_file, file_path: str, checkpoint):
+    if checkpoint is None:
+        return process_file(file_path)
+    return process_file(file_path, checkpoint=checkpoint)
+
+
+def _process_file_task(task: tuple) -> tuple:
+    """Worker side: write one log file's per-file CSV plus a summary part file."""
+    process_file, file_path, checkpoint, output_path, part_path, header, write_empty = task
+    with open(part_path, "w", encoding="utf-8", newline="") as part_file:
+        rows = _rows_for(process_file, file_path, checkpoint)
+        row_count = write_rows(rows, header, csv.writer(part_file), output_path, write_empty)
+    ua_delta = _WORKER_UA_CACHE.take_delta() if _WORKER_UA_CACHE is not None else None
+    return part_path, row_count, ua_delta, checkpoint
+
+
+def process_files(
+    process_file: Callable[[str], Iterable[list]],
+    file_paths: list,
+    header: list,
+    summary_file,
+    processed_folder: str,
+    summary_only: bool = False,
+    workers: int = 1,
+    ua_cache=None,
+    write_empty: bool = True,
+    checkpoints: CheckpointSession = None,
+    shards: DayShards = None,
+) -> Iterator[tuple]:
+    """
+    Run process_file over every log file and append the rows to summary_file.
+    Yields (file_path, row_count) in input order as each file completes.
+
+    With more than one worker, each file is parsed in its own process and
+    written to a part file; parts are appended to summary.csv in input order,
+    so the summary is identical to a sequential run.
+
+    With a CheckpointSession, process_file is called with checkpoint= and each
+    file's new resume offset is recorded once the file is done.
+
+    With DayShards, every summary row is also written to its day shard; in
+    parallel runs the shards are fed from each part file after it is appended.
+    """
+    workers = min(resolve_workers(workers), max(1, len(file_paths)))
+    summary_writer = csv.writer(summary_file)
+    if shards is not None:
+        summary_writer = TeeWriter(summary_writer, shards)
+
+    if workers == 1:
+        for file_path in file_paths:
+            checkpoint = checkpoints.open(file_path) if checkpoints else None
+            output_path = None if summary_only else output_path_for(processed_folder, file_path)
+            rows = _rows_for(process_file, file_path, checkpoint)
+            row_count = write_rows(rows, header, summary_writer, output_path, write_empty)
+            if checkpoints:
+                checkpoints.record(checkpoint)
+            yield file_path, row_count
+        return
+
+    tasks = [
+        (
+            process_file,
+            file_path,
+            checkpoints.open(file_path) if checkpoints else None,
+            None if summary_only else output_path_for(processed_folder, file_path),
+            os.path.join(processed_folder, f".summary-part-{index:05d}.csv"),
+            header,
+            write_empty,
+        )
+        for index, file_path in enumerate(file_paths)
+    ]
+
+    summary_file.flush()
+    # Forked workers share the processors' module-level user-agent cache with ua_cache; under
+    # spawn or forkserver (the default from Python 3.14) each would parse through its own copy
+    # and hand back empty deltas
+    context = multiprocessing.get_context("fork")
+    with context.Pool(workers, initializer=_init_worker, initargs=(ua_cache,)) as pool:
+        for file_path, (part_path, row_count, ua_delta, checkpoint) in zip(
+            file_paths, pool.imap(_process_file_task, tasks)
+        ):
+            with open(part_path, "r", encoding="utf-8", newline="") as part_file:
+                shutil.copyfileobj(part_file, summary_file)
+                if shards is not None:
+                    part_file.seek(0)
+                    for row in csv.reader(part_file):
+                        shards.writerow(row)
+            os.remove(part_path)
+            if ua_cache is not None and ua_delta is not None:
+                ua_cache.merge_delta(ua_delta)
+            if checkpoints:
+                checkpoints.record(checkpoint)
+            yield file_path, row_count
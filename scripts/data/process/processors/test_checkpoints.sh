@@ -0,0 +1,130 @@
+#!/bin/bash
+# Checks: log_checkpoints.py resumes an unchanged or appended log, follows a rename, and parses from the start
+# after truncation or when a different log starts with the same bytes.
+set -euo pipefail
+
+ROOT="$(CDPATH= cd -- "$(dirname -- "$0")/../../../.." >/dev/null 2>&1 && pwd)"
+cd "$ROOT/scripts/data/process/processors"
+
+ts() { date '+%H:%M:%S'; }
+log() { echo "[$(ts)] $*"; }
+
+WORK_DIR="$(mktemp -d)"
+trap 'rm -rf "$WORK_DIR"' EXIT
+export WORK_DIR
+
+log "=== Checkpoints: unchanged, rotated, truncated and look-alike logs ==="
+rc=0
+python3 - <<'PY' || rc=$?
+import gzip
+import os
+import shutil
+import sys
+
+from log_checkpoints import CheckpointSession, commit_pending, read_lines, record_sources
+
+WORK_DIR = os.environ["WORK_DIR"]
+STORE = os.path.join(WORK_DIR, "store.json")
+SOURCE_DIR = os.path.join(WORK_DIR, "var_log")
+os.makedirs(SOURCE_DIR)
+
+passed = 0
+failed = 0
+runs = 0
+
+
+def check(label, got, want):
+    global passed, failed
+    if got == want:
+        passed += 1
+    else:
+        print(f"FAIL: {label} expected {want!r} got {got!r}")
+        failed += 1
+
+
+def write(name, text, mode="w"):
+    with open(os.path.join(SOURCE_DIR, name), mode, encoding="utf-8") as handle:
+        handle.write(text)
+
+
+def lines(first, count):
+    return "".join(f"line {n}\n" for n in range(first, first + count))
+
+
+def run(*names):
+    """Copy the logs into a fresh run folder as the runner does, parse them and commit; returns {name: lines read}."""
+    global runs
+    runs += 1
+    folder = os.path.join(WORK_DIR, f"run_{runs}")
+    os.makedirs(folder)
+    inodes = {}
+    for name in names:
+        source = os.path.join(SOURCE_DIR, name)
+        inodes[name] = os.stat(source).st_ino
+        shutil.copy2(source, folder)
+    record_sources(folder, inodes)
+
+    session = CheckpointSession(STORE)
+    read = {}
+    for name in names:
+        checkpoint = session.open(os.path.join(folder, name))
+        read[name] = [line.strip() for line in read_lines(os.path.join(folder, name), checkpoint)]
+        session.record(checkpoint)
+    commit_pending(session.write_pending(folder), STORE)
+    return read
+
+
+write("access.log", lines(1, 3))
+check("first run parses everything", run("access.log")["access.log"], ["line 1", "line 2", "line 3"])
+check("unchanged log reads nothing new", run("access.log")["access.log"], [])
+
+write("access.log", lines(4, 2), "a")
+check("appended lines only", run("access.log")["access.log"], ["line 4", "line 5"])
+
+# Rotation by rename keeps the inode: the old file resumes, the new one starts at zero
+os.rename(os.path.join(SOURCE_DIR, "access.log"), os.path.join(SOURCE_DIR, "access.log.1"))
+write("access.log.1", lines(6, 1), "a")
+write("access.log", lines(100, 2))
+read = run("access.log", "access.log.1")
+check("rotated log resumes after its last line", read["access.log.1"], ["line 6"])
+check("new log after rotation parsed from the start", read["access.log"], ["line 100", "line 101"])
+
+# Truncated in place (copytruncate): same inode, offset past the new size
+with open(os.path.join(SOURCE_DIR, "access.log"), "r+", encoding="utf-8") as handle:
+    handle.truncate(0)
+write("access.log", lines(200, 1), "a")
+check("truncated log parsed from the start", run("access.log")["access.log"], ["line 200"])
+
+# Truncated and refilled past the old offset with different bytes: the head no longer matches
+with open(os.path.join(SOURCE_DIR, "access.log"), "w", encoding="utf-8") as handle:
+    handle.write(lines(300, 5))
+check("rewritten log parsed from the start", run("access.log")["access.log"], [f"line {n}" for n in range(300, 305)])
+
+# A different log that starts with the same bytes is parsed from the start
+write("oc4d-a.log", "header\n" + lines(1, 4))
+run("oc4d-a.log")
+write("oc4d-b.log", "header\n" + lines(1, 4) + lines(5, 1))
+check("look-alike log parsed from the start", len(run("oc4d-b.log")["oc4d-b.log"]), 6)
+
+# Empty logs no longer share one entry
+write("empty-a.log", "")
+write("empty-b.log", "")
+run("empty-a.log", "empty-b.log")
+write("empty-b.log", lines(1, 2), "a")
+check("empty log that grows is read from its own offset", run("empty-a.log", "empty-b.log")["empty-b.log"], ["line 1", "line 2"])
+
+# A gzip rotation that was fully parsed resumes at its end
+with gzip.open(os.path.join(SOURCE_DIR, "access.log.2.gz"), "wt", encoding="utf-8") as handle:
+    handle.write(lines(1, 3))
+check("gzip rotation parsed once", len(run("access.log.2.gz")["access.log.2.gz"]), 3)
+check("gzip rotation resumes at its end", run("access.log.2.gz")["access.log.2.gz"], [])
+
+print(f"{passed} passed, {failed} failed")
+sys.exit(1 if failed else 0)
+PY
+
+if (( rc != 0 )); then
+  log "=== Results: checkpoint checks FAILED ==="
+  exit 1
+fi
+log "=== Results: checkpoint checks passed ==="
@@ -0,0 +1,107 @@
+#!/bin/bash
+# Fixture checks: log.py, logv2.py, log-v6.py, dhub.py and castle.py (log_dialects.py) against the
+# CSVs the standalone processors wrote before the dialect engine. Each dialect has a small log set in
+# fixtures/<dialect>/logs and the expected per-file CSVs, summary.csv and error log in fixtures/<dialect>/expected.
+# --workers runs over several copies of the logs must write the same files and learn the same user agents.
+set -euo pipefail
+
+ROOT="$(CDPATH= cd -- "$(dirname -- "$0")/../../../.." >/dev/null 2>&1 && pwd)"
+PROCESSORS="$ROOT/scripts/data/process/processors"
+FIXTURES="$PROCESSORS/fixtures"
+
+ts() { date '+%H:%M:%S'; }
+log() { echo "[$(ts)] $*"; }
+
+pass=0
+fail=0
+
+WORK_DIR="$(mktemp -d)"
+trap 'rm -rf "$WORK_DIR"' EXIT
+
+declare -A SCRIPTS=(
+  [apache-v4]=log.py
+  [oc4d-v5]=logv2.py
+  [oc4d-v6]=log-v6.py
+  [dhub]=dhub.py
+  [cape-coast]=castle.py
+)
+DIALECT_ORDER=(apache-v4 oc4d-v5 oc4d-v6 dhub cape-coast)
+
+# Run a dialect's entry script over its fixture logs (copies of each, named copy<N>-<log>, when
+# copies > 1); prints the run folder, which also holds the user-agent snapshot
+run_dialect() {
+  local dialect="$1"
+  local copies="$2"
+  shift 2
+  local run_dir="$WORK_DIR/$dialect.$RANDOM"
+  local log_file n
+
+  mkdir -p "$run_dir/00_DATA/fixture_run"
+  for log_file in "$FIXTURES/$dialect/logs"/*; do
+    if (( copies == 1 )); then
+      cp "$log_file" "$run_dir/00_DATA/fixture_run/"
+      continue
+    fi
+    for n in $(seq "$copies"); do
+      cp "$log_file" "$run_dir/00_DATA/fixture_run/copy$n-$(basename "$log_file")"
+    done
+  done
+  (cd "$run_dir" && CDN_AUTO_UA_CACHE_FILE="$run_dir/user-agents.json" \
+    python3 "$PROCESSORS/${SCRIPTS[$dialect]}" fixture_run "$@" > "$run_dir/stdout" 2>&1) || {
+    log "FAIL: $dialect exited non-zero"
+    cat "$run_dir/stdout"
+  }
+  printf '%s\n' "$run_dir"
+}
+
+assert_same() {
+  local got="$1"
+  local want="$2"
+  local label="$3"
+  if [[ -f "$got" ]] && cmp -s "$got" "$want"; then
+    log "PASS: $label"
+    pass=$((pass + 1))
+  else
+    log "FAIL: $label differs from $want"
+    diff "$want" "$got" | head -n 10 || true
+    fail=$((fail + 1))
+  fi
+}
+
+for dialect in "${DIALECT_ORDER[@]}"; do
+  log "=== Dialect $dialect: ${SCRIPTS[$dialect]} matches the legacy output ==="
+  processed="$(run_dialect "$dialect" 1)/00_DATA/00_PROCESSED/fixture_run"
+  for expected in "$FIXTURES/$dialect/expected"/*; do
+    assert_same "$processed/$(basename "$expected")" "$expected" "$dialect $(basename "$expected")"
+  done
+done
+
+# Snapshot entries as sorted "ua<TAB>os<TAB>browser" lines
+ua_snapshot() {
+  python3 -c 'import json, sys; [print("\t".join(entry)) for entry in sorted(json.load(open(sys.argv[1]))["entries"])]' "$1"
+}
+
+for dialect in "${DIALECT_ORDER[@]}"; do
+  log "=== Dialect $dialect: --workers 3 matches a sequential run ==="
+  sequential="$(run_dialect "$dialect" 3)"
+  parallel="$(run_dialect "$dialect" 3 --workers 3)"
+  for output in "$sequential/00_DATA/00_PROCESSED/fixture_run"/*; do
+    [[ -f "$output" ]] || continue
+    if [[ "$(basename "$output")" == error_log.txt ]]; then
+      # Workers append to the shared error log as they go, so only the lines are compared
+      sort "$output" > "$sequential/errors.sorted"
+      sort "$parallel/00_DATA/00_PROCESSED/fixture_run/error_log.txt" > "$parallel/errors.sorted"
+      assert_same "$parallel/errors.sorted" "$sequential/errors.sorted" "$dialect --workers 3 error_log.txt lines"
+      continue
+    fi
+    assert_same "$parallel/00_DATA/00_PROCESSED/fixture_run/$(basename "$output")" "$output" "$dialect --workers 3 $(basename "$output")"
+  done
+  ua_snapshot "$sequential/user-agents.json" > "$sequential/ua.tsv"
+  ua_snapshot "$parallel/user-agents.json" > "$parallel/ua.tsv"
+  assert_same "$parallel/ua.tsv" "$sequential/ua.tsv" "$dialect --workers 3 user-agent snapshot"
+done
+
+log "=== Results: $pass passed, $fail failed ==="
+if (( fail > 0 )); then
+  exit 1
+fi
@@ -0,0 +1,179 @@
+#!/bin/bash
+# Parity checks: log_json.extract_message() against json.loads(line).get("message", "") for escapes, unicode,
+# other envelope shapes and malformed lines, on the scanstring path and, when orjson is installed, the orjson path.
+set -euo pipefail
+
+ROOT="$(CDPATH= cd -- "$(dirname -- "$0")/../../../.." >/dev/null 2>&1 && pwd)"
+cd "$ROOT/scripts/data/process/processors"
+
+ts() { date '+%H:%M:%S'; }
+log() { echo "[$(ts)] $*"; }
+
+log "=== JSON envelopes: extract_message matches json.loads ==="
+rc=0
+python3 - <<'PY' || rc=$?
+import json
+import random
+import sys
+
+import log_json
+
+passed = 0
+failed = 0
+
+
+def outcome(call, line):
+    """("ok", message) or ("error", ValueError / AttributeError for a line that is JSON but not an object)."""
+    try:
+        return ("ok", call(line))
+    except ValueError:
+        return ("error", "ValueError")
+    except AttributeError:
+        return ("error", "AttributeError")
+
+
+def reference(line):
+    return outcome(lambda text: json.loads(text).get("message", ""), line)
+
+
+def extracted(line):
+    return outcome(log_json.extract_message, line)
+
+
+def check(label, line):
+    global passed, failed
+    want = reference(line)
+    got = extracted(line)
+    # Keep type and repr apart so 1 and True or "1" and 1 never compare equal
+    if (want[0], type(want[1]), repr(want[1])) == (got[0], type(got[1]), repr(got[1])):
+        passed += 1
+    else:
+        print(f"FAIL: {label}: {line!r} expected {want!r} got {got!r}")
+        failed += 1
+
+
+ACCESS = '10.0.0.1 - - [28/Jan/2025:09:05:07 +0000] "GET /modules/en-khan/ HTTP/1.1" 200 512 "-" "Mozilla/5.0"'
+CASES = {
+    "plain": json.dumps({"level": "info", "message": ACCESS, "timestamp": "2025-01-28T09:05:07.123Z"}),
+    "compact": json.dumps({"level": "info", "message": ACCESS}, separators=(",", ":")),
+    "message last": '{"level":"info","message":"GET /"}',
+    "message first": '{"message":"GET /","level":"info"}',
+    "spaces around value": '{"level":"info", "message":   "GET /"   ,"x":1}',
+    "trailing newline": '{"level":"info","message":"GET /"}\n',
+    "escaped quotes": r'{"level":"info","message":"say \"hi\" to \"GET /\""}',
+    "escaped backslashes": r'{"level":"info","message":"C:\\logs\\ \\\" end"}',
+    "escaped solidus": r'{"level":"info","message":"\/modules\/en-khan\/"}',
+    "control escapes": r'{"level":"info","message":"a\nb\tc\rd\be\ff"}',
+    "unicode escapes": r'{"level":"info","message":"caf\u00e9 \u0041\u4e2d"}',
+    "surrogate pair": r'{"level":"info","message":"\ud83d\ude00 smile"}',
+    "lone surrogate": r'{"level":"info","message":"\ud83d alone"}',
+    "raw unicode": '{"level":"info","message":"café – 中文 😀"}',
+    "ensure_ascii dump": json.dumps({"level": "info", "message": "é\u2028😀\x00"}),
+    "raw utf-8 dump": json.dumps({"level": "info", "message": "é\u2028😀"}, ensure_ascii=False),
+    "empty message": '{"level":"info","message":""}',
+    "no message": '{"level":"info","msg":"GET /"}',
+    "message in a value": '{"level":"info","note":"\\"message\\": \\"fake\\"","message":"real"}',
+    "key text inside message": '{"level":"info","message":"\\"message\\":\\"inner\\""}',
+    "nested before": '{"meta":{"message":"inner"},"message":"outer"}',
+    "array before": '{"tags":["message"],"message":"outer"}',
+    "nested after": '{"message":"outer","meta":{"message":"inner"}}',
+    "nested only": '{"meta":{"message":"inner"}}',
+    "duplicate key": '{"message":"first","level":"info","message":"second"}',
+    "spaced duplicate key": '{"message":"first","level":"info","message" : "second"}',
+    "spaced key before": '{"message" : "first","message":"second"}',
+    "message as a value": '{"message":"first","level":"message"}',
+    "literals before": '{"a":1,"b":-2.5e3,"c":true,"d":null,"e":NaN,"f":-Infinity,"message":"GET /"}',
+    "escapes before": r'{"a\"b":"c\u00e9\n","message":"GET /"}',
+    "braces in a string before": '{"a":"{[","message":"GET /"}',
+    "number message": '{"level":"info","message":5}',
+    "null message": '{"level":"info","message":null}',
+    "bool message": '{"level":"info","message":true}',
+    "object message": '{"level":"info","message":{"text":"GET /"}}',
+    "array message": '{"level":"info","message":["GET /"]}',
+    "raw control character": '{"level":"info","message":"tab\there"}',
+    "bad escape": r'{"level":"info","message":"bad \x escape"}',
+    "short unicode escape": r'{"level":"info","message":"\u12"}',
+    "unterminated message": '{"level":"info","message":"GET /',
+    "unterminated envelope": '{"level":"info","message":"GET /"',
+    "missing value": '{"level":"info","message":}',
+    "single quotes": "{'level':'info','message':'GET /'}",
+    "broken before message": '{"level":info,"message":"GET /"}',
+    "missing comma before": '{"level":"info" "message":"GET /"}',
+    "bad number before": '{"level":01,"message":"GET /"}',
+    "bad escape before": r'{"level":"\q","message":"GET /"}',
+    "control character before": '{"level":"a\tb","message":"GET /"}',
+    "unquoted key before": '{level:"info","message":"GET /"}',
+    "trailing garbage": '{"level":"info","message":"GET /"} x',
+    "not json": ACCESS,
+    "empty line": "",
+    "bare brace": "{",
+    "array line": '["message"]',
+}
+
+# Without orjson, a line broken only after the message field still gives the message (see extract_message)
+TOLERATED = {
+    "broken after message": ('{"level":"info","message":"GET /",oops}', "GET /"),
+}
+
+rng = random.Random(2025)
+PIECES = ['"', "\\", "/", "\n", "\t", "\x00", "\x7f", "é", "中", "😀", "\u2028", "\ud83d", "{", "}", "[", ",", ":", " ", "message", "a", "0"]
+
+
+def random_text():
+    return "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 12)))
+
+
+def random_line():
+    envelope = {}
+    for _ in range(rng.randint(0, 3)):
+        envelope[random_text()] = random_text()
+    if rng.random() < 0.9:
+        envelope["message"] = rng.choice([random_text(), random_text(), rng.randint(-5, 5), None, [random_text()], {"message": random_text()}])
+    for _ in range(rng.randint(0, 3)):
+        envelope[random_text()] = rng.choice([random_text(), {"message": random_text()}, [1, random_text()]])
+    separators = rng.choice([(",", ":"), (", ", ": "), (",", ": ")])
+    return json.dumps(envelope, ensure_ascii=rng.random() < 0.5, separators=separators) + rng.choice(["", "\n"])
+
+
+def mutate(line):
+    """
+    Truncate the line, or break it before its message value. A cut that ends on "}" or a
+    change inside the value could leave a line broken only after the message (TOLERATED).
+    """
+    if rng.random() < 0.5 or '"message":' not in line:
+        return line[:rng.randint(0, len(line))].rstrip("}\n")
+    position = rng.randint(0, line.index('"message":') + len('"message":') - 1)
+    return line[:position] + rng.choice(PIECES) + line[position + rng.randint(0, 2):]
+
+
+paths = [("scanstring", None)]
+if log_json.orjson is not None:
+    paths.append(("orjson", log_json.orjson))
+
+for path, module in paths:
+    log_json.orjson = module
+    for label, line in CASES.items():
+        check(f"{path} {label}", line)
+    for label, (line, message) in TOLERATED.items():
+        want = ("ok", message) if module is None else reference(line)
+        got = extracted(line)
+        if got == want:
+            passed += 1
+        else:
+            print(f"FAIL: {path} {label}: {line!r} got {got!r}")
+            failed += 1
+    for number in range(3000):
+        line = random_line()
+        check(f"{path} random line {number}", line)
+        check(f"{path} broken line {number}", mutate(line))
+    print(f"{path} path checked")
+
+print(f"{passed} passed, {failed} failed")
+sys.exit(1 if failed else 0)
+PY
+
+if (( rc != 0 )); then
+  log "=== Results: JSON envelope parity FAILED ==="
+  exit 1
+fi
+log "=== Results: JSON envelope parity passed ==="
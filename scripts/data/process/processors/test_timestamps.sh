@@ -0,0 +1,144 @@
+#!/bin/bash
+# Parity checks: timestamps.TimestampParser against the datetime.strptime code it replaced.
+set -euo pipefail
+
+ROOT="$(CDPATH= cd -- "$(dirname -- "$0")/../../../.." >/dev/null 2>&1 && pwd)"
+cd "$ROOT/scripts/data/process/processors"
+
+ts() { date '+%H:%M:%S'; }
+log() { echo "[$(ts)] $*"; }
+
+log "=== Timestamp parity: every format the processors accept ==="
+rc=0
+python3 - <<'PY' || rc=$?
+import sys
+from datetime import datetime
+
+from timestamps import (
+    APACHE,
+    ISO_MILLIS_OFFSET,
+    ISO_MILLIS_Z,
+    ISO_OFFSET,
+    ISO_Z,
+    SPACE,
+    SPACE_MILLIS,
+    TimestampParser,
+    oc4d_format,
+)
+
+SESSION_FORMATS = (ISO_MILLIS_Z, ISO_Z, ISO_MILLIS_OFFSET, ISO_OFFSET, SPACE_MILLIS, SPACE)
+
+passed = 0
+failed = 0
+
+
+def strptime_result(value, fmt):
+    parsed = datetime.strptime(value, fmt).replace(tzinfo=None)
+    return parsed, parsed.strftime("%Y-%m-%d"), parsed.strftime("%H:%M:%S")
+
+
+def legacy_oc4d(value):
+    # logv2.py / dhub.py / log-v6.py before timestamps.py
+    if value.endswith("Z") and "T" in value:
+        return strptime_result(value, ISO_MILLIS_Z)
+    return strptime_result(value, SPACE_MILLIS)
+
+
+def legacy_session(value):
+    # modulegaze.parse_timestamp before timestamps.py
+    for fmt in SESSION_FORMATS:
+        try:
+            return strptime_result(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(value)
+
+
+def outcome(parse, value):
+    try:
+        return parse(value)
+    except ValueError:
+        return "ValueError"
+
+
+def check(label, legacy, parser, values):
+    global passed, failed
+    for value in values:
+        # Parse twice so the per-day cache and format reordering are exercised
+        for attempt in (1, 2):
+            want = outcome(legacy, value)
+            got = outcome(parser.parse, value)
+            if want != got:
+                print(f"FAIL: {label} {value!r} (pass {attempt}) expected {want!r} got {got!r}")
+                failed += 1
+            else:
+                passed += 1
+
+
+DATES = ["2025-01-28", "2024-02-29", "2023-02-29", "2025-13-01", "2025-00-10", "2025-04-31", "0999-01-01", "2025-1-28"]
+CLOCKS = ["00:00:00", "23:59:59", "12:34:56", "24:00:00", "12:60:00", "12:00:60", "12:00:61", "9:05:07", "12:5:07"]
+FRACTIONS = ["", ".7", ".761", ".123456", ".1234567", "."]
+OFFSETS = ["Z", "z", "+0000", "+05:30", "-0800", "-23:59", "+24:00", "+01:00:30", "+0530x", "+05:3"]
+
+iso_values = []
+for day in DATES:
+    for clock in CLOCKS:
+        for fraction in FRACTIONS:
+            iso_values.append(f"{day}T{clock}{fraction}Z")
+            iso_values.append(f"{day} {clock}{fraction}")
+            for offset in OFFSETS:
+                iso_values.append(f"{day}T{clock}{fraction}{offset}")
+iso_values += [
+    "2025-01-28t10:00:00.000z",
+    "2025-01-28T10:00:00.000z",
+    "2025-01-28  10:00:00.000",
+    "2025-01-28 10:00:00.000 ",
+    " 2025-01-28 10:00:00.000",
+    "٢٠٢٥-01-28T10:00:00.000Z",
+    "2025-01-28T10:00:00.000ZZ",
+    "",
+    "garbage",
+]
+
+apache_values = [
+    "27/Jan/2025:10:11:12 +0000",
+    "27/Jan/2025:23:59:59 -0500",
+    "01/Dec/1999:00:00:00 +0530",
+    "29/Feb/2024:12:00:00 +0000",
+    "29/Feb/2023:12:00:00 +0000",
+    "31/Apr/2025:12:00:00 +0000",
+    "00/Jan/2025:12:00:00 +0000",
+    "7/Jan/2025:10:11:12 +0000",
+    "27/jan/2025:10:11:12 +0000",
+    "27/JAN/2025:10:11:12 +0000",
+    "27/Foo/2025:10:11:12 +0000",
+    "27/Jan/2025:24:00:00 +0000",
+    "27/Jan/2025:10:11:12 Z",
+    "27/Jan/2025:10:11:12 +05:30",
+    "27/Jan/2025:10:11:12 +2400",
+    "27/Jan/2025:10:11:12  +0000",
+    "27/Jan/0999:10:11:12 +0000",
+    "27/Jan/2025:10:11:12",
+]
+
+check("oc4d", legacy_oc4d, TimestampParser((ISO_MILLIS_Z, SPACE_MILLIS), pick=oc4d_format), iso_values)
+check("castle", lambda value: strptime_result(value, ISO_MILLIS_Z), TimestampParser((ISO_MILLIS_Z,)), iso_values)
+check("modulegaze", legacy_session, TimestampParser(SESSION_FORMATS), iso_values)
+check("apache", lambda value: strptime_result(value, APACHE), TimestampParser((APACHE,)), apache_values)
+
+parser = TimestampParser((ISO_MILLIS_Z,))
+if parser.day_start("2025-01-28") == datetime(2025, 1, 28):
+    passed += 1
+else:
+    print("FAIL: day_start is not midnight")
+    failed += 1
+
+print(f"{passed} passed, {failed} failed")
+sys.exit(1 if failed else 0)
+PY
+
+if (( rc != 0 )); then
+  log "=== Results: timestamp parity FAILED ==="
+  exit 1
+fi
+log "=== Results: timestamp parity passed ==="
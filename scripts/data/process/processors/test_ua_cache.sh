@@ -0,0 +1,171 @@
+#!/bin/bash
+# Checks: ua_cache.py evicts the least recently used user agent, round-trips its snapshot, and starts
+# empty (then saves a good snapshot) after a corrupt, stale or partial one.
+set -euo pipefail
+
+ROOT="$(CDPATH= cd -- "$(dirname -- "$0")/../../../.." >/dev/null 2>&1 && pwd)"
+cd "$ROOT/scripts/data/process/processors"
+
+ts() { date '+%H:%M:%S'; }
+log() { echo "[$(ts)] $*"; }
+
+WORK_DIR="$(mktemp -d)"
+trap 'rm -rf "$WORK_DIR"' EXIT
+export WORK_DIR
+
+log "=== User-agent cache: eviction, snapshot round trip and corrupt snapshots ==="
+rc=0
+python3 - <<'PY' || rc=$?
+import contextlib
+import io
+import json
+import os
+import sys
+
+from user_agents import parse
+
+import ua_cache
+from ua_cache import UserAgentCache
+
+WORK_DIR = os.environ["WORK_DIR"]
+os.environ.pop("CDN_AUTO_UA_CACHE_FILE", None)
+os.environ.pop("CDN_AUTO_UA_CACHE_SIZE", None)
+
+passed = 0
+failed = 0
+
+
+def check(label, got, want):
+    global passed, failed
+    if got == want:
+        passed += 1
+    else:
+        print(f"FAIL: {label} expected {want!r} got {got!r}")
+        failed += 1
+
+
+AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0",
+    "curl/8.4.0",
+    "",
+]
+
+
+def families(ua_string):
+    user_agent = parse(ua_string)
+    return (user_agent.os.family, user_agent.browser.family)
+
+
+def snapshot_path(name):
+    return os.path.join(WORK_DIR, name, "user-agents.json")
+
+
+def load(path, max_entries=None):
+    """Load a fresh cache from path; returns (cache, entries loaded, printed output)."""
+    cache = UserAgentCache(path, max_entries)
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        count = cache.load()
+    return cache, count, out.getvalue()
+
+
+# Every lookup gives what user_agents.parse() gives; repeats are hits
+cache = UserAgentCache(snapshot_path("parse"))
+check("classify matches parse()", [cache.classify(agent) for agent in AGENTS + AGENTS], [families(agent) for agent in AGENTS + AGENTS])
+check("repeats are hits", (cache.hits, cache.misses), (len(AGENTS), len(AGENTS)))
+
+# Least recently used goes first: touching the oldest entry keeps it
+cache = UserAgentCache(snapshot_path("lru"), max_entries=3)
+for agent in AGENTS[:3]:
+    cache.classify(agent)
+cache.classify(AGENTS[0])
+cache.classify(AGENTS[3])
+check("evicts the least recently used", list(cache.entries), [AGENTS[2], AGENTS[0], AGENTS[3]])
+check("evicted agent is a miss again", (cache.classify(AGENTS[1]), cache.misses), (families(AGENTS[1]), 5))
+check("size stays bounded", len(cache.entries), 3)
+
+os.environ["CDN_AUTO_UA_CACHE_SIZE"] = "2"
+check("CDN_AUTO_UA_CACHE_SIZE sets the bound", UserAgentCache(snapshot_path("env")).max_entries, 2)
+os.environ["CDN_AUTO_UA_CACHE_SIZE"] = "lots"
+check("unreadable CDN_AUTO_UA_CACHE_SIZE falls back", UserAgentCache(snapshot_path("env")).max_entries, ua_cache.DEFAULT_MAX_ENTRIES)
+os.environ.pop("CDN_AUTO_UA_CACHE_SIZE")
+
+# Snapshot round trip keeps the entries in recency order
+cache = UserAgentCache(snapshot_path("round_trip"))
+for agent in AGENTS:
+    cache.classify(agent)
+cache.classify(AGENTS[0])
+cache.save()
+check("save leaves no temp file", os.listdir(os.path.dirname(cache.path)), ["user-agents.json"])
+loaded, count, _ = load(cache.path)
+check("round trip entry count", count, len(AGENTS))
+check("round trip entries and order", list(loaded.entries.items()), list(cache.entries.items()))
+check("loaded entries are hits", (loaded.classify(AGENTS[3]), loaded.hits, loaded.misses), (families(AGENTS[3]), 1, 0))
+
+# A smaller bound keeps the most recently used entries of a larger snapshot
+loaded, count, _ = load(cache.path, max_entries=2)
+check("load trims to the bound", list(loaded.entries), list(cache.entries)[-2:])
+
+# Corrupt, stale or foreign snapshots start an empty cache, and the next save replaces them
+corrupt_cases = {
+    "truncated": '{"version": 1, "parser": "x", "entries": [["a", "b"',
+    "binary": "\x00\x01\x02",
+    "not an object": "[1, 2, 3]",
+    "old version": json.dumps({"version": ua_cache.SNAPSHOT_VERSION + 1, "parser": ua_cache.parser_version(), "entries": [["a", "b", "c"]]}),
+    "other parser": json.dumps({"version": ua_cache.SNAPSHOT_VERSION, "parser": "user-agents 0.0", "entries": [["a", "b", "c"]]}),
+}
+for label, text in corrupt_cases.items():
+    path = snapshot_path(f"corrupt_{label.replace(' ', '_')}")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write(text)
+    loaded, count, _ = load(path)
+    check(f"{label} snapshot ignored", (count, len(loaded.entries)), (0, 0))
+    loaded.classify(AGENTS[0])
+    loaded.save()
+    check(f"{label} snapshot replaced on save", list(load(path)[0].entries), [AGENTS[0]])
+
+with open(snapshot_path("corrupt_truncated"), "w", encoding="utf-8") as handle:
+    handle.write("{")
+_, _, output = load(snapshot_path("corrupt_truncated"))
+check("corrupt snapshot reported", output.startswith("User-agent cache snapshot ignored"), True)
+
+# Malformed entries are skipped, good ones kept
+path = snapshot_path("partial")
+os.makedirs(os.path.dirname(path))
+with open(path, "w", encoding="utf-8") as handle:
+    json.dump({
+        "version": ua_cache.SNAPSHOT_VERSION,
+        "parser": ua_cache.parser_version(),
+        "entries": [["ok", "Linux", "Firefox"], ["short", "Linux"], ["number", 1, "Chrome"], "text", None, ["ok2", "iOS", "Safari"]],
+    }, handle)
+loaded, count, _ = load(path)
+check("partial snapshot keeps valid entries", dict(loaded.entries), {"ok": ("Linux", "Firefox"), "ok2": ("iOS", "Safari")})
+
+check("missing snapshot loads nothing", load(snapshot_path("missing"))[1], 0)
+
+# Worker deltas: learned entries and counters move to the parent cache once
+worker = UserAgentCache(None)
+worker.learned = []
+for agent in AGENTS[:3] + AGENTS[:1]:
+    worker.classify(agent)
+delta = worker.take_delta()
+check("delta lists new entries once", [ua_string for ua_string, _ in delta[0]], AGENTS[:3])
+check("delta counters", delta[1:], (1, 3))
+check("delta resets the worker", worker.take_delta(), ([], 0, 0))
+parent = UserAgentCache(None, max_entries=2)
+parent.merge_delta(delta)
+check("merged delta keeps the newest within the bound", (list(parent.entries), parent.hits, parent.misses), (AGENTS[1:3], 1, 3))
+
+print(f"{passed} passed, {failed} failed")
+sys.exit(1 if failed else 0)
+PY
+
+if (( rc != 0 )); then
+  log "=== Results: user-agent cache checks FAILED ==="
+  exit 1
+fi
+log "=== Results: user-agent cache checks passed ==="
@@ -0,0 +1,139 @@
+"""
+Shared timestamp parsing for the log processors.
+
+A TimestampParser is created per log file. Canonical fixed-width timestamps
+are sliced directly instead of going through datetime.strptime, the format
+that matched last is tried first, the Access Date string is cached per
+calendar day, and a value equal to the previous one is not parsed again.
+Anything the fast path does not recognise is handed to datetime.strptime,
+so results and errors are exactly what the processors produced before.
+"""
+
+import re
+from datetime import datetime
+from typing import Callable
+
+# Formats accepted by the processors today
+ISO_MILLIS_Z = "%Y-%m-%dT%H:%M:%S.%fZ"
+SPACE_MILLIS = "%Y-%m-%d %H:%M:%S.%f"
+ISO_Z = "%Y-%m-%dT%H:%M:%SZ"
+ISO_MILLIS_OFFSET = "%Y-%m-%dT%H:%M:%S.%f%z"
+ISO_OFFSET = "%Y-%m-%dT%H:%M:%S%z"
+SPACE = "%Y-%m-%d %H:%M:%S"
+APACHE = "%d/%b/%Y:%H:%M:%S %z"
+
+MONTHS = {
+    "Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6,
+    "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12,
+}
+
+# ASCII digits and a four-digit year from 1000 up, so the sliced text is what strftime would print
+_DATE = r"([1-9][0-9]{3}-[0-9]{2}-[0-9]{2})"
+_CLOCK = r"([0-9]{2}):([0-9]{2}):([0-9]{2})"
+_OFFSET = r"(?:Z|[+-](?:[01][0-9]|2[0-3]):?[0-5][0-9])"
+
+# Groups: day key, hour, minute, second, fraction (may be empty)
+FAST_PATTERNS = {
+    ISO_MILLIS_Z: re.compile(_DATE + "T" + _CLOCK + r"\.([0-9]{1,6})Z"),
+    SPACE_MILLIS: re.compile(_DATE + " " + _CLOCK + r"\.([0-9]{1,6})"),
+    ISO_Z: re.compile(_DATE + "T" + _CLOCK + "()Z"),
+    ISO_MILLIS_OFFSET: re.compile(_DATE + "T" + _CLOCK + r"\.([0-9]{1,6})" + _OFFSET),
+    ISO_OFFSET: re.compile(_DATE + "T" + _CLOCK + "()" + _OFFSET),
+    SPACE: re.compile(_DATE + " " + _CLOCK + "()"),
+    APACHE: re.compile(r"([0-9]{2}/[A-Z][a-z]{2}/[1-9][0-9]{3}):" + _CLOCK + "() " + _OFFSET),
+}
+
+
+def oc4d_format(value: str) -> str:
+    """OC4D/D-Hub lines carry either an ISO UTC timestamp or a space-separated local one."""
+    return ISO_MILLIS_Z if value.endswith("Z") and "T" in value else SPACE_MILLIS
+
+
+def _day_from_key(day_key: str, fmt: str):
+    """(year, month, day, 'YYYY-MM-DD') for a fast-path day key, or None when it is not a real date."""
+    if fmt == APACHE:
+        year, month, day = int(day_key[7:11]), MONTHS.get(day_key[3:6]), int(day_key[0:2])
+        if month is None:
+            return None
+        date_text = f"{year:04d}-{month:02d}-{day:02d}"
+    else:
+        year, month, day = int(day_key[0:4]), int(day_key[5:7]), int(day_key[8:10])
+        date_text = day_key
+    try:
+        datetime(year, month, day)
+    except ValueError:
+        return None
+    return year, month, day, date_text
+
+
+class TimestampParser:
+    """
+    Parses the timestamps of one log file into (naive datetime, Access Date,
+    Access Time). Any timezone offset is validated and then dropped, the same
+    way the processors ignored it before.
+
+    With pick, only the format pick(value) returns is tried; otherwise the
+    formats are tried in order, starting with the one that matched last.
+    """
+
+    def __init__(self, formats: tuple, pick: Callable[[str], str] = None):
+        self.formats = list(formats)
+        self.pick = pick
+        self._days = {}
+        self._midnights = {}
+        self._last_value = None
+        self._last_parsed = None
+
+    def parse(self, value: str) -> tuple:
+        """Raises ValueError when no format matches, as datetime.strptime does."""
+        # A page and its assets are logged within the same second
+        if value == self._last_value:
+            return self._last_parsed
+
+        if self.pick is not None:
+            parsed = self._parse_as(value, self.pick(value))
+        else:
+            parsed = self._parse_in_order(value)
+        self._last_value = value
+        self._last_parsed = parsed
+        return parsed
+
+    def _parse_in_order(self, value: str) -> tuple:
+        error = None
+        for index, fmt in enumerate(self.formats):
+            try:
+                parsed = self._parse_as(value, fmt)
+            except ValueError as exc:
+                error = exc
+                continue
+            if index:
+                self.formats.insert(0, self.formats.pop(index))
+            return parsed
+        raise error
+
+    def day_start(self, access_date: str) -> datetime:
+        """Midnight of an Access Date, for window checks on rows without an Access Time."""
+        midnight = self._midnights.get(access_date)
+        if midnight is None:
+            midnight = self._midnights[access_date] = datetime.strptime(access_date, "%Y-%m-%d")
+        return midnight
+
+    def _parse_as(self, value: str, fmt: str) -> tuple:
+        pattern = FAST_PATTERNS.get(fmt)
+        match = pattern.fullmatch(value) if pattern is not None else None
+        if match is not None:
+            day_key, hour, minute, second, fraction = match.groups()
+            cache_key = (fmt, day_key)
+            day = self._days.get(cache_key, False)
+            if day is False:
+                day = self._days[cache_key] = _day_from_key(day_key, fmt)
+            hour, minute, second = int(hour), int(minute), int(second)
+            if day is not None and hour < 24 and minute < 60 and second < 60:
+                year, month, day_of_month, date_text = day
+                microsecond = int(fraction.ljust(6, "0")) if fraction else 0
+                moment = datetime(year, month, day_of_month, hour, minute, second, microsecond)
+                clock_at = match.start(2)
+                return moment, date_text, value[clock_at:clock_at + 8]
+
+        moment = datetime.strptime(value, fmt).replace(tzinfo=None)
+        return moment, moment.strftime("%Y-%m-%d"), moment.strftime("%H:%M:%S")
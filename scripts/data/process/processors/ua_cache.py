@@ -0,0 +1,133 @@
+"""
+Bounded LRU cache from user-agent string to (OS family, browser family).
+
+A site only ever sees a few hundred distinct user agents, so every processor
+shares this cache instead of calling user_agents.parse() on every line. The
+cache is persisted between runs as a JSON snapshot under 00_DATA/00_CACHE.
+"""
+
+import json
+import os
+from collections import OrderedDict
+
+import ua_parser
+import user_agents
+from user_agents import parse
+
+DEFAULT_CACHE_FILE = os.path.join("00_DATA", "00_CACHE", "user-agents.json")
+DEFAULT_MAX_ENTRIES = 4096
+SNAPSHOT_VERSION = 1
+
+
+def parser_version() -> str:
+    """Version tag stored in the snapshot so a library upgrade starts a fresh cache."""
+    ua_parser_version = ".".join(str(part) for part in getattr(ua_parser, "VERSION", ()))
+    user_agents_version = ".".join(str(part) for part in getattr(user_agents, "VERSION", ()))
+    return f"user-agents {user_agents_version} / ua-parser {ua_parser_version}"
+
+
+class UserAgentCache:
+    """
+    Memoizes user_agents.parse() as (os.family, browser.family) tuples.
+    Processors apply their own 'unknown' fallbacks to the raw families.
+    """
+
+    def __init__(self, path: str = None, max_entries: int = None):
+        self.path = path or os.environ.get("CDN_AUTO_UA_CACHE_FILE", DEFAULT_CACHE_FILE)
+        if max_entries is None:
+            try:
+                max_entries = int(os.environ.get("CDN_AUTO_UA_CACHE_SIZE", DEFAULT_MAX_ENTRIES))
+            except ValueError:
+                max_entries = DEFAULT_MAX_ENTRIES
+        self.max_entries = max(1, max_entries)
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Only worker processes track new entries, see take_delta()
+        self.learned = None
+
+    def classify(self, ua_string: str) -> tuple:
+        entry = self.entries.get(ua_string)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(ua_string)
+            return entry
+
+        self.misses += 1
+        user_agent = parse(ua_string)
+        entry = (user_agent.os.family, user_agent.browser.family)
+        self.entries[ua_string] = entry
+        if self.learned is not None:
+            self.learned.append((ua_string, entry))
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return entry
+
+    def take_delta(self) -> tuple:
+        """Entries and counters gathered since the last call, for handing back from a worker process."""
+        delta = (self.learned or [], self.hits, self.misses)
+        self.learned = []
+        self.hits = 0
+        self.misses = 0
+        return delta
+
+    def merge_delta(self, delta: tuple) -> None:
+        learned, hits, misses = delta
+        for ua_string, entry in learned:
+            self.entries[ua_string] = entry
+            self.entries.move_to_end(ua_string)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self.hits += hits
+        self.misses += misses
+
+    def load(self) -> int:
+        """Load the on-disk snapshot; a missing, stale or corrupt snapshot is ignored."""
+        if not self.path or not os.path.isfile(self.path):
+            return 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                snapshot = json.load(handle)
+        except (OSError, ValueError) as exc:
+            print(f"User-agent cache snapshot ignored ({self.path}): {exc}")
+            return 0
+
+        if (
+            not isinstance(snapshot, dict)
+            or snapshot.get("version") != SNAPSHOT_VERSION
+            or snapshot.get("parser") != parser_version()
+        ):
+            return 0
+
+        for item in snapshot.get("entries") or []:
+            if isinstance(item, list) and len(item) == 3 and all(isinstance(value, str) for value in item):
+                self.entries[item[0]] = (item[1], item[2])
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return len(self.entries)
+
+    def save(self) -> None:
+        """Write the snapshot atomically so an interrupted run never leaves a truncated file."""
+        if not self.path:
+            return
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "parser": parser_version(),
+            "entries": [[ua_string, os_family, browser] for ua_string, (os_family, browser) in self.entries.items()],
+        }
+        temp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(temp_path, "w", encoding="utf-8") as handle:
+                json.dump(snapshot, handle, separators=(",", ":"))
+            os.replace(temp_path, self.path)
+        except OSError as exc:
+            print(f"Could not save user-agent cache snapshot ({self.path}): {exc}")
+
+    def stats(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = (self.hits / lookups * 100) if lookups else 0.0
+        return (
+            f"User-agent cache: {self.hits} hits, {self.misses} misses "
+            f"({hit_rate:.1f}% hit rate, {len(self.entries)} entries)"
+        )
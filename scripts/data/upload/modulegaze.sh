@@ -6,6 +6,8 @@ cd "$PROJECT_ROOT"
 source "$PROJECT_ROOT/scripts/data/lib/s3_picker_helpers.sh"
 # shellcheck disable=SC1091
 source "$PROJECT_ROOT/scripts/data/lib/cleanup_helpers.sh"
+# shellcheck disable=SC1091
+source "$PROJECT_ROOT/scripts/data/lib/upload_helpers.sh"
 
 CONFIG_FILE="config/automation.conf"
 S3_BUCKET_DEFAULT="s3://rachel-upload-test"
@@ -43,12 +45,16 @@ read -rp "Please type the location of the device: " location
 location=${location// /_}
 
 while true; do
-    read -rp "Please enter the starting month for filtering (1-12): " month
-    if [[ "$month" =~ ^[1-9]$|^1[0-2]$ ]]; then
+    read -rp "Please enter the month to upload (1-12, or YYYY-MM for one year's month), or 'all' for every month: " month
+    if [[ "$month" == "all" ]]; then
+        break
+    elif [[ "$month" =~ ^[1-9]$|^1[0-2]$ ]]; then
         month=$(printf "%02d" "$month")
         break
+    elif [[ "$month" =~ ^[0-9]{4}-(0[1-9]|1[0-2])$ ]]; then
+        break
     else
-        echo "Invalid input. Enter a number from 1 to 12."
+        echo "Invalid input. Enter a number from 1 to 12, YYYY-MM, or 'all'."
     fi
 done
 
@@ -60,48 +66,72 @@ fi
 PROCESSED_ROOT="$PROJECT_ROOT/00_DATA/00_PROCESSED"
 
 summary_file="$folder/summary.csv"
-summary_copy="$folder/summary_copy.csv"
 if [ ! -f "$summary_file" ]; then
     echo -e "${RED}summary.csv not found in selected folder.${NC}"
     exit 1
 fi
-cp "$summary_file" "$summary_copy"
 
-year=$(python3 scripts/data/upload/process_csv.py "$folder" "$location" "$month" "summary_copy.csv" "year" "modulegaze_logs")
+if [ "$month" = "all" ]; then
+    processed_output=$(python3 scripts/data/upload/process_csv.py "$folder" "$location" all "summary.csv" "year" "modulegaze_logs")
+else
+    processed_output=$(python3 scripts/data/upload/process_csv.py "$folder" "$location" "$month" "summary.csv" "year" "modulegaze_logs")
+fi
 
-if [ $? -ne 0 ] || [ -z "$year" ]; then
+if [ $? -ne 0 ] || [ -z "$processed_output" ]; then
     echo -e "${RED}CSV processing failed or no ModuleGaze rows matched this period.${NC}"
     cleanup_processed_run_folder "$PROCESSED_ROOT" "$processed_run_name"
     sleep 2
     exec ./scripts/data/upload/main.sh
 fi
 
+if [ "$month" = "all" ]; then
+    mapfile -t processed_filenames <<< "$processed_output"
+else
+    processed_filenames=("${location}_${month##*-}_${processed_output}_modulegaze_logs.csv")
+fi
+
 selected_bucket="$(pick_s3_subfolder_select "$s3_bucket")" || {
   echo -e "${RED}Could not select an S3 subfolder.${NC}"
   sleep 2
   exec ./scripts/data/upload/main.sh
 }
 
-processed_filename="${location}_${month}_${year}_modulegaze_logs.csv"
-processed_path="$folder/$processed_filename"
-if [ -n "$selected_bucket" ]; then
-    remote_path="$s3_bucket/${selected_bucket}/ModuleGaze/$processed_filename"
-else
-    remote_path="$s3_bucket/ModuleGaze/$processed_filename"
-fi
+upload_failed=0
+upload_jobs="$(mktemp)"
+upload_results="$(mktemp)"
+for processed_filename in "${processed_filenames[@]}"; do
+    processed_path="$folder/$processed_filename"
+    if [ -n "$selected_bucket" ]; then
+        remote_path="$s3_bucket/${selected_bucket}/ModuleGaze/$processed_filename"
+    else
+        remote_path="$s3_bucket/ModuleGaze/$processed_filename"
+    fi
+
+    if [ ! -f "$processed_path" ]; then
+        echo -e "${RED}Processed file $processed_filename not found. Something went wrong during CSV processing.${NC}"
+        upload_failed=1
+        continue
+    fi
 
-if [ -f "$processed_path" ]; then
     echo -e "${DARK_GRAY}Uploading: $processed_path -> $remote_path${NC}"
-    aws s3 cp "$processed_path" "$remote_path"
+    printf '%s\t%s\n' "$processed_path" "$remote_path" >> "$upload_jobs"
+done
 
-    if [ $? -eq 0 ]; then
-        echo -e "${GREEN}ModuleGaze data upload completed successfully.${NC}"
-        cleanup_processed_run_folder "$PROCESSED_ROOT" "$processed_run_name"
+# Every month goes up in one batch
+upload_batch "$upload_jobs" "$upload_results" || upload_failed=1
+while IFS=$'\t' read -r upload_status processed_path _ _ upload_detail; do
+    if [ "$upload_status" = "ok" ] && [ "$upload_detail" = "$UPLOAD_UNCHANGED" ]; then
+        echo -e "${GREEN}Skipped $(basename "$processed_path"): unchanged since its last upload.${NC}"
+    elif [ "$upload_status" = "ok" ]; then
+        echo -e "${GREEN}Uploaded $(basename "$processed_path").${NC}"
     else
-        echo -e "${RED}Upload failed. Please check your AWS setup.${NC}"
+        echo -e "${RED}Upload of $(basename "$processed_path") failed: $upload_detail Please check your AWS setup.${NC}"
     fi
-else
-    echo -e "${RED}Processed file not found. Something went wrong during CSV processing.${NC}"
+done < "$upload_results"
+rm -f "$upload_jobs" "$upload_results"
+
+if [ "$upload_failed" -eq 0 ]; then
+    echo -e "${GREEN}ModuleGaze data upload completed successfully.${NC}"
     cleanup_processed_run_folder "$PROCESSED_ROOT" "$processed_run_name"
 fi
 
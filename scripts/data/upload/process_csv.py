@@ -3,8 +3,17 @@
 import sys
 import os
 import csv
+import contextlib
+import itertools
 from datetime import datetime, timedelta
 
+# partitions.py lives with the processors that write the day shards
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "process", "processors"))
+from partitions import day_lines, load_index  # noqa: E402
+
+# Distinct Access Date values remembered per run; a summary holds a few hundred
+KNOWN_DATES_LIMIT = 100000
+
 def column_index(header, column_name, fallback=None):
     normalized = [value.strip().lower() for value in header]
     try:
@@ -13,19 +22,21 @@ def column_index(header, column_name, fallback=None):
         return fallback
 
 
-def process_csv(folder, location, month, processed_file_name, mode='year', suffix='access_logs'):
+def process_csv(folder, location, month, processed_file_name, mode='year', suffix='access_logs', year=None):
     """
     Filters a CSV for a specific month.
     - In 'year' mode (default, for manual upload), it prints the year.
     - In 'filename' mode (for automation), it prints the final filename.
     
     For automation (mode='filename'), if month is negative, it calculates the previous month.
+    Rows are kept for one year only: the given year, the previous month's year for automation,
+    or else the newest year that has rows for the month (the others are counted on stderr).
+    When the processors left day shards next to summary.csv, only that month's days are read.
+    Each distinct Access Date is parsed once; rows without a readable one are counted and skipped.
     """
     input_path = os.path.join(folder, processed_file_name)
-    temp_output_path = os.path.join(folder, "temp_filtered.csv")
     header = None
-    latest_year = None
-    rows_written = 0
+    rows_written = {}
 
     # Handle previous month calculation for automation
     if month < 1:
@@ -34,71 +45,199 @@ def process_csv(folder, location, month, processed_file_name, mode='year', suffi
         first_day_this_month = today.replace(day=1)
         last_day_prev_month = first_day_this_month - timedelta(days=1)
         month = last_day_prev_month.month
+        year = last_day_prev_month.year
         sys.stderr.write(f"📊 Filtering logs for: {last_day_prev_month.strftime('%B %Y')} (previous month)\n")
+    elif year is not None:
+        sys.stderr.write(f"📊 Filtering logs for: {datetime(year, month, 1).strftime('%B %Y')}\n")
     else:
         sys.stderr.write(f"📊 Filtering logs for: Month {month}\n")
-    
+
+    def temp_path(row_year):
+        return os.path.join(folder, f"temp_filtered_{row_year}_{month:02d}.csv")
+
+    index = load_index(input_path)
     try:
         with open(input_path, 'r', newline='', encoding='utf-8') as infile, \
-             open(temp_output_path, 'w', newline='', encoding='utf-8') as outfile:
+             contextlib.ExitStack() as stack:
 
-            reader = csv.reader((line.replace('\0', '') for line in infile))
-            writer = csv.writer(outfile)
+            lines = infile
+            if index is not None:
+                lines = itertools.chain(
+                    [infile.readline()],
+                    day_lines(index, lambda day: day.month == month and year in (None, day.year)),
+                )
+            reader = csv.reader((line.replace('\0', '') for line in lines))
 
             try:
                 header = next(reader)
-                writer.writerow(header)
                 date_index = column_index(header, "Access Date", 1)
             except StopIteration:
                 sys.exit(0) # Exit gracefully if empty, printing nothing
 
+            # One temp file per year, as split_months buckets rows, so years are never merged
+            outputs = {}
+            known_dates = {}
+            malformed_rows = 0
             for row in reader:
                 try:
-                    date_obj = datetime.strptime(row[date_index], '%Y-%m-%d')
-                    if date_obj.month == month:
-                        writer.writerow(row)
-                        rows_written += 1
-                        if latest_year is None or date_obj.year > latest_year:
-                            latest_year = date_obj.year
-                except Exception:
-                    continue  # Skip invalid rows
+                    row_date_str = row[date_index]
+                except IndexError:
+                    malformed_rows += 1
+                    continue
+                date_obj = known_dates.get(row_date_str, False)
+                if date_obj is False:
+                    try:
+                        date_obj = datetime.strptime(row_date_str, '%Y-%m-%d')
+                    except ValueError:
+                        date_obj = None
+                    if len(known_dates) < KNOWN_DATES_LIMIT:
+                        known_dates[row_date_str] = date_obj
+                if date_obj is None:
+                    malformed_rows += 1
+                    continue
+                if date_obj.month != month or year not in (None, date_obj.year):
+                    continue
+                writer = outputs.get(date_obj.year)
+                if writer is None:
+                    writer = outputs[date_obj.year] = csv.writer(stack.enter_context(
+                        open(temp_path(date_obj.year), 'w', newline='', encoding='utf-8')
+                    ))
+                    writer.writerow(header)
+                    rows_written[date_obj.year] = 0
+                writer.writerow(row)
+                rows_written[date_obj.year] += 1
 
     except Exception as e:
         # Send errors to stderr so they don't get captured by runner.sh
         sys.stderr.write(f"Error processing CSV: {e}\n")
         sys.exit(1)
 
-    if rows_written == 0:
-        os.remove(temp_output_path)
+    if malformed_rows:
+        sys.stderr.write(f"⚠️  Skipped {malformed_rows} row(s) without a readable Access Date\n")
+
+    if not rows_written:
         sys.stderr.write(f"⚠️  No log entries found for this period\n")
         # Print nothing if no file was created
         sys.exit(0)
 
+    selected_year = max(rows_written)
+    for other_year in sorted(rows_written):
+        if other_year != selected_year:
+            os.remove(temp_path(other_year))
+            sys.stderr.write(
+                f"⚠️  Skipped {rows_written[other_year]} log entries from {month:02d}/{other_year}; "
+                f"use {other_year}-{month:02d} or 'all' to upload them\n"
+            )
+
     # Final rename
-    final_name = f"{location}_{month:02d}_{latest_year}_{suffix}.csv"
+    final_name = f"{location}_{month:02d}_{selected_year}_{suffix}.csv"
     final_path = os.path.join(folder, final_name)
-    os.rename(temp_output_path, final_path)
-    sys.stderr.write(f"✅ Found {rows_written} log entries for uploading\n")
+    os.rename(temp_path(selected_year), final_path)
+    sys.stderr.write(f"✅ Found {rows_written[selected_year]} log entries for uploading\n")
 
     if mode == 'filename':
         print(final_name)
     else:
-        print(latest_year)
+        print(selected_year)
+
+def split_months(folder, location, processed_file_name, suffix='access_logs'):
+    """
+    Writes every (year, month) in the CSV to its own <location>_<MM>_<YYYY>_<suffix>.csv
+    in one pass and prints the filenames, oldest month first.
+    """
+    input_path = os.path.join(folder, processed_file_name)
+    outputs = {}
+    rows_written = {}
+
+    sys.stderr.write("📊 Splitting logs into one file per month\n")
+    try:
+        with open(input_path, 'r', newline='', encoding='utf-8') as infile, \
+             contextlib.ExitStack() as stack:
+
+            reader = csv.reader((line.replace('\0', '') for line in infile))
+            try:
+                header = next(reader)
+                date_index = column_index(header, "Access Date", 1)
+            except StopIteration:
+                sys.exit(0) # Exit gracefully if empty, printing nothing
+
+            known_dates = {}
+            malformed_rows = 0
+            for row in reader:
+                try:
+                    row_date_str = row[date_index]
+                except IndexError:
+                    malformed_rows += 1
+                    continue
+                bucket = known_dates.get(row_date_str, False)
+                if bucket is False:
+                    try:
+                        date_obj = datetime.strptime(row_date_str, '%Y-%m-%d')
+                        bucket = (date_obj.year, date_obj.month)
+                    except ValueError:
+                        bucket = None
+                    if len(known_dates) < KNOWN_DATES_LIMIT:
+                        known_dates[row_date_str] = bucket
+                if bucket is None:
+                    malformed_rows += 1
+                    continue
+
+                writer = outputs.get(bucket)
+                if writer is None:
+                    temp_path = os.path.join(folder, f"temp_filtered_{bucket[0]}_{bucket[1]:02d}.csv")
+                    writer = outputs[bucket] = csv.writer(stack.enter_context(
+                        open(temp_path, 'w', newline='', encoding='utf-8')
+                    ))
+                    writer.writerow(header)
+                    rows_written[bucket] = 0
+                writer.writerow(row)
+                rows_written[bucket] += 1
+
+    except Exception as e:
+        sys.stderr.write(f"Error processing CSV: {e}\n")
+        sys.exit(1)
+
+    if malformed_rows:
+        sys.stderr.write(f"⚠️  Skipped {malformed_rows} row(s) without a readable Access Date\n")
+
+    if not rows_written:
+        sys.stderr.write(f"⚠️  No log entries found\n")
+        sys.exit(0)
+
+    for year, month in sorted(rows_written):
+        final_name = f"{location}_{month:02d}_{year}_{suffix}.csv"
+        os.rename(
+            os.path.join(folder, f"temp_filtered_{year}_{month:02d}.csv"),
+            os.path.join(folder, final_name),
+        )
+        sys.stderr.write(f"✅ Found {rows_written[(year, month)]} log entries for {final_name}\n")
+        print(final_name)
 
 if __name__ == "__main__":
     if len(sys.argv) not in [5, 6, 7]:
-        sys.stderr.write("Usage: python process_csv.py <folder> <location> <month> <processed_file_name> [mode] [suffix]\n")
+        sys.stderr.write("Usage: python process_csv.py <folder> <location> <month|YYYY-MM|all> <processed_file_name> [mode] [suffix]\n")
         sys.exit(1)
 
     folder = sys.argv[1]
     location = sys.argv[2]
+    if sys.argv[3] == 'all':
+        # One file per (year, month); mode is ignored and the filenames are printed
+        split_months(folder, location, sys.argv[4], sys.argv[6] if len(sys.argv) == 7 else 'access_logs')
+        sys.exit(0)
+    year = None
     try:
-        month = int(sys.argv[3])
+        # YYYY-MM keeps that year's month only
+        if '-' in sys.argv[3]:
+            year, month = (int(part) for part in sys.argv[3].split('-', 1))
+            if not (1 <= month <= 12 and 1 <= year <= 9999):
+                raise ValueError
+        else:
+            month = int(sys.argv[3])
         # Allow 0 for automation (previous month calculation) or 1-12 for manual
         if not (month == 0 or 1 <= month <= 12):
             raise ValueError
     except ValueError:
-        sys.stderr.write("Error: Month must be 0 (for previous month) or an integer between 1 and 12.\n")
+        sys.stderr.write("Error: Month must be 0 (for previous month), an integer between 1 and 12, YYYY-MM, or 'all'.\n")
         sys.exit(1)
 
     processed_file_name = sys.argv[4]
@@ -115,5 +254,5 @@ if __name__ == "__main__":
             mode = sys.argv[5]
         suffix = sys.argv[6]
         
-    process_csv(folder, location, month, processed_file_name, mode, suffix)
+    process_csv(folder, location, month, processed_file_name, mode, suffix, year)
 
@@ -6,6 +6,8 @@ cd "$PROJECT_ROOT"
 source "$PROJECT_ROOT/scripts/data/lib/s3_picker_helpers.sh"
 # shellcheck disable=SC1091
 source "$PROJECT_ROOT/scripts/data/lib/cleanup_helpers.sh"
+# shellcheck disable=SC1091
+source "$PROJECT_ROOT/scripts/data/lib/upload_helpers.sh"
 
 s3_bucket="s3://rachel-upload-test"
 
@@ -42,12 +44,16 @@ location=${location// /_}  # Replace spaces with underscores
 
 # Ask for the filtering month
 while true; do
-    read -rp "Please enter the starting month for filtering (1–12): " month
-    if [[ "$month" =~ ^[1-9]$|^1[0-2]$ ]]; then
+    read -rp "Please enter the month to upload (1–12, or YYYY-MM for one year's month), or 'all' for every month: " month
+    if [[ "$month" == "all" ]]; then
+        break
+    elif [[ "$month" =~ ^[1-9]$|^1[0-2]$ ]]; then
         month=$(printf "%02d" "$month")  # Always two digits
         break
+    elif [[ "$month" =~ ^[0-9]{4}-(0[1-9]|1[0-2])$ ]]; then
+        break
     else
-        echo "Invalid input. Enter a number from 1 to 12."
+        echo "Invalid input. Enter a number from 1 to 12, YYYY-MM, or 'all'."
     fi
 done
 
@@ -58,26 +64,34 @@ if ! processed_run_name="$(normalize_log_run_name "$processed_run_name")"; then
 fi
 PROCESSED_ROOT="$PROJECT_ROOT/00_DATA/00_PROCESSED"
 
-# Efficiently copy file only if it exists
+# process_csv.py only reads summary.csv, so it is filtered in place
 summary_file="$folder/summary.csv"
-summary_copy="$folder/summary_copy.csv"
 if [ ! -f "$summary_file" ]; then
     echo -e "${RED}summary.csv not found in selected folder.${NC}"
     exit 1
 fi
-cp "$summary_file" "$summary_copy"
 
-# Run Python processor and capture year
-year=$(python3 scripts/data/upload/process_csv.py "$folder" "$location" "$month" "summary_copy.csv")
+# Run Python processor: one month prints its year, 'all' prints one filename per month
+if [ "$month" = "all" ]; then
+    processed_output=$(python3 scripts/data/upload/process_csv.py "$folder" "$location" all "summary.csv")
+else
+    processed_output=$(python3 scripts/data/upload/process_csv.py "$folder" "$location" "$month" "summary.csv")
+fi
 
 # Exit if processing failed
-if [ $? -ne 0 ] || [ -z "$year" ]; then
+if [ $? -ne 0 ] || [ -z "$processed_output" ]; then
     echo -e "${RED}CSV processing failed. Please check your data.${NC}"
     cleanup_processed_run_folder "$PROCESSED_ROOT" "$processed_run_name"
     sleep 2
     exec ./scripts/data/upload/main.sh
 fi
 
+if [ "$month" = "all" ]; then
+    mapfile -t processed_filenames <<< "$processed_output"
+else
+    processed_filenames=("${location}_${month##*-}_${processed_output}_access_logs.csv")
+fi
+
 # Select bucket subfolder from discovered S3 prefixes
 selected_bucket="$(pick_s3_subfolder_select "$s3_bucket")" || {
   echo -e "${RED}Could not select an S3 subfolder.${NC}"
@@ -85,22 +99,36 @@ selected_bucket="$(pick_s3_subfolder_select "$s3_bucket")" || {
   exec ./scripts/data/upload/main.sh
 }
 
-# Construct processed filename
-processed_filename="${location}_${month}_${year}_access_logs.csv"
-processed_path="$folder/$processed_filename"
+upload_failed=0
+upload_jobs="$(mktemp)"
+upload_results="$(mktemp)"
+for processed_filename in "${processed_filenames[@]}"; do
+    processed_path="$folder/$processed_filename"
+    if [ ! -f "$processed_path" ]; then
+        echo -e "${RED}Processed file $processed_filename not found. Something went wrong during CSV processing.${NC}"
+        upload_failed=1
+        continue
+    fi
 
-if [ -f "$processed_path" ]; then
     echo -e "${DARK_GRAY}Uploading: $processed_path → $s3_bucket/${selected_bucket}/RACHEL/${processed_filename}${NC}"
-    aws s3 cp "$processed_path" "$s3_bucket/${selected_bucket}/RACHEL/$processed_filename"
+    printf '%s\t%s\n' "$processed_path" "$s3_bucket/${selected_bucket}/RACHEL/$processed_filename" >> "$upload_jobs"
+done
 
-    if [ $? -eq 0 ]; then
-        echo -e "${GREEN}Data upload completed successfully.${NC}"
-        cleanup_processed_run_folder "$PROCESSED_ROOT" "$processed_run_name"
+# Every month goes up in one batch
+upload_batch "$upload_jobs" "$upload_results" || upload_failed=1
+while IFS=$'\t' read -r upload_status processed_path _ _ upload_detail; do
+    if [ "$upload_status" = "ok" ] && [ "$upload_detail" = "$UPLOAD_UNCHANGED" ]; then
+        echo -e "${GREEN}Skipped $(basename "$processed_path"): unchanged since its last upload.${NC}"
+    elif [ "$upload_status" = "ok" ]; then
+        echo -e "${GREEN}Uploaded $(basename "$processed_path").${NC}"
     else
-        echo -e "${RED}Upload failed. Please check your AWS setup.${NC}"
+        echo -e "${RED}Upload of $(basename "$processed_path") failed: $upload_detail Please check your AWS setup.${NC}"
     fi
-else
-    echo -e "${RED}Processed file not found. Something went wrong during CSV processing.${NC}"
+done < "$upload_results"
+rm -f "$upload_jobs" "$upload_results"
+
+if [ "$upload_failed" -eq 0 ]; then
+    echo -e "${GREEN}Data upload completed successfully.${NC}"
     cleanup_processed_run_folder "$PROCESSED_ROOT" "$processed_run_name"
 fi
 